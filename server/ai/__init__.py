@@ -12,14 +12,51 @@ This module provides modern AI capabilities including:
 - Document processing and chunking
 """
 
-from .azure_openai_service import AzureOpenAIService, ai_service
-from .embedding_service import EmbeddingService, embedding_service
-from .conversation_manager import ConversationManager, conversation_manager
-from .prompt_templates import PromptTemplates
-from .config import AIConfig
-from .vectordb_manager import VectorDBManager, vector_db
-from .document_processor import DocumentProcessor, doc_processor
-from .rag_pipeline import RAGPipeline, rag_pipeline
+import sys
+import types
+from importlib import import_module
+
+# Exported names resolve on first access (PEP 562), so importing one submodule
+# (e.g. ai.document_processor in a parser worker) does not construct every
+# service singleton in the package
+_EXPORTS = {
+    'AzureOpenAIService': 'azure_openai_service',
+    'ai_service': 'azure_openai_service',
+    'EmbeddingService': 'embedding_service',
+    'embedding_service': 'embedding_service',
+    'ConversationManager': 'conversation_manager',
+    'conversation_manager': 'conversation_manager',
+    'PromptTemplates': 'prompt_templates',
+    'AIConfig': 'config',
+    'VectorDBManager': 'vectordb_manager',
+    'vector_db': 'vectordb_manager',
+    'DocumentProcessor': 'document_processor',
+    'doc_processor': 'document_processor',
+    'RAGPipeline': 'rag_pipeline',
+    'rag_pipeline': 'rag_pipeline'
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
+
+class _Package(types.ModuleType):
+    """Keeps ai.embedding_service / ai.rag_pipeline as the singletons, not the submodules of the same name"""
+
+    def __setattr__(self, name, value):
+        if name in _EXPORTS and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
 
 __all__ = [
     'AzureOpenAIService',
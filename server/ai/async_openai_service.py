@@ -0,0 +1,372 @@
+"""
+Async Azure OpenAI Service
+Connection-pooled, concurrency- and rate-limited LLM client
+
+Runs an AsyncAzureOpenAI client on a dedicated background event loop so
+that synchronous Flask handlers can submit completions to it and share
+one HTTP connection pool, one in-flight limit and one rate limiter.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Coroutine, List, Dict, Optional
+
+import httpx
+from openai import AsyncAzureOpenAI
+
+from .config import AIConfig
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot get rate-limit budget within the allowed wait"""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously over a period
+
+    A bucket of capacity N over 60s allows bursts of N and a sustained
+    N per minute; over 86400s it acts as a rolling daily budget.
+    """
+
+    def __init__(self, capacity: int, period_seconds: float):
+        """
+        Initialize bucket
+
+        Args:
+            capacity: Maximum budget (also the refill amount per period)
+            period_seconds: Time to refill from empty to full
+        """
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add budget accrued since the last update (lock held)"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount: float) -> float:
+        """
+        Take budget if available
+
+        Returns:
+            0.0 if acquired, otherwise seconds until enough budget accrues
+        """
+        with self._lock:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def refund(self, amount: float):
+        """Return unused budget"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def _next_wait(self, amount: float, deadline: float) -> float:
+        """Take budget (0.0) or return how long to sleep; raise if it cannot accrue by deadline"""
+        if amount > self.capacity:
+            raise RateLimitExceeded(f"Request needs {amount:.0f} but the limit is {self.capacity:.0f}")
+        wait = self.try_acquire(amount)
+        if wait and time.monotonic() + wait > deadline:
+            raise RateLimitExceeded(f"Rate limit reached, retry in {wait:.0f}s")
+        return wait
+
+    async def acquire(self, amount: float, max_wait: float):
+        """Wait for budget, failing if it will not accrue within max_wait seconds"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._next_wait(amount, deadline)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, amount: float, max_wait: float):
+        """acquire() for synchronous callers (sleeps the calling thread)"""
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._next_wait(amount, deadline)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class AsyncAzureOpenAIService:
+    """
+    Async Azure OpenAI client for concurrent request handling
+
+    Features:
+    - Shared httpx connection pool (keep-alive across requests)
+    - Semaphore bounding in-flight completions
+    - Token buckets enforcing MAX_REQUESTS_PER_MINUTE and MAX_TOKENS_PER_DAY
+    - Background event loop so sync code can submit() / run() coroutines
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_day: Optional[int] = None
+    ):
+        """
+        Initialize async service (the event loop and client start on first use)
+
+        Args:
+            max_concurrency: Maximum in-flight completions
+            max_connections: HTTP connection pool size
+            requests_per_minute: Request rate limit
+            tokens_per_day: Rolling daily token budget
+        """
+        self.max_concurrency = max_concurrency or AIConfig.LLM_MAX_CONCURRENCY
+        self.max_connections = max_connections or AIConfig.LLM_MAX_CONNECTIONS
+
+        self.request_bucket = TokenBucket(requests_per_minute or AIConfig.MAX_REQUESTS_PER_MINUTE, 60)
+        self.token_bucket = TokenBucket(tokens_per_day or AIConfig.MAX_TOKENS_PER_DAY, 86400)
+
+        self.client: Optional[AsyncAzureOpenAI] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'failures': 0,
+            'rate_limited': 0,
+            'in_flight': 0,
+            'total_tokens': 0,
+            'total_wait_ms': 0.0
+        }
+
+    # ----- event loop -----
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """Start the background loop and client once"""
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='llm-event-loop', daemon=True)
+                thread.start()
+
+                self.client = self._create_client()
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._loop = loop
+
+                logger.info(
+                    f"⚡ Async LLM client started (concurrency={self.max_concurrency}, "
+                    f"connections={self.max_connections})"
+                )
+            return self._loop
+
+    def _create_client(self) -> AsyncAzureOpenAI:
+        """AsyncAzureOpenAI backed by a shared, bounded connection pool (or the local mock)"""
+        if AIConfig.LLM_BACKEND == 'mock':
+            from .mock_openai import AsyncMockOpenAI
+            return AsyncMockOpenAI()
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            timeout=AIConfig.LLM_REQUEST_TIMEOUT
+        )
+        return AsyncAzureOpenAI(
+            api_key=AIConfig.AZURE_OPENAI_API_KEY,
+            api_version=AIConfig.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=AIConfig.AZURE_OPENAI_ENDPOINT,
+            http_client=http_client
+        )
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the service loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_started())
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the service loop and block for its result (cancelled on timeout)"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    # ----- rate limiting -----
+
+    async def acquire(self, estimated_tokens: int, max_wait: Optional[float] = None):
+        """
+        Reserve one request and estimated_tokens of daily budget
+
+        Raises:
+            RateLimitExceeded: If budget does not free up within max_wait seconds
+        """
+        max_wait = AIConfig.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        start = time.monotonic()
+        try:
+            await self.request_bucket.acquire(1, max_wait)
+            try:
+                await self.token_bucket.acquire(estimated_tokens, max_wait - (time.monotonic() - start))
+            except (RateLimitExceeded, asyncio.CancelledError):
+                self.request_bucket.refund(1)
+                raise
+        except RateLimitExceeded as e:
+            self.stats['rate_limited'] += 1
+            logger.warning(f"⏳ {e}")
+            raise
+        finally:
+            self.stats['total_wait_ms'] += (time.monotonic() - start) * 1000
+
+    def acquire_blocking(self, estimated_tokens: int, max_wait: Optional[float] = None):
+        """
+        acquire() for synchronous callers, e.g. the sync client in AzureOpenAIService
+
+        The buckets are thread-safe, so the sync and async clients share one
+        budget without going through the event loop.
+
+        Raises:
+            RateLimitExceeded: If budget does not free up within max_wait seconds
+        """
+        max_wait = AIConfig.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait
+        start = time.monotonic()
+        try:
+            self.request_bucket.acquire_blocking(1, max_wait)
+            try:
+                self.token_bucket.acquire_blocking(estimated_tokens, max_wait - (time.monotonic() - start))
+            except RateLimitExceeded:
+                self.request_bucket.refund(1)
+                raise
+        except RateLimitExceeded as e:
+            self.stats['rate_limited'] += 1
+            logger.warning(f"⏳ {e}")
+            raise
+        finally:
+            self.stats['total_wait_ms'] += (time.monotonic() - start) * 1000
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Refund the unused part of a token reservation"""
+        self.stats['total_tokens'] += actual_tokens
+        if estimated_tokens > actual_tokens:
+            self.token_bucket.refund(estimated_tokens - actual_tokens)
+
+    # ----- completions -----
+
+    async def create_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        estimated_input_tokens: Optional[int] = None,
+        **params
+    ):
+        """
+        Rate- and concurrency-limited chat.completions.create
+
+        Args:
+            messages: Chat messages
+            model: Deployment (default: chat/fine-tuned deployment from config)
+            estimated_input_tokens: Input token count if already known
+            **params: Passed to chat.completions.create (temperature, max_tokens, ...)
+
+        Returns:
+            Raw (non-streaming) completion response
+        """
+        self._ensure_started()
+
+        model = model or (
+            AIConfig.AZURE_OPENAI_FINETUNED_DEPLOYMENT
+            if AIConfig.ENABLE_FINETUNED_MODEL and AIConfig.AZURE_OPENAI_FINETUNED_DEPLOYMENT
+            else AIConfig.AZURE_OPENAI_CHAT_DEPLOYMENT
+        )
+        params.setdefault('max_tokens', AIConfig.MAX_TOKENS)
+
+        if estimated_input_tokens is None:
+            # Rough estimate: 1 token ≈ 4 characters
+            estimated_input_tokens = sum(len(m['content']) for m in messages) // 4
+        reserved = estimated_input_tokens + params['max_tokens']
+
+        await self.acquire(reserved)
+
+        async with self._semaphore:
+            self.stats['in_flight'] += 1
+            try:
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **params
+                )
+                self.stats['requests'] += 1
+            except (Exception, asyncio.CancelledError):
+                self.stats['failures'] += 1
+                self.settle(reserved, 0)
+                raise
+            finally:
+                self.stats['in_flight'] -= 1
+
+        usage = getattr(response, 'usage', None)
+        self.settle(reserved, usage.total_tokens if usage else reserved)
+        return response
+
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Get a chat completion
+
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens to generate
+
+        Returns:
+            Response text
+        """
+        response = await self.create_chat_completion(
+            messages,
+            temperature=temperature if temperature is not None else AIConfig.TEMPERATURE,
+            max_tokens=max_tokens if max_tokens is not None else AIConfig.MAX_TOKENS,
+            top_p=AIConfig.TOP_P,
+            frequency_penalty=AIConfig.FREQUENCY_PENALTY,
+            presence_penalty=AIConfig.PRESENCE_PENALTY
+        )
+        return response.choices[0].message.content
+
+    async def gather_completions(self, batch: List[List[Dict[str, str]]], **kwargs) -> List:
+        """Run several completions concurrently (exceptions are returned in place)"""
+        return await asyncio.gather(
+            *(self.chat_completion(messages, **kwargs) for messages in batch),
+            return_exceptions=True
+        )
+
+    def get_stats(self) -> Dict:
+        """Get client statistics"""
+        stats = dict(self.stats)
+        stats['total_wait_ms'] = round(stats['total_wait_ms'], 2)
+        stats.update({
+            'max_concurrency': self.max_concurrency,
+            'requests_available': int(self.request_bucket.available()),
+            'tokens_available_today': int(self.token_bucket.available()),
+            'started': self._loop is not None
+        })
+        return stats
+
+
+# Create singleton instance
+async_ai_service = AsyncAzureOpenAIService()
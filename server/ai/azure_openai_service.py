@@ -5,14 +5,18 @@ Modern AI service wrapper for legal assistant
 
 import os
 import json
+import time
 import logging
+import threading
 import tiktoken
 from typing import List, Dict, Optional, Generator, Union
 from openai import AzureOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
 
 from .config import AIConfig
 from .prompt_templates import PromptTemplates
+from .response_cache import SemanticResponseCache, context_hash
+from .async_openai_service import async_ai_service, RateLimitExceeded
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,38 +37,86 @@ class AzureOpenAIService:
     """
     
     def __init__(self):
-        """Initialize Azure OpenAI client"""
+        """Initialize Azure OpenAI client (or the local mock when LLM_BACKEND=mock)"""
+        if AIConfig.LLM_BACKEND == 'mock':
+            from .mock_openai import MockOpenAI
+            self.client = MockOpenAI()
+            logger.info(f"🧪 Using mock LLM backend: {self.client.backend.get_stats()}")
+        else:
+            self.client = self._create_client()
+        
+        # Tokenizer for cost tracking (loaded on first use unless LAZY_LOAD_MODELS is off)
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
+        if not AIConfig.LAZY_LOAD_MODELS:
+            self.warm_up()
+        
+        # Cost tracking
+        self.total_tokens_used = 0
+        self.total_cost = 0.0
+        
+        # Semantic response cache (opt-in)
+        self.response_cache = None
+        if AIConfig.ENABLE_RESPONSE_CACHE:
+            self.response_cache = SemanticResponseCache(
+                similarity_threshold=AIConfig.RESPONSE_CACHE_SIMILARITY,
+                ttl_seconds=AIConfig.RESPONSE_CACHE_TTL,
+                max_entries=AIConfig.RESPONSE_CACHE_MAX_ENTRIES,
+                use_redis=AIConfig.USE_REDIS
+            )
+    
+    def _create_client(self) -> Optional[AzureOpenAI]:
+        """Azure OpenAI client (None if not configured)"""
         # Validate configuration
         if not AIConfig.validate():
             logger.warning("Azure OpenAI configuration incomplete. Service may not work properly.")
         
-        # Initialize client
         try:
-            self.client = AzureOpenAI(
+            client = AzureOpenAI(
                 api_key=AIConfig.AZURE_OPENAI_API_KEY,
                 api_version=AIConfig.AZURE_OPENAI_API_VERSION,
                 azure_endpoint=AIConfig.AZURE_OPENAI_ENDPOINT
             )
             logger.info("✅ Azure OpenAI client initialized successfully")
             logger.info(f"📊 Configuration: {AIConfig.get_summary()}")
+            return client
         except Exception as e:
             logger.warning(f"⚠️ Azure OpenAI client not initialized: {str(e)}")
             logger.info("💡 Application will run without Azure OpenAI features")
-            self.client = None
-        
-        # Initialize tokenizer for cost tracking
-        try:
-            self.tokenizer = tiktoken.encoding_for_model("gpt-4o-mini")
-        except Exception:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        
-        # Cost tracking
-        self.total_tokens_used = 0
-        self.total_cost = 0.0
+            return None
+    
+    @property
+    def tokenizer(self):
+        """tiktoken encoder, built on first access (False if it could not be loaded)"""
+        if self._tokenizer is None:
+            self.warm_up()
+        return self._tokenizer
+    
+    @property
+    def is_ready(self) -> bool:
+        return self._tokenizer is not None
+    
+    def warm_up(self) -> bool:
+        """Build the tokenizer now (idempotent)"""
+        if self._tokenizer is None:
+            with self._tokenizer_lock:
+                if self._tokenizer is None:
+                    try:
+                        self._tokenizer = tiktoken.encoding_for_model("gpt-4o-mini")
+                    except Exception:
+                        try:
+                            self._tokenizer = tiktoken.get_encoding("cl100k_base")
+                        except Exception as e:
+                            # BPE files could not be downloaded (offline); estimate instead of retrying per call
+                            logger.warning(f"⚠️ Tokenizer unavailable, estimating token counts: {e}")
+                            self._tokenizer = False
+        return True
     
     def count_tokens(self, text: str) -> int:
         """Count tokens in text"""
         try:
+            if not self.tokenizer:
+                return len(text) // 4
             return len(self.tokenizer.encode(text))
         except Exception as e:
             logger.warning(f"Token counting failed: {e}")
@@ -80,13 +132,20 @@ class AzureOpenAIService:
         output_cost = (output_tokens / 1_000_000) * 0.60
         return input_cost + output_cost
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
+    @retry(
+        retry=retry_if_not_exception_type(RateLimitExceeded),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        reraise=True
+    )
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
-        stream: bool = False
+        stream: bool = False,
+        response_format: Optional[Dict] = None,
+        raise_errors: bool = False
     ) -> Union[str, Generator]:
         """
         Get chat completion from Azure OpenAI
@@ -96,11 +155,15 @@ class AzureOpenAIService:
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens to generate
             stream: Whether to stream the response
+            response_format: e.g. {"type": "json_object"}
+            raise_errors: Raise on failure instead of returning an apology message
         
         Returns:
             String response or Generator for streaming
         """
         if not self.client:
+            if raise_errors:
+                raise RuntimeError("Azure OpenAI service not properly configured")
             return "Azure OpenAI service not properly configured. Please check your .env file."
         
         # Use config defaults if not specified
@@ -119,26 +182,114 @@ class AzureOpenAIService:
             
             logger.info(f"💬 Chat request | Deployment: {deployment} | Input tokens: {input_tokens}")
             
-            response = self.client.chat.completions.create(
-                model=deployment,
-                messages=messages,
+            params = dict(
                 temperature=temperature,
                 max_tokens=max_tokens,
                 top_p=AIConfig.TOP_P,
                 frequency_penalty=AIConfig.FREQUENCY_PENALTY,
-                presence_penalty=AIConfig.PRESENCE_PENALTY,
-                stream=stream
+                presence_penalty=AIConfig.PRESENCE_PENALTY
             )
+            if response_format:
+                params['response_format'] = response_format
             
-            if stream:
-                return self._handle_stream(response, input_tokens)
-            else:
+            if AIConfig.USE_ASYNC_LLM_CLIENT and not stream:
+                # Pooled, rate-limited call on the shared async client
+                response = async_ai_service.run(
+                    async_ai_service.create_chat_completion(
+                        messages,
+                        model=deployment,
+                        estimated_input_tokens=input_tokens,
+                        **params
+                    ),
+                    timeout=AIConfig.LLM_REQUEST_TIMEOUT + AIConfig.RATE_LIMIT_MAX_WAIT
+                )
                 return self._handle_response(response, input_tokens)
+            
+            # The sync client (streams, or USE_ASYNC_LLM_CLIENT off) draws from the same rate limits
+            reserved_tokens = input_tokens + max_tokens
+            async_ai_service.acquire_blocking(reserved_tokens)
+            
+            try:
+                response = self.client.chat.completions.create(
+                    model=deployment,
+                    messages=messages,
+                    stream=stream,
+                    **params
+                )
+            except Exception:
+                async_ai_service.settle(reserved_tokens, 0)
+                raise
+            
+            if stream:
+                return self._handle_stream(response, input_tokens, reserved_tokens)
+            
+            usage = getattr(response, 'usage', None)
+            async_ai_service.settle(reserved_tokens, usage.total_tokens if usage else reserved_tokens)
+            return self._handle_response(response, input_tokens)
         
         except Exception as e:
             logger.error(f"❌ Chat completion error: {str(e)}")
+            if raise_errors:
+                raise
             return f"I apologize, but I encountered an error: {str(e)}. Please try again."
     
+    def cached_chat_completion(
+        self,
+        namespace: str,
+        query: str,
+        messages: List[Dict[str, str]],
+        context_parts: Optional[List[str]] = None,
+        query_embedding: Optional[List[float]] = None,
+        **kwargs
+    ) -> str:
+        """
+        Non-streaming chat completion served from the semantic response cache when possible
+        
+        Args:
+            namespace: Cache namespace (one per endpoint/prompt shape)
+            query: User question the cache is matched on
+            messages: Messages sent to the model on a miss
+            context_parts: Everything besides the question the answer depends on
+                           (retrieved context, history, domain); must match exactly for a hit
+            query_embedding: Precomputed embedding of query (embedded here if omitted)
+            **kwargs: Passed through to chat_completion
+        
+        Returns:
+            String response
+        """
+        if not self.response_cache or not self.client:
+            return self.chat_completion(messages, **kwargs)
+        
+        if query_embedding is None:
+            query_embedding = self._embed_query(query)
+        if not query_embedding:
+            return self.chat_completion(messages, **kwargs)
+        
+        context_key = context_hash(messages[0]['content'], *(context_parts or []))
+        cached = self.response_cache.lookup(namespace, query_embedding, context_key)
+        if cached:
+            return cached['response']
+        
+        response = self.chat_completion(messages, **kwargs)
+        
+        # Never cache error fallbacks
+        if isinstance(response, str) and response and not response.startswith("I apologize, but I"):
+            input_text = " ".join([m['content'] for m in messages])
+            tokens = self.count_tokens(input_text) + self.count_tokens(response)
+            self.response_cache.store(namespace, query_embedding, context_key, response, tokens)
+        
+        return response
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a question for the response cache (empty list on failure)"""
+        try:
+            from .embedding_service import embedding_service
+            embeddings = embedding_service.get_embeddings([query])
+            return embeddings[0] if embeddings else []
+        except Exception as e:
+            logger.warning(f"⚠️ Response cache embedding failed: {e}")
+            return []
+    
     def _handle_response(self, response, input_tokens: int) -> str:
         """Handle non-streaming response"""
         try:
@@ -159,11 +310,11 @@ class AzureOpenAIService:
             logger.error(f"Error handling response: {e}")
             return "I apologize, but I couldn't process the response properly."
     
-    def _handle_stream(self, response, input_tokens: int) -> Generator:
+    def _handle_stream(self, response, input_tokens: int, reserved_tokens: int = 0) -> Generator:
         """Handle streaming response"""
         def generate():
+            full_response = ""
             try:
-                full_response = ""
                 for chunk in response:
                     if chunk.choices and len(chunk.choices) > 0:
                         delta = chunk.choices[0].delta
@@ -183,6 +334,11 @@ class AzureOpenAIService:
             except Exception as e:
                 logger.error(f"Error in stream: {e}")
                 yield f"\n\n[Error: {str(e)}]"
+            
+            finally:
+                # Also on errors and client disconnects: charge only what was generated
+                if reserved_tokens:
+                    async_ai_service.settle(reserved_tokens, input_tokens + self.count_tokens(full_response))
         
         return generate()
     
@@ -221,7 +377,15 @@ class AzureOpenAIService:
         # Add current user message
         messages.append({"role": "user", "content": user_message})
         
-        return self.chat_completion(messages, stream=stream)
+        if stream:
+            return self.chat_completion(messages, stream=True)
+        
+        return self.cached_chat_completion(
+            'chat',
+            user_message,
+            messages,
+            context_parts=[json.dumps(messages[1:-1])]
+        )
     
     def analyze_document(
         self,
@@ -329,7 +493,15 @@ class AzureOpenAIService:
             {"role": "user", "content": user_prompt}
         ]
         
-        return self.chat_completion(messages, stream=stream)
+        if stream:
+            return self.chat_completion(messages, stream=True)
+        
+        return self.cached_chat_completion(
+            'legal_question',
+            question,
+            messages,
+            context_parts=[document_context or '']
+        )
     
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=2, max=10))
     def get_embeddings(self, texts: Union[str, List[str]]) -> Union[List[float], List[List[float]]]:
@@ -371,11 +543,26 @@ class AzureOpenAIService:
     
     def get_usage_stats(self) -> Dict:
         """Get usage statistics"""
-        return {
+        stats = {
             'total_tokens': self.total_tokens_used,
             'total_cost_usd': round(self.total_cost, 4),
             'average_cost_per_request': round(self.total_cost / max(1, self.total_tokens_used / 1000), 6)
         }
+        
+        if self.response_cache:
+            cache_stats = self.response_cache.get_stats()
+            # Valued at the input rate: a conservative estimate of the spend avoided
+            cache_stats['cost_saved_usd'] = round(self.estimate_cost(cache_stats['tokens_saved'], 0), 4)
+            stats['response_cache'] = cache_stats
+        
+        # Rate-limit budgets apply to both clients
+        stats['llm_client'] = async_ai_service.get_stats()
+        
+        if AIConfig.LLM_BACKEND == 'mock':
+            from .mock_openai import mock_llm_backend
+            stats['mock_llm'] = mock_llm_backend.get_stats()
+        
+        return stats
     
     def reset_stats(self):
         """Reset usage statistics"""
@@ -767,6 +954,21 @@ Make it conversational and explain why it's needed. Keep it to 1-2 sentences."""
             
             logger.info(f"🔬 Enhanced verification: {document_type} ({verification_level})")
             
+            # Unchanged re-submits are served from the verification cache
+            cache = legal_verifier.cache
+            cache_key = cache.report_key(document_content, document_type, verification_level) if cache else None
+            if cache:
+                cached_report = cache.get_report(cache_key)
+                if cached_report is not None:
+                    logger.info(f"♻️ Verification cache hit | Score: {cached_report['overall_score']}/100")
+                    return {**cached_report, "cache": {"hit": True, **cache.get_stats()}}
+            
+            # Start standard validation for comparison; it runs alongside the verifier stages
+            start = time.perf_counter()
+            standard_futures = legal_verifier.submit_stages({
+                "standard_validation": lambda: self.validate_legal_document(document_content, document_type)
+            })
+            
             # Run comprehensive verification
             verification_report = legal_verifier.verify_document(
                 document_content,
@@ -774,14 +976,19 @@ Make it conversational and explain why it's needed. Keep it to 1-2 sentences."""
                 verification_level
             )
             
-            # Also run standard validation for comparison
-            standard_validation = self.validate_legal_document(document_content, document_type)
+            standard_results, standard_status = legal_verifier.collect_stages(standard_futures, start)
+            standard_validation = standard_results.get("standard_validation", {})
+            
+            stages = {**verification_report.get("stages", {}), **standard_status}
+            incomplete_stages = [name for name, status in stages.items() if status["status"] != "ok"]
             
             # Merge results
             final_report = {
                 "verification_level": verification_level,
                 "overall_score": verification_report.get("overall_score", 0),
-                "compliance_score": standard_validation.get("compliance_score", 0),
+                "compliance_score": standard_validation.get(
+                    "compliance_score", verification_report.get("compliance_score", 0)
+                ),
                 "citation_verification": verification_report.get("citation_verification", {}),
                 "clause_analysis": verification_report.get("clause_analysis", []),
                 "issues": standard_validation.get("issues", []),
@@ -794,10 +1001,27 @@ Make it conversational and explain why it's needed. Keep it to 1-2 sentences."""
                 "consistency_score": verification_report.get("consistency_score", None),
                 "ready_for_execution": verification_report.get("overall_score", 0) >= 80,
                 "recommendations": standard_validation.get("strengths", []),
-                "enforceability_rating": standard_validation.get("enforceability_rating", "medium")
+                "enforceability_rating": standard_validation.get("enforceability_rating", "medium"),
+                "stages": stages,
+                "incomplete_stages": incomplete_stages,
+                "partial": bool(incomplete_stages),
+                "verification_ms": round((time.perf_counter() - start) * 1000, 2)
             }
             
-            logger.info(f"✅ Enhanced verification complete | Score: {final_report['overall_score']}/100")
+            if cache:
+                # Partial reports are not cached so timed-out stages get retried
+                if not final_report["partial"]:
+                    cache.put_report(cache_key, dict(final_report))
+                final_report["cache"] = {
+                    "hit": False,
+                    "clauses": verification_report.get("clause_cache", {}),
+                    **cache.get_stats()
+                }
+            
+            logger.info(
+                f"✅ Enhanced verification complete | Score: {final_report['overall_score']}/100 | "
+                f"{final_report['verification_ms']}ms"
+            )
             return final_report
             
         except Exception as e:
@@ -9,6 +9,9 @@ from typing import Optional
 
 load_dotenv()
 
+# server/ — anchors default on-disk paths regardless of the working directory
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class AIConfig:
     """Configuration class for AI services"""
@@ -25,6 +28,9 @@ class AIConfig:
     AZURE_OPENAI_EMBEDDING_DEPLOYMENT: str = os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT', 'legal-bge-m3')
     AZURE_OPENAI_FINETUNED_DEPLOYMENT: Optional[str] = os.getenv('AZURE_OPENAI_FINETUNED_DEPLOYMENT', None)
     
+    # Chat backend: 'azure' or 'mock' (local stand-in for offline load and latency testing)
+    LLM_BACKEND: str = os.getenv('LLM_BACKEND', 'azure').lower()
+    
     # ===================================
     # CHAT CONFIGURATION
     # ===================================
@@ -47,6 +53,31 @@ class AIConfig:
     COLLECTION_NAME: str = os.getenv('COLLECTION_NAME', 'legal_documents')
     TOP_K_RETRIEVAL: int = int(os.getenv('TOP_K_RETRIEVAL', '5'))
     
+    # Prompt context budgets (exact tiktoken counts)
+    RAG_CONTEXT_MAX_TOKENS: int = int(os.getenv('RAG_CONTEXT_MAX_TOKENS', '2000'))
+    DOCUMENT_QUERY_MAX_TOKENS: int = int(os.getenv('DOCUMENT_QUERY_MAX_TOKENS', '1500'))
+    
+    # Retrieval mode: 'dense' (vectors only) or 'hybrid' (BM25 + vectors fused with RRF)
+    RETRIEVAL_MODE: str = os.getenv('RETRIEVAL_MODE', 'hybrid')
+    HYBRID_DENSE_WEIGHT: float = float(os.getenv('HYBRID_DENSE_WEIGHT', '1.0'))
+    HYBRID_SPARSE_WEIGHT: float = float(os.getenv('HYBRID_SPARSE_WEIGHT', '1.0'))
+    HYBRID_RRF_K: int = int(os.getenv('HYBRID_RRF_K', '60'))
+    HYBRID_CANDIDATE_MULTIPLIER: int = int(os.getenv('HYBRID_CANDIDATE_MULTIPLIER', '3'))  # over-fetch per ranker
+    # Minimum fused relevance (RRF score / score of a document ranked first by both rankers)
+    # for a hybrid hit to enter the prompt and the cited sources; a top-ranked
+    # keyword-only or vector-only hit scores ~0.5 with equal weights
+    HYBRID_MIN_RELEVANCE: float = float(os.getenv('HYBRID_MIN_RELEVANCE', '0.25'))
+    
+    # Cross-encoder reranking: over-fetch RERANK_CANDIDATES, keep the best RERANK_TOP_K
+    ENABLE_RERANKING: bool = os.getenv('ENABLE_RERANKING', 'false').lower() == 'true'
+    RERANKER_MODEL: str = os.getenv('RERANKER_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+    RERANK_CANDIDATES: int = int(os.getenv('RERANK_CANDIDATES', '20'))
+    RERANK_TOP_K: int = int(os.getenv('RERANK_TOP_K', '3'))
+    RERANK_MIN_RELEVANCE: float = float(os.getenv('RERANK_MIN_RELEVANCE', '0.1'))  # cross-encoder score in [0, 1]
+    RERANK_BATCH_SIZE: int = int(os.getenv('RERANK_BATCH_SIZE', '16'))
+    RERANK_MAX_LENGTH: int = int(os.getenv('RERANK_MAX_LENGTH', '512'))  # tokens per query+passage pair
+    RERANK_CACHE_SIZE: int = int(os.getenv('RERANK_CACHE_SIZE', '10000'))
+    
     # ===================================
     # EMBEDDING CONFIGURATION
     # ===================================
@@ -68,12 +99,50 @@ class AIConfig:
         LEGAL_EMBEDDING_MODELS['bge-m3']
     )
     
+    # Embedding cache (memory LRU + on-disk SQLite, keyed by model + text hash)
+    ENABLE_EMBEDDING_CACHE: bool = os.getenv('ENABLE_EMBEDDING_CACHE', 'true').lower() == 'true'
+    EMBEDDING_CACHE_DIR: str = os.getenv('EMBEDDING_CACHE_DIR', os.path.join(SERVER_DIR, 'embedding_cache'))
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = int(os.getenv('EMBEDDING_CACHE_MEMORY_ITEMS', '10000'))
+    EMBEDDING_CACHE_DISK_MB: int = int(os.getenv('EMBEDDING_CACHE_DISK_MB', '512'))
+    
+    # Batched embedding for uploads (chunks are length-sorted, then grouped)
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+    EMBEDDING_MAX_BATCH_CHARS: int = int(os.getenv('EMBEDDING_MAX_BATCH_CHARS', '64000'))  # caps peak activation memory
+    
+    # Shared embedding server (python -m ai.embedding_server), one model copy per node
+    # e.g. unix:///tmp/legal-embeddings.sock or http://127.0.0.1:8765; empty loads the model in-process
+    EMBEDDING_SERVER_URL: str = os.getenv('EMBEDDING_SERVER_URL', '')
+    EMBEDDING_SERVER_TIMEOUT: float = float(os.getenv('EMBEDDING_SERVER_TIMEOUT', '30'))
+    
+    # Micro-batching of concurrent embedding requests (in-process and in the embedding server)
+    ENABLE_EMBEDDING_MICRO_BATCHING: bool = os.getenv('ENABLE_EMBEDDING_MICRO_BATCHING', 'true').lower() == 'true'
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv('EMBEDDING_BATCH_MAX_SIZE', '64'))
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = float(os.getenv('EMBEDDING_BATCH_MAX_WAIT_MS', '5'))
+    
+    # Storage of uploaded-document chunk matrices ('float32', 'float16' or 'int8' scalar-quantized)
+    ANALYZER_EMBEDDING_DTYPE: str = os.getenv('ANALYZER_EMBEDDING_DTYPE', 'float32')
+    # Reduced dimension (0 = full); truncates (Matryoshka-style) unless a PCA projection is given
+    ANALYZER_EMBEDDING_DIM: int = int(os.getenv('ANALYZER_EMBEDDING_DIM', '0'))
+    ANALYZER_EMBEDDING_PCA_PATH: str = os.getenv('ANALYZER_EMBEDDING_PCA_PATH', '')  # .npz from scripts/benchmark_embedding_storage.py --save-pca
+    
+    # Uploaded-document store (analysis sessions)
+    ANALYZER_STORE_MAX_MB: int = int(os.getenv('ANALYZER_STORE_MAX_MB', '512'))
+    ANALYZER_STORE_TTL: int = int(os.getenv('ANALYZER_STORE_TTL', '3600'))  # seconds idle before expiry
+    ANALYZER_MAX_DOCS_PER_USER: int = int(os.getenv('ANALYZER_MAX_DOCS_PER_USER', '10'))
+    ANALYZER_SPILL_DIRECTORY: str = os.getenv('ANALYZER_SPILL_DIRECTORY', '')  # empty disables spill-to-disk
+    
     # ===================================
     # DOCUMENT PROCESSING
     # ===================================
     CHUNK_SIZE: int = int(os.getenv('CHUNK_SIZE', '1000'))
     CHUNK_OVERLAP: int = int(os.getenv('CHUNK_OVERLAP', '200'))
     
+    # Parallel parsing for knowledge-base ingestion (1 = parse in-process, sequentially)
+    INGEST_WORKERS: int = int(os.getenv('INGEST_WORKERS', str(min(4, os.cpu_count() or 1))))
+    INGEST_QUEUE_SIZE: int = int(os.getenv('INGEST_QUEUE_SIZE', '0'))  # parsed files held ahead of the embedder (0 = 2x workers)
+    # Worker start method: 'spawn' (safe default), 'forkserver' or 'fork' (only from single-threaded scripts)
+    INGEST_START_METHOD: str = os.getenv('INGEST_START_METHOD', 'spawn')
+    
     # ===================================
     # REDIS CONFIGURATION (For caching)
     # ===================================
@@ -82,6 +151,25 @@ class AIConfig:
     REDIS_DB: int = int(os.getenv('REDIS_DB', '0'))
     REDIS_PASSWORD: Optional[str] = os.getenv('REDIS_PASSWORD', None)
     USE_REDIS: bool = os.getenv('USE_REDIS', 'false').lower() == 'true'
+
+    # Semantic response cache (reuses answers for near-duplicate questions over identical context)
+    ENABLE_RESPONSE_CACHE: bool = os.getenv('ENABLE_RESPONSE_CACHE', 'false').lower() == 'true'
+    RESPONSE_CACHE_SIMILARITY: float = float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.95'))
+    RESPONSE_CACHE_TTL: int = int(os.getenv('RESPONSE_CACHE_TTL', '86400'))  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '5000'))
+    
+    # ===================================
+    # VERIFICATION
+    # ===================================
+    # Independent LLM stages of document verification run concurrently
+    VERIFIER_MAX_WORKERS: int = int(os.getenv('VERIFIER_MAX_WORKERS', '8'))
+    VERIFIER_STAGE_TIMEOUT: float = float(os.getenv('VERIFIER_STAGE_TIMEOUT', '90'))  # seconds from fan-out
+    
+    # Verification cache (whole reports + per-clause analyses, keyed by normalized content hash)
+    ENABLE_VERIFICATION_CACHE: bool = os.getenv('ENABLE_VERIFICATION_CACHE', 'true').lower() == 'true'
+    VERIFICATION_CACHE_MAX_DOCUMENTS: int = int(os.getenv('VERIFICATION_CACHE_MAX_DOCUMENTS', '500'))
+    VERIFICATION_CACHE_MAX_CLAUSES: int = int(os.getenv('VERIFICATION_CACHE_MAX_CLAUSES', '20000'))
+    VERIFICATION_CACHE_TTL: int = int(os.getenv('VERIFICATION_CACHE_TTL', '86400'))  # seconds
     
     # ===================================
     # FEATURE FLAGS
@@ -90,6 +178,12 @@ class AIConfig:
     ENABLE_RAG: bool = os.getenv('ENABLE_RAG', 'true').lower() == 'true'
     ENABLE_FINETUNED_MODEL: bool = os.getenv('ENABLE_FINETUNED_MODEL', 'false').lower() == 'true'
     
+    # Startup: load embedding model / ChromaDB / tokenizer on first use instead of at import.
+    # WARMUP_ON_STARTUP loads them in a background thread once the app is serving; it is off
+    # by default because it makes every worker hold the models, even ones that never use them
+    LAZY_LOAD_MODELS: bool = os.getenv('LAZY_LOAD_MODELS', 'true').lower() == 'true'
+    WARMUP_ON_STARTUP: bool = os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true'
+    
     # ===================================
     # LOGGING
     # ===================================
@@ -101,10 +195,39 @@ class AIConfig:
     # ===================================
     MAX_REQUESTS_PER_MINUTE: int = int(os.getenv('MAX_REQUESTS_PER_MINUTE', '60'))
     MAX_TOKENS_PER_DAY: int = int(os.getenv('MAX_TOKENS_PER_DAY', '1000000'))
+    RATE_LIMIT_MAX_WAIT: float = float(os.getenv('RATE_LIMIT_MAX_WAIT', '30'))  # seconds a call may queue for budget
+    
+    # Async LLM client (shared connection pool, bounded concurrency)
+    USE_ASYNC_LLM_CLIENT: bool = os.getenv('USE_ASYNC_LLM_CLIENT', 'false').lower() == 'true'
+    LLM_MAX_CONCURRENCY: int = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+    LLM_REQUEST_TIMEOUT: float = float(os.getenv('LLM_REQUEST_TIMEOUT', '60'))
+    
+    # ===================================
+    # MOCK LLM BACKEND (LLM_BACKEND=mock)
+    # ===================================
+    # Time to first token: fixed, uniform, normal, lognormal or exponential with this mean / std dev
+    MOCK_LLM_LATENCY_DISTRIBUTION: str = os.getenv('MOCK_LLM_LATENCY_DISTRIBUTION', 'lognormal')
+    MOCK_LLM_LATENCY_MS: float = float(os.getenv('MOCK_LLM_LATENCY_MS', '400'))
+    MOCK_LLM_LATENCY_STD_MS: float = float(os.getenv('MOCK_LLM_LATENCY_STD_MS', '150'))
+    MOCK_LLM_TOKENS_PER_SECOND: float = float(os.getenv('MOCK_LLM_TOKENS_PER_SECOND', '60'))  # 0 = instant
+    MOCK_LLM_OUTPUT_TOKENS: int = int(os.getenv('MOCK_LLM_OUTPUT_TOKENS', '200'))  # capped by max_tokens
+    
+    # Failure injection
+    MOCK_LLM_FAILURE_RATE: float = float(os.getenv('MOCK_LLM_FAILURE_RATE', '0.0'))
+    MOCK_LLM_FAILURE_STATUS: str = os.getenv('MOCK_LLM_FAILURE_STATUS', '429,500,503')
+    MOCK_LLM_STREAM_ABORT_RATE: float = float(os.getenv('MOCK_LLM_STREAM_ABORT_RATE', '0.0'))
+    
+    MOCK_LLM_EMBEDDING_DIM: int = int(os.getenv('MOCK_LLM_EMBEDDING_DIM', '1024'))
+    MOCK_LLM_SEED: Optional[int] = int(os.getenv('MOCK_LLM_SEED')) if os.getenv('MOCK_LLM_SEED') else None
     
     @classmethod
     def validate(cls) -> bool:
         """Validate that all required configuration is present"""
+        if cls.LLM_BACKEND == 'mock':
+            # The local stand-in needs no credentials
+            return True
+        
         required_fields = [
             'AZURE_OPENAI_API_KEY',
             'AZURE_OPENAI_ENDPOINT',
@@ -129,6 +252,7 @@ class AIConfig:
     def get_summary(cls) -> dict:
         """Get configuration summary (safe for logging)"""
         return {
+            'llm_backend': cls.LLM_BACKEND,
             'chat_model': cls.AZURE_OPENAI_CHAT_DEPLOYMENT,
             'embedding_model': cls.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
             'max_tokens': cls.MAX_TOKENS,
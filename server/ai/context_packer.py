@@ -0,0 +1,268 @@
+"""
+Context Packer
+Fills an exact prompt token budget with retrieved or document context
+
+Token counts come from the cached tiktoken encoder of the chat service
+(falling back to ~4 characters per token if it is unavailable):
+- Whole chunks are packed greedily by score per token
+- Leftover budget is filled with the next best chunk trimmed at a sentence boundary
+- The result reports tokens used against the budget
+"""
+
+import re
+import logging
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sentence / clause boundaries for trimming
+SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+|\n+')
+HTML_TAG = re.compile(r'<[^>]+>')
+
+
+@dataclass
+class PackedContext:
+    """Packed context text and its budget accounting"""
+    text: str = ''
+    tokens_used: int = 0
+    token_budget: int = 0
+    items_used: int = 0
+    items_total: int = 0
+    items_trimmed: int = 0
+
+    def to_dict(self) -> Dict:
+        """Budget report (without the text)"""
+        report = asdict(self)
+        del report['text']
+        report['tokens_available'] = max(0, self.token_budget - self.tokens_used)
+        return report
+
+
+class ContextPacker:
+    """
+    Token-exact context packing
+
+    Features:
+    - Exact token counts with the shared tiktoken encoder
+    - Greedy packing of whole items by score per token
+    - Sentence-boundary trimming of the best item that did not fit
+    - Document packing: whole document if it fits, otherwise the passages
+      most relevant to the query, in document order
+    """
+
+    MIN_TRIM_TOKENS = 40  # smaller fragments are not worth including
+    GAP_MARKER = '[...]'
+
+    def __init__(self, encoder=None):
+        """
+        Initialize packer
+
+        Args:
+            encoder: tiktoken encoding (default: the chat service's cached encoder)
+        """
+        self._encoder = encoder
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            try:
+                from .azure_openai_service import ai_service
+                self._encoder = ai_service.tokenizer
+            except Exception as e:
+                logger.warning(f"⚠️ Tokenizer unavailable, estimating context tokens: {e}")
+                self._encoder = False
+        return self._encoder or None
+
+    def count(self, text: str) -> int:
+        """Token count of text"""
+        if not text:
+            return 0
+        encoder = self.encoder
+        if encoder is None:
+            # Rough estimate: 1 token ≈ 4 characters
+            return (len(text) + 3) // 4
+        return len(encoder.encode(text))
+
+    def trim(self, text: str, max_tokens: int) -> str:
+        """
+        Longest prefix of text within max_tokens, cut at a sentence boundary
+
+        Falls back to a word boundary when even the first sentence is too long.
+        """
+        if max_tokens <= 0:
+            return ''
+        if self.count(text) <= max_tokens:
+            return text
+
+        # Token count grows with prefix length, so binary search the boundaries
+        ends = [match.start() for match in SENTENCE_END.finditer(text)]
+        best, low, high = 0, 0, len(ends) - 1
+        while low <= high:
+            mid = (low + high) // 2
+            if self.count(text[:ends[mid]]) <= max_tokens:
+                best = ends[mid]
+                low = mid + 1
+            else:
+                high = mid - 1
+        if best:
+            return text[:best].rstrip()
+
+        encoder = self.encoder
+        if encoder is None:
+            prefix = text[:max_tokens * 4]
+        else:
+            prefix = encoder.decode(encoder.encode(text)[:max_tokens])
+        cut = prefix.rfind(' ')
+        return (prefix[:cut] if cut > 0 else prefix).rstrip()
+
+    def pack(
+        self,
+        items: List[Dict],
+        max_tokens: int,
+        header: str = '',
+        separator: str = '\n\n',
+        gap_marker: Optional[str] = None
+    ) -> PackedContext:
+        """
+        Pack items into a token budget
+
+        Args:
+            items: [{'body', 'score', 'prefix'?}] in output order; the prefix
+                (e.g. a citation line) is kept whole, only the body is trimmed
+            max_tokens: Budget for the whole packed text including header
+            header: Text placed before the items (counted against the budget)
+            separator: Placed between items (counted against the budget)
+            gap_marker: Inserted where skipped items leave a gap (None disables)
+
+        Returns:
+            PackedContext (text is empty if nothing fits)
+        """
+        result = PackedContext(token_budget=max_tokens, items_total=len(items))
+        if not items or max_tokens <= 0:
+            return result
+
+        overheads = [self.count(item.get('prefix', '') + separator) for item in items]
+        costs = [overhead + self.count(item['body']) for item, overhead in zip(items, overheads)]
+        remaining = max_tokens - self.count(header)
+        if gap_marker:
+            # Reserve room for a few gap markers
+            remaining -= 3 * self.count(gap_marker + separator)
+
+        # Greedy by relevance per token
+        chosen: Dict[int, str] = {}
+        by_density = sorted(range(len(items)), key=lambda i: items[i]['score'] / max(costs[i], 1), reverse=True)
+        for i in by_density:
+            if costs[i] <= remaining:
+                chosen[i] = items[i]['body']
+                remaining -= costs[i]
+
+        # Fill what is left with the most relevant item that did not fit, trimmed
+        trimmed = set()
+        for i in sorted((i for i in range(len(items)) if i not in chosen), key=lambda i: -items[i]['score']):
+            if remaining - overheads[i] < self.MIN_TRIM_TOKENS:
+                break
+            body = self.trim(items[i]['body'], remaining - overheads[i])
+            if self.count(body) >= self.MIN_TRIM_TOKENS:
+                chosen[i] = body
+                trimmed.add(i)
+                remaining -= overheads[i] + self.count(body)
+                break
+
+        # Token counts are not exactly additive across joins; enforce the budget on the final text
+        text = self._render(items, chosen, header, separator, gap_marker)
+        tokens = self.count(text)
+        while tokens > max_tokens and chosen:
+            worst = min(chosen, key=lambda i: items[i]['score'] / max(costs[i], 1))
+            del chosen[worst]
+            trimmed.discard(worst)
+            text = self._render(items, chosen, header, separator, gap_marker)
+            tokens = self.count(text)
+
+        if not chosen:
+            return result
+
+        result.text = text
+        result.tokens_used = tokens
+        result.items_used = len(chosen)
+        result.items_trimmed = len(trimmed)
+        return result
+
+    @staticmethod
+    def _render(
+        items: List[Dict],
+        chosen: Dict[int, str],
+        header: str,
+        separator: str,
+        gap_marker: Optional[str]
+    ) -> str:
+        parts = []
+        previous = -1
+        for i in sorted(chosen):
+            if gap_marker and i != previous + 1:
+                parts.append(gap_marker)
+            parts.append(items[i].get('prefix', '') + chosen[i])
+            previous = i
+        if gap_marker and chosen and previous != len(items) - 1:
+            parts.append(gap_marker)
+        return header + separator.join(parts)
+
+    def pack_document(
+        self,
+        document: str,
+        query: str,
+        max_tokens: int,
+        prefer_start: bool = False
+    ) -> PackedContext:
+        """
+        Fit a document into a token budget
+
+        The whole document is used when it fits. Otherwise it is split into
+        passages that are ranked by BM25 relevance to the query (plus a
+        preference for the opening passages) and packed in document order.
+
+        Args:
+            document: Document text or HTML
+            query: User query used to rank passages
+            max_tokens: Budget for the document context
+            prefer_start: Weight position over relevance (e.g. for summaries)
+
+        Returns:
+            PackedContext
+        """
+        tokens = self.count(document)
+        if tokens <= max_tokens:
+            return PackedContext(
+                text=document, tokens_used=tokens, token_budget=max_tokens, items_used=1, items_total=1
+            )
+
+        from .sparse_index import BM25Index
+
+        if HTML_TAG.search(document):
+            from .document_patcher import split_blocks, strip_tags
+            passages = [block for block in split_blocks(document) if strip_tags(block)]
+            plain = [strip_tags(block) for block in passages]
+            separator = '\n'
+        else:
+            passages = [p.strip() for p in re.split(r'\n\s*\n', document) if p.strip()]
+            plain = passages
+            separator = '\n\n'
+
+        index = BM25Index()
+        index.add([str(i) for i in range(len(passages))], plain)
+        relevance = {int(doc_id): score for doc_id, score in index.search(query, n_results=len(passages))}
+        top = max(relevance.values(), default=0) or 1.0
+
+        position_weight = 1.0 if prefer_start else 0.2
+        items = [
+            {
+                'body': passage.strip(),
+                'score': relevance.get(i, 0.0) / top + position_weight * (1 - i / len(passages)) + 0.01
+            }
+            for i, passage in enumerate(passages)
+        ]
+        return self.pack(items, max_tokens, separator=separator, gap_marker=self.GAP_MARKER)
+
+
+# Singleton instance
+context_packer = ContextPacker()
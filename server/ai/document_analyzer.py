@@ -5,34 +5,44 @@ Uses BGE-M3 embeddings for efficient token usage
 
 import logging
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional
 from pathlib import Path
+import numpy as np
 import pdfplumber
 from docx import Document as DocxDocument
 from ai.embedding_service import embedding_service
 from ai.azure_openai_service import ai_service
+from ai.document_store import DocumentStore, create_document_store
+from ai.embedding_quantization import EmbeddingQuantizer
 
 logger = logging.getLogger(__name__)
 
 class DocumentAnalyzer:
     """Analyzes uploaded legal documents efficiently using RAG"""
     
-    def __init__(self):
-        self.documents = {}  # Session-based storage: {doc_id: {chunks, metadata}}
+    def __init__(self, store: Optional[DocumentStore] = None, quantizer: Optional[EmbeddingQuantizer] = None):
+        # Session-based storage: {doc_id: {chunks, embeddings, metadata}}, bounded and evicting
+        self.documents = store or create_document_store()
         self.chunk_size = 800  # tokens per chunk
         self.chunk_overlap = 100  # overlap for context continuity
+        # Storage precision / dimension of chunk embeddings (float32, float16, int8; optional truncation or PCA)
+        self.quantizer = quantizer or EmbeddingQuantizer.from_config()
     
     def extract_text_from_pdf(self, file_path: str) -> str:
         """Extract text from PDF using pdfplumber"""
+        text = "".join(self.iter_pdf_pages(file_path))
+        logger.info(f"✅ Extracted {len(text)} characters from PDF")
+        return text
+    
+    def iter_pdf_pages(self, file_path: str) -> Iterator[str]:
+        """Yield page-marked PDF text one page at a time, releasing each page's cache"""
         try:
-            text = ""
             with pdfplumber.open(file_path) as pdf:
                 for page_num, page in enumerate(pdf.pages, 1):
                     page_text = page.extract_text() or ""
-                    text += f"\n--- Page {page_num} ---\n{page_text}"
-            
-            logger.info(f"✅ Extracted {len(text)} characters from PDF")
-            return text
+                    if hasattr(page, 'close'):
+                        page.close()
+                    yield f"\n--- Page {page_num} ---\n{page_text}"
         except Exception as e:
             logger.error(f"❌ PDF extraction error: {e}")
             raise
@@ -54,38 +64,71 @@ class DocumentAnalyzer:
     
     def chunk_text(self, text: str) -> List[Dict[str, Any]]:
         """Split text into overlapping chunks for efficient retrieval"""
-        words = text.split()
-        chunks = []
+        chunks = list(self.iter_chunks([text]))
+        logger.info(f"📦 Created {len(chunks)} chunks")
+        return chunks
+    
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Incrementally chunk a stream of text pieces (e.g. PDF pages)
         
+        Chunks are emitted as soon as enough words have arrived, so only about
+        one chunk of words is buffered while later pages are still being parsed.
+        """
         # Approximate: 1 token ≈ 0.75 words
         words_per_chunk = int(self.chunk_size * 0.75)
         overlap_words = int(self.chunk_overlap * 0.75)
+        step = words_per_chunk - overlap_words
         
-        start = 0
+        buffer: List[str] = []
+        start = 0  # word offset of buffer[0] in the whole document
         chunk_id = 0
         
-        while start < len(words):
-            end = min(start + words_per_chunk, len(words))
-            chunk_text = ' '.join(words[start:end])
-            
-            chunks.append({
+        def make_chunk() -> Dict[str, Any]:
+            end = start + min(words_per_chunk, len(buffer))
+            chunk_text = ' '.join(buffer[:words_per_chunk])
+            return {
                 'chunk_id': chunk_id,
                 'text': chunk_text,
                 'start_word': start,
                 'end_word': end,
                 'length': len(chunk_text)
-            })
+            }
+        
+        for piece in pieces:
+            buffer.extend(piece.split())
             
-            chunk_id += 1
-            start += words_per_chunk - overlap_words
+            while len(buffer) >= words_per_chunk + step:
+                yield make_chunk()
+                chunk_id += 1
+                del buffer[:step]
+                start += step
         
-        logger.info(f"📦 Created {len(chunks)} chunks")
-        return chunks
+        # Flush the tail (overlapping windows until the end is covered)
+        while buffer:
+            yield make_chunk()
+            chunk_id += 1
+            del buffer[:step]
+            start += step
     
-    def process_document(self, file_path: str, filename: str) -> str:
+    def process_document(
+        self,
+        file_path: str,
+        filename: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        batch_size: Optional[int] = None,
+        owner: Optional[str] = None
+    ) -> str:
         """
         Process uploaded document and prepare for analysis
         
+        Args:
+            file_path: Path to the uploaded file
+            filename: Original filename (used for type detection)
+            progress_callback: Called as progress_callback(chunks_done, total_chunks)
+            batch_size: Chunks per embedding batch (default: AIConfig.EMBEDDING_BATCH_SIZE)
+            owner: User or client the upload counts against for per-user quotas
+        
         Returns:
             document_id: Unique ID for session-based queries
         """
@@ -94,31 +137,44 @@ class DocumentAnalyzer:
             
             # Extract text based on file type
             if file_ext == '.pdf':
-                text = self.extract_text_from_pdf(file_path)
+                # Chunk pages as they are parsed instead of after the whole PDF is read
+                pages: List[str] = []
+                
+                def collect_pages() -> Iterator[str]:
+                    for page_text in self.iter_pdf_pages(file_path):
+                        pages.append(page_text)
+                        yield page_text
+                
+                chunks = list(self.iter_chunks(collect_pages()))
+                text = "".join(pages)
+                logger.info(f"✅ Extracted {len(text)} characters from PDF")
             elif file_ext in ['.docx', '.doc']:
                 text = self.extract_text_from_docx(file_path)
+                chunks = self.chunk_text(text)
             else:
                 raise ValueError(f"Unsupported file type: {file_ext}")
             
-            # Chunk the document
-            chunks = self.chunk_text(text)
+            logger.info(f"📦 Created {len(chunks)} chunks")
             
-            # Generate embeddings for each chunk using BGE-M3
-            logger.info("🔄 Generating BGE-M3 embeddings...")
-            for chunk in chunks:
-                embedding = embedding_service.get_embeddings(chunk['text'])
-                chunk['embedding'] = embedding
+            # Generate embeddings for all chunks in length-sorted batches using BGE-M3
+            logger.info(f"🔄 Generating BGE-M3 embeddings for {len(chunks)} chunks...")
+            embeddings = embedding_service.get_embeddings_batched(
+                [chunk['text'] for chunk in chunks],
+                batch_size=batch_size,
+                progress_callback=progress_callback
+            )
             
-            # Store in session memory
+            # Store in session memory (embeddings as one pre-normalized, quantized matrix, row i = chunk i)
             doc_id = str(uuid.uuid4())[:8]
-            self.documents[doc_id] = {
+            self.documents.put(doc_id, {
                 'filename': filename,
                 'full_text': text,
                 'chunks': chunks,
+                **self.quantizer.encode(embeddings),
                 'total_chunks': len(chunks),
                 'word_count': len(text.split()),
                 'char_count': len(text)
-            }
+            }, owner=owner)
             
             logger.info(f"✅ Document processed: {filename} → ID: {doc_id}")
             return doc_id
@@ -131,39 +187,39 @@ class DocumentAnalyzer:
         """
         Retrieve most relevant chunks using BGE-M3 similarity
         
+        Scores every chunk with one matrix-vector product against the
+        pre-normalized (possibly quantized) embedding matrix, then selects
+        top_k with argpartition.
         This is where we save tokens - only send relevant chunks to GPT!
         """
-        if doc_id not in self.documents:
+        doc = self.documents.get(doc_id)
+        if doc is None:
             raise ValueError(f"Document {doc_id} not found in session")
         
-        # Generate query embedding
-        query_embedding = embedding_service.get_embeddings(query)
+        chunks = doc['chunks']
         
-        # Calculate cosine similarity with all chunks
-        chunks = self.documents[doc_id]['chunks']
+        if doc['embeddings'].shape[0] == 0:
+            return []
         
-        # Simple cosine similarity
-        import numpy as np
+        # Cosine similarity for all chunks in a single BLAS call (query is reduced and normalized to match)
+        query_emb = embedding_service.get_embeddings(query)[0]
+        scores = self.quantizer.scores(doc, query_emb)
         
-        scored_chunks = []
-        for chunk in chunks:
-            chunk_emb = np.array(chunk['embedding'])
-            query_emb = np.array(query_embedding)
-            
-            # Cosine similarity
-            similarity = np.dot(chunk_emb, query_emb) / (
-                np.linalg.norm(chunk_emb) * np.linalg.norm(query_emb)
-            )
-            
-            scored_chunks.append({
-                'chunk_id': chunk['chunk_id'],
-                'text': chunk['text'],
-                'similarity': float(similarity)
-            })
+        k = min(top_k, scores.shape[0])
+        if k < scores.shape[0]:
+            top_idx = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top_idx = np.arange(scores.shape[0])
+        top_idx = top_idx[np.argsort(-scores[top_idx])]
         
-        # Sort by similarity and return top_k
-        scored_chunks.sort(key=lambda x: x['similarity'], reverse=True)
-        top_chunks = scored_chunks[:top_k]
+        top_chunks = [
+            {
+                'chunk_id': chunks[i]['chunk_id'],
+                'text': chunks[i]['text'],
+                'similarity': float(scores[i])
+            }
+            for i in top_idx
+        ]
         
         logger.info(f"🎯 Retrieved {len(top_chunks)} relevant chunks for query")
         return top_chunks
@@ -307,8 +363,7 @@ class DocumentAnalyzer:
     
     def clear_document(self, doc_id: str):
         """Remove document from session"""
-        if doc_id in self.documents:
-            del self.documents[doc_id]
+        if self.documents.delete(doc_id):
             logger.info(f"🗑️ Document {doc_id} removed from session")
 
 
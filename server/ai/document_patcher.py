@@ -0,0 +1,286 @@
+"""
+Document Patcher
+Fixes validation issues with targeted patches instead of full rewrites
+
+The document is split into blocks (paragraphs, headings, list items).
+Only the blocks relevant to the issues are sent to the model, which
+returns anchor/replacement patches per block; the patches are applied
+locally so output tokens scale with the size of the fix, not the document.
+"""
+
+import re
+import json
+import html
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .azure_openai_service import ai_service
+from .sparse_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+# Block boundaries: closing tags of block-level HTML elements
+BLOCK_END = re.compile(
+    r'</(?:p|h[1-6]|li|div|tr|table|ul|ol|blockquote|section|pre)>\s*|<br\s*/?>\s*',
+    re.IGNORECASE
+)
+HEADING = re.compile(r'^\s*<h[1-6]\b', re.IGNORECASE)
+TAG = re.compile(r'<[^>]+>')
+
+
+def strip_tags(fragment: str) -> str:
+    """Visible text of an HTML fragment"""
+    return ' '.join(html.unescape(TAG.sub(' ', fragment)).split())
+
+
+def split_blocks(document: str) -> List[str]:
+    """
+    Split a document into blocks whose concatenation is the original document
+
+    HTML is split after block-level closing tags; plain text is split by line.
+    """
+    if TAG.search(document):
+        blocks, start = [], 0
+        for match in BLOCK_END.finditer(document):
+            blocks.append(document[start:match.end()])
+            start = match.end()
+        if start < len(document):
+            blocks.append(document[start:])
+        return blocks
+
+    return document.splitlines(keepends=True)
+
+
+class DocumentPatcher:
+    """
+    Structured-edit fixer for legal documents
+
+    Features:
+    - BM25 selection of the blocks relevant to each issue (plus neighbours)
+    - Heading outline so missing clauses can be inserted in the right place
+    - JSON patches: replace / insert_after / delete, anchored per block
+    - Whitespace-tolerant anchor matching, with per-patch failure reporting
+    """
+
+    BLOCKS_PER_ISSUE = 3
+    NEIGHBOURS = 1
+    MAX_CONTEXT_BLOCKS = 40
+    MAX_OUTLINE_ENTRIES = 60
+
+    def select_blocks(self, blocks: List[str], issues: List[Dict]) -> List[int]:
+        """Indices of the blocks to send as context, in document order"""
+        index = BM25Index()
+        index.add([str(i) for i in range(len(blocks))], [strip_tags(block) for block in blocks])
+
+        selected = set()
+        for issue in issues:
+            query = ' '.join(str(issue.get(field, '')) for field in (
+                'location', 'clause_reference', 'issue_type', 'issue', 'description', 'suggestion', 'recommendation'
+            ))
+            for doc_id, _ in index.search(query, n_results=self.BLOCKS_PER_ISSUE):
+                block = int(doc_id)
+                selected.update(range(block - self.NEIGHBOURS, block + self.NEIGHBOURS + 1))
+
+        # Missing clauses usually go near the end (before signatures)
+        content = [i for i, block in enumerate(blocks) if strip_tags(block)]
+        selected.update(content[-3:])
+
+        valid = sorted(i for i in selected if 0 <= i < len(blocks) and strip_tags(blocks[i]))
+        return valid[:self.MAX_CONTEXT_BLOCKS]
+
+    def build_outline(self, blocks: List[str]) -> List[Tuple[int, str]]:
+        """(block id, heading text) for headings and numbered clause titles"""
+        outline = []
+        for i, block in enumerate(blocks):
+            text = strip_tags(block)
+            if text and (HEADING.match(block) or re.match(r'^(?:\d+[.)]|clause|article|section)\s', text, re.IGNORECASE)):
+                outline.append((i, text[:80]))
+        return outline[:self.MAX_OUTLINE_ENTRIES]
+
+    def fix_issues(self, document: str, issues: List[Dict]) -> Dict:
+        """
+        Fix issues by requesting and applying patches
+
+        Args:
+            document: Document HTML (or plain text)
+            issues: Validation issues to fix
+
+        Returns:
+            {success, fixed_document, applied, failed, blocks_sent, blocks_total}
+            (success is False when the model returned no usable patches)
+        """
+        blocks = split_blocks(document)
+        selected = self.select_blocks(blocks, issues)
+        outline = self.build_outline(blocks)
+
+        messages = [
+            {
+                "role": "system",
+                "content": "You are a legal document editor. Return only JSON patches, never the whole document."
+            },
+            {"role": "user", "content": self._build_prompt(blocks, selected, outline, issues)}
+        ]
+
+        # Output budget scales with the number of fixes, not the document length
+        max_tokens = min(4000, 600 + 400 * len(issues))
+        response = ai_service.chat_completion(messages, temperature=0.3, max_tokens=max_tokens)
+
+        patches = self._parse_patches(response)
+        result = {
+            'success': False,
+            'fixed_document': document,
+            'applied': 0,
+            'failed': [],
+            'blocks_sent': len(selected),
+            'blocks_total': len(blocks)
+        }
+        if not patches:
+            logger.warning("⚠️ No usable patches returned")
+            return result
+
+        fixed_document, applied, failed = self.apply_patches(blocks, patches)
+        result.update({
+            'success': applied > 0,
+            'fixed_document': fixed_document,
+            'applied': applied,
+            'failed': failed
+        })
+
+        logger.info(
+            f"🩹 Applied {applied}/{len(patches)} patches | context {len(selected)}/{len(blocks)} blocks"
+        )
+        return result
+
+    def _build_prompt(
+        self,
+        blocks: List[str],
+        selected: List[int],
+        outline: List[Tuple[int, str]],
+        issues: List[Dict]
+    ) -> str:
+        issues_summary = "\n".join([
+            f"{i+1}. [{issue.get('severity', 'medium').upper()}] {issue.get('issue_type', issue.get('issue', 'Unknown'))}: "
+            f"{issue.get('description', issue.get('issue', ''))}\n"
+            f"   Location: {issue.get('location', issue.get('clause_reference', 'Not specified'))}\n"
+            f"   Suggestion: {issue.get('suggestion', issue.get('recommendation', 'Fix as needed'))}"
+            for i, issue in enumerate(issues)
+        ])
+        outline_text = "\n".join(f"[{i}] {text}" for i, text in outline) or "(no headings)"
+        blocks_text = "\n\n".join(f"[{i}]\n{blocks[i].strip()}" for i in selected)
+
+        return f"""Fix the following issues in a legal document by returning targeted patches.
+
+**Issues to Fix ({len(issues)} total):**
+{issues_summary}
+
+**Document outline (block id, heading):**
+{outline_text}
+
+**Relevant blocks (block id, HTML):**
+{blocks_text}
+
+**Patch format** - return ONLY this JSON:
+{{"patches": [{{"block": <block id>, "op": "replace" | "insert_after" | "delete", "find": "<exact text from that block>", "replace": "<new HTML>"}}]}}
+
+**Instructions:**
+1. "replace": "find" must be copied verbatim from the block's HTML and be just long enough to be unique
+2. "insert_after": adds "replace" as a new block after the given block (use for missing clauses); omit "find"
+3. "delete": removes "find" from the block, or the whole block if "find" is omitted
+4. Maintain the document's HTML formatting, numbering and style
+5. Only use block ids shown above
+6. Do not add explanations or comments"""
+
+    @staticmethod
+    def _parse_patches(response: str) -> List[Dict]:
+        """Extract the patch list from the model response"""
+        text = (response or '').strip()
+        if text.startswith('```'):
+            text = re.sub(r'^```(?:json)?\s*|\s*```$', '', text)
+        try:
+            payload = json.loads(text)
+        except (json.JSONDecodeError, TypeError):
+            return []
+
+        patches = payload.get('patches', []) if isinstance(payload, dict) else payload
+        return [patch for patch in patches if isinstance(patch, dict)] if isinstance(patches, list) else []
+
+    def apply_patches(self, blocks: List[str], patches: List[Dict]) -> Tuple[str, int, List[Dict]]:
+        """
+        Apply patches to blocks
+
+        Returns:
+            (patched document, number applied, failed patches with reasons)
+        """
+        blocks = list(blocks)
+        insertions: Dict[int, List[str]] = {}
+        applied = 0
+        failed = []
+
+        for patch in patches:
+            try:
+                block = int(patch.get('block'))
+            except (TypeError, ValueError):
+                failed.append({**patch, 'reason': 'invalid block id'})
+                continue
+            if not 0 <= block < len(blocks):
+                failed.append({**patch, 'reason': 'unknown block id'})
+                continue
+
+            op = patch.get('op', 'replace')
+            find = patch.get('find') or ''
+            replacement = patch.get('replace') or ''
+
+            if op == 'insert_after':
+                insertions.setdefault(block, []).append(replacement)
+                applied += 1
+                continue
+
+            if op == 'delete' and not find:
+                blocks[block] = ''
+                applied += 1
+                continue
+
+            if op not in ('replace', 'delete') or not find:
+                failed.append({**patch, 'reason': 'unsupported patch'})
+                continue
+
+            # Anchor in the named block first, then anywhere it is unambiguous
+            target, span = block, self._locate(blocks[block], find)
+            if span is None:
+                matches = [(i, self._locate(text, find)) for i, text in enumerate(blocks) if i != block]
+                matches = [(i, found) for i, found in matches if found is not None]
+                if len(matches) == 1:
+                    target, span = matches[0]
+
+            if span is None:
+                failed.append({**patch, 'reason': 'anchor not found'})
+                continue
+
+            start, end = span
+            blocks[target] = blocks[target][:start] + ('' if op == 'delete' else replacement) + blocks[target][end:]
+            applied += 1
+
+        parts = []
+        for i, text in enumerate(blocks):
+            parts.append(text)
+            for inserted in insertions.get(i, []):
+                parts.append(inserted if inserted.endswith('\n') else inserted + '\n')
+
+        return ''.join(parts), applied, failed
+
+    @staticmethod
+    def _locate(text: str, find: str) -> Optional[Tuple[int, int]]:
+        """Span of find in text, tolerating whitespace differences"""
+        start = text.find(find)
+        if start >= 0:
+            return start, start + len(find)
+
+        words = find.split()
+        if not words:
+            return None
+        match = re.search(r'\s+'.join(re.escape(word) for word in words), text)
+        return match.span() if match else None
+
+
+# Singleton instance
+document_patcher = DocumentPatcher()
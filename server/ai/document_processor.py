@@ -5,8 +5,12 @@ Handles document parsing, chunking, and preprocessing for RAG
 
 import os
 import re
+import time
 import logging
-from typing import List, Dict, Optional, Tuple
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 from pathlib import Path
 
 # Document parsing imports
@@ -37,6 +41,8 @@ class DocumentProcessor:
     - String content
     """
     
+    SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.txt', '.md', '.html']
+    
     def __init__(self):
         """Initialize document processor"""
         self.chunk_size = AIConfig.CHUNK_SIZE
@@ -72,12 +78,7 @@ class DocumentProcessor:
             else:
                 raise ValueError(f"Unsupported file type: {extension}")
             
-            metadata = {
-                'source': file_path.name,
-                'file_type': extension[1:],
-                'file_path': str(file_path),
-                'size_bytes': file_path.stat().st_size
-            }
+            metadata = self._file_metadata(file_path)
             
             logger.info(f"✅ Read {file_path.name} ({len(content)} chars)")
             return content, metadata
@@ -86,30 +87,54 @@ class DocumentProcessor:
             logger.error(f"❌ Failed to read {file_path}: {e}")
             raise
     
+    def _file_metadata(self, file_path: Path) -> Dict:
+        """Base metadata for a source file"""
+        return {
+            'source': file_path.name,
+            'file_type': file_path.suffix.lower()[1:],
+            'file_path': str(file_path),
+            'size_bytes': file_path.stat().st_size
+        }
+    
     def _read_pdf(self, file_path: Path) -> str:
         """Read PDF file"""
+        return "\n".join(self.iter_pdf_pages(file_path)).strip()
+    
+    def iter_pdf_pages(self, file_path: Path) -> Iterator[str]:
+        """
+        Yield PDF text one page at a time
+        
+        Each pdfplumber page is closed after extraction so its layout cache
+        is released; memory stays flat regardless of page count.
+        Falls back to PyPDF2 if pdfplumber fails before the first page.
+        """
         if not PARSING_AVAILABLE:
             raise ImportError("PDF parsing not available. Install pypdf2 or pdfplumber")
         
+        yielded = False
         try:
             # Try pdfplumber first (better text extraction)
             with pdfplumber.open(file_path) as pdf:
-                text = ""
                 for page in pdf.pages:
-                    text += page.extract_text() or ""
-                return text.strip()
-        except:
-            # Fallback to pypdf2
-            try:
-                import PyPDF2
-                with open(file_path, 'rb') as f:
-                    reader = PyPDF2.PdfReader(f)
-                    text = ""
-                    for page in reader.pages:
-                        text += page.extract_text() or ""
-                    return text.strip()
-            except Exception as e:
-                raise Exception(f"Failed to read PDF: {e}")
+                    text = page.extract_text() or ""
+                    if hasattr(page, 'close'):
+                        page.close()
+                    yielded = True
+                    yield text
+            return
+        except Exception:
+            if yielded:
+                raise
+        
+        # Fallback to pypdf2
+        try:
+            import PyPDF2
+            with open(file_path, 'rb') as f:
+                reader = PyPDF2.PdfReader(f)
+                for page in reader.pages:
+                    yield page.extract_text() or ""
+        except Exception as e:
+            raise Exception(f"Failed to read PDF: {e}")
     
     def _read_docx(self, file_path: Path) -> str:
         """Read DOCX file"""
@@ -167,6 +192,67 @@ class DocumentProcessor:
         else:
             return self._chunk_by_size(text, chunk_size, chunk_overlap)
     
+    def iter_text_chunks(
+        self,
+        pieces: Iterable[str],
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Incrementally chunk a stream of text pieces (e.g. PDF pages)
+        
+        Each piece is preprocessed and appended to a small buffer; chunks are
+        emitted (breaking at sentence boundaries like _chunk_by_size) as soon as
+        the buffer exceeds chunk_size, so only about one chunk plus one piece
+        is held in memory at a time.
+        
+        Args:
+            pieces: Iterable of raw text pieces
+            chunk_size: Size of each chunk
+            chunk_overlap: Overlap between chunks
+        
+        Yields:
+            Text chunks
+        """
+        chunk_size = chunk_size or self.chunk_size
+        overlap = chunk_overlap if chunk_overlap is not None else self.chunk_overlap
+        
+        buffer = ""
+        pos = 0  # start of unconsumed text; advancing it avoids copying the buffer per chunk
+        carried = 0  # length of overlap text at buffer[pos:]
+        
+        for piece in pieces:
+            piece = self.preprocess_legal_document(piece)
+            if not piece:
+                continue
+            
+            # Appending copies the buffer anyway, so drop consumed text here
+            rest = buffer[pos:]
+            buffer = f"{rest} {piece}" if rest else piece
+            pos = 0
+            
+            while len(buffer) - pos > chunk_size:
+                chunk = buffer[pos:pos + chunk_size]
+                end = chunk_size
+                
+                # Try to break at sentence boundary
+                break_point = max(chunk.rfind('.'), chunk.rfind('\n'))
+                if break_point > chunk_size * 0.5:  # Only if we're past halfway
+                    chunk = chunk[:break_point + 1]
+                    end = break_point + 1
+                
+                chunk = chunk.strip()
+                if chunk:
+                    yield chunk
+                
+                start = max(end - overlap, 1)
+                pos += start
+                carried = end - start
+        
+        rest = buffer[pos:]
+        if len(rest) > carried and rest.strip():
+            yield rest.strip()
+    
     def _chunk_by_paragraphs(self, text: str, chunk_size: int, overlap: int) -> List[str]:
         """Chunk text while preserving paragraph boundaries"""
         # Split into paragraphs
@@ -302,23 +388,30 @@ class DocumentProcessor:
         Returns:
             List of chunks with metadata ready for vector DB
         """
-        # Read file
-        content, metadata = self.read_file(file_path)
-        
-        # Preprocess
-        content = self.preprocess_legal_document(content)
+        path = Path(file_path)
+        
+        if path.suffix.lower() == '.pdf' and not extract_clauses:
+            # Stream pages straight into the chunker; the full text is never built
+            if not path.exists():
+                raise FileNotFoundError(f"File not found: {path}")
+            metadata = self._file_metadata(path)
+            pieces = self.iter_pdf_pages(path)
+        else:
+            # Read file
+            content, metadata = self.read_file(file_path)
+            pieces = [content]
+            
+            # Extract clauses if requested
+            if extract_clauses:
+                clauses = self.extract_legal_clauses(self.preprocess_legal_document(content))
+                metadata['num_clauses'] = len(clauses)
         
         # Add document type to metadata
         if document_type:
             metadata['type'] = document_type
         
-        # Extract clauses if requested
-        if extract_clauses:
-            clauses = self.extract_legal_clauses(content)
-            metadata['num_clauses'] = len(clauses)
-        
-        # Chunk the document
-        chunks = self.chunk_text(content)
+        # Preprocess and chunk the document incrementally
+        chunks = list(self.iter_text_chunks(pieces))
         
         # Create chunk objects with metadata
         processed_chunks = []
@@ -339,7 +432,9 @@ class DocumentProcessor:
         self,
         directory: str,
         file_extensions: Optional[List[str]] = None,
-        recursive: bool = True
+        recursive: bool = True,
+        workers: Optional[int] = None,
+        report: Optional[List[Dict]] = None
     ) -> List[Dict]:
         """
         Process all documents in a directory
@@ -348,30 +443,131 @@ class DocumentProcessor:
             directory: Path to directory
             file_extensions: List of extensions to process (default: all supported)
             recursive: Whether to search subdirectories
+            workers: Parser processes (default: AIConfig.INGEST_WORKERS)
+            report: Optional list that receives one {file, num_chunks, parse_seconds, error} per file
         
         Returns:
-            List of processed chunks from all documents
+            List of processed chunks from all documents, in file order
         """
-        if not file_extensions:
-            file_extensions = ['.pdf', '.docx', '.txt', '.md', '.html']
-        
         directory = Path(directory)
         all_chunks = []
         
-        # Get all matching files
-        pattern = '**/*' if recursive else '*'
-        for ext in file_extensions:
-            files = directory.glob(f"{pattern}{ext}")
+        files = [str(path) for path in self.list_files(directory, file_extensions, recursive)]
+        for result in self.iter_processed_files(files, workers=workers):
+            if result['error']:
+                logger.error(f"Failed to process {result['file']}: {result['error']}")
+            all_chunks.extend(result['chunks'])
             
-            for file_path in files:
-                try:
-                    chunks = self.process_document_for_rag(str(file_path))
-                    all_chunks.extend(chunks)
-                except Exception as e:
-                    logger.error(f"Failed to process {file_path}: {e}")
+            if report is not None:
+                report.append({key: value for key, value in result.items() if key != 'chunks'})
         
         logger.info(f"📁 Processed directory {directory}: {len(all_chunks)} total chunks")
         return all_chunks
+    
+    def iter_processed_files(
+        self,
+        file_paths: List[str],
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        document_type: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        Parse and chunk files, optionally in a process pool
+        
+        Results are yielded in the order of file_paths as soon as each one
+        (and every file before it) is done, so callers can embed file N while
+        later files are still being parsed. At most max_pending parsed-but-
+        unconsumed files are held, which bounds memory.
+        
+        Args:
+            file_paths: Files to process
+            workers: Parser processes (default: AIConfig.INGEST_WORKERS; 1 = in-process)
+            max_pending: Files in flight ahead of the consumer (default: AIConfig.INGEST_QUEUE_SIZE or 2x workers)
+            document_type: Optional document type added to chunk metadata
+        
+        Yields:
+            {file, chunks, num_chunks, parse_seconds, error}
+        """
+        workers = workers or AIConfig.INGEST_WORKERS
+        
+        if workers <= 1 or len(file_paths) <= 1:
+            for file_path in file_paths:
+                yield _process_file(file_path, document_type)
+            return
+        
+        max_pending = max(1, max_pending or AIConfig.INGEST_QUEUE_SIZE or workers * 2)
+        
+        # Forking a process that holds model threads, SQLite handles or DB pool
+        # connections can deadlock the children, so workers start fresh by default.
+        # A spawned worker imports only this module and ai.config (the package
+        # resolves its singletons lazily), so it opens no models or caches
+        method = AIConfig.INGEST_START_METHOD
+        context = multiprocessing.get_context(
+            method if method in multiprocessing.get_all_start_methods() else 'spawn'
+        )
+        
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            pending = deque()
+            paths = iter(file_paths)
+            
+            for file_path in paths:
+                pending.append(executor.submit(_process_file, file_path, document_type))
+                if len(pending) >= max_pending:
+                    break
+            
+            while pending:
+                result = pending.popleft().result()
+                
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(executor.submit(_process_file, next_path, document_type))
+                
+                yield result
+    
+    def list_files(
+        self,
+        directory: str,
+        file_extensions: Optional[List[str]] = None,
+        recursive: bool = True
+    ) -> List[Path]:
+        """
+        List supported files in a directory
+        
+        Args:
+            directory: Path to directory
+            file_extensions: List of extensions to include (default: all supported)
+            recursive: Whether to search subdirectories
+        
+        Returns:
+            Sorted list of file paths
+        """
+        file_extensions = file_extensions or self.SUPPORTED_EXTENSIONS
+        pattern = '**/*' if recursive else '*'
+        
+        files = set()
+        for ext in file_extensions:
+            files.update(Path(directory).glob(f"{pattern}{ext}"))
+        
+        return sorted(files)
+
+
+def _process_file(file_path: str, document_type: Optional[str] = None) -> Dict:
+    """Parse and chunk one file, capturing timing and errors (runs in pool workers)"""
+    start = time.perf_counter()
+    try:
+        chunks = doc_processor.process_document_for_rag(file_path, document_type=document_type)
+        error = None
+    except Exception as e:
+        chunks = []
+        error = str(e)
+    
+    return {
+        'file': file_path,
+        'chunks': chunks,
+        'num_chunks': len(chunks),
+        'parse_seconds': round(time.perf_counter() - start, 3),
+        'error': error
+    }
 
 
 # Singleton instance
@@ -0,0 +1,322 @@
+"""
+Document Store
+Bounded storage for uploaded documents in analysis sessions
+
+Keeps parsed text, chunks and the chunk embedding matrix for each
+uploaded document under a byte budget, with LRU + TTL eviction,
+per-user quotas and an optional spill-to-disk tier so evicted
+documents can be revived without re-parsing.
+"""
+
+import os
+import json
+import time
+import zlib
+import shutil
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+from .config import AIConfig
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore(ABC):
+    """
+    Interface for analysis-session document storage
+
+    Documents are dicts with at least 'full_text', 'chunks' and
+    'embeddings' (2-D numpy matrix, possibly with 'embedding_scales' for
+    int8 storage). Subclasses decide where they live.
+    """
+
+    @abstractmethod
+    def put(self, doc_id: str, document: Dict[str, Any], owner: Optional[str] = None):
+        """Store a document"""
+
+    @abstractmethod
+    def get(self, doc_id: str, default: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """Get a document, or default if it is not stored"""
+
+    @abstractmethod
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document; returns whether it existed"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict:
+        """Get store statistics"""
+
+    def __getitem__(self, doc_id: str) -> Dict[str, Any]:
+        document = self.get(doc_id)
+        if document is None:
+            raise KeyError(doc_id)
+        return document
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self.get(doc_id) is not None
+
+
+class BoundedDocumentStore(DocumentStore):
+    """
+    In-memory document store with a byte budget
+
+    Features:
+    - LRU eviction once max_bytes is exceeded
+    - TTL expiry based on last access
+    - Per-owner quota (oldest document of that owner is evicted first)
+    - Optional spill tier: evicted documents are written to spill_dir as
+      .npy matrices (memory-mapped on revival) plus zlib-compressed
+      JSON text and chunks, and transparently revived by get()
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl_seconds: int = 3600,
+        max_docs_per_owner: int = 10,
+        spill_dir: Optional[str] = None
+    ):
+        """
+        Initialize document store
+
+        Args:
+            max_bytes: Memory budget for all resident documents
+            ttl_seconds: Documents idle longer than this are dropped (0 disables)
+            max_docs_per_owner: Maximum documents per owner (0 disables)
+            spill_dir: Directory for the spill tier (None disables)
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_docs_per_owner = max_docs_per_owner
+        self.spill_dir = spill_dir
+
+        self._resident: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._spilled: Dict[str, Dict[str, Any]] = {}  # doc_id -> {path}
+        self._sizes: Dict[str, int] = {}
+        self._owners: Dict[str, Optional[str]] = {}
+        self._last_access: Dict[str, float] = {}
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+
+        self.stats = {
+            'evictions': 0,
+            'expirations': 0,
+            'quota_evictions': 0,
+            'spills': 0,
+            'revivals': 0
+        }
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+        logger.info(
+            f"🗄️ Document store initialized (budget={max_bytes // (1024 * 1024)}MB, "
+            f"ttl={ttl_seconds}s, per_owner={max_docs_per_owner}, spill={bool(spill_dir)})"
+        )
+
+    @staticmethod
+    def estimate_size(document: Dict[str, Any]) -> int:
+        """
+        Approximate resident bytes of a document
+
+        Memory-mapped matrices (revived from the spill tier) are backed by
+        the page cache rather than process memory and are not counted.
+        """
+        size = len(document.get('full_text', ''))
+        size += sum(len(chunk.get('text', '')) + 200 for chunk in document.get('chunks', []))
+        size += sum(
+            value.nbytes for value in document.values()
+            if isinstance(value, np.ndarray) and not isinstance(value, np.memmap)
+        )
+        return size
+
+    def put(self, doc_id: str, document: Dict[str, Any], owner: Optional[str] = None):
+        """Store a document, evicting others as needed"""
+        with self._lock:
+            self._expire()
+            self.delete(doc_id)
+
+            if self.max_docs_per_owner and owner is not None:
+                self._enforce_quota(owner)
+
+            size = self.estimate_size(document)
+            self._resident[doc_id] = document
+            self._sizes[doc_id] = size
+            self._owners[doc_id] = owner
+            self._last_access[doc_id] = time.time()
+            self._resident_bytes += size
+
+            self._evict_to_budget(keep=doc_id)
+
+    def get(self, doc_id: str, default: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """Get a document, reviving it from the spill tier if necessary"""
+        with self._lock:
+            if self._is_expired(doc_id):
+                self._drop(doc_id)
+                self.stats['expirations'] += 1
+                return default
+
+            document = self._resident.get(doc_id)
+            if document is not None:
+                self._resident.move_to_end(doc_id)
+                self._last_access[doc_id] = time.time()
+                return document
+
+            if doc_id in self._spilled:
+                return self._revive(doc_id)
+
+            return default
+
+    def delete(self, doc_id: str) -> bool:
+        """Remove a document from memory and the spill tier"""
+        with self._lock:
+            existed = doc_id in self._resident or doc_id in self._spilled
+            self._drop(doc_id)
+            return existed
+
+    def owned_by(self, owner: str) -> Iterator[str]:
+        """Document IDs belonging to an owner, oldest access first"""
+        with self._lock:
+            ids = [doc_id for doc_id, doc_owner in self._owners.items() if doc_owner == owner]
+            return iter(sorted(ids, key=lambda doc_id: self._last_access.get(doc_id, 0)))
+
+    def get_stats(self) -> Dict:
+        """Get store statistics"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'resident_documents': len(self._resident),
+                'spilled_documents': len(self._spilled),
+                'resident_bytes': self._resident_bytes,
+                'max_bytes': self.max_bytes
+            })
+            return stats
+
+    # ----- eviction -----
+
+    def _is_expired(self, doc_id: str) -> bool:
+        if not self.ttl_seconds or doc_id not in self._last_access:
+            return False
+        return time.time() - self._last_access[doc_id] > self.ttl_seconds
+
+    def _expire(self):
+        """Drop every document idle longer than the TTL (lock held)"""
+        if not self.ttl_seconds:
+            return
+        for doc_id in [doc_id for doc_id in self._last_access if self._is_expired(doc_id)]:
+            self._drop(doc_id)
+            self.stats['expirations'] += 1
+
+    def _enforce_quota(self, owner: str):
+        """Evict the owner's least recently used documents until under quota (lock held)"""
+        owned = list(self.owned_by(owner))
+        while len(owned) >= self.max_docs_per_owner:
+            self._drop(owned.pop(0))
+            self.stats['quota_evictions'] += 1
+
+    def _evict_to_budget(self, keep: Optional[str] = None):
+        """Spill or drop LRU documents until resident bytes fit the budget (lock held)"""
+        while self._resident_bytes > self.max_bytes and len(self._resident) > 1:
+            doc_id = next(iter(self._resident))
+            if doc_id == keep:
+                self._resident.move_to_end(doc_id)
+                continue
+
+            if self.spill_dir:
+                self._spill(doc_id)
+            else:
+                self._drop(doc_id)
+            self.stats['evictions'] += 1
+
+    def _unload(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a document from the resident tier only (lock held)"""
+        document = self._resident.pop(doc_id, None)
+        if document is not None:
+            self._resident_bytes -= self._sizes.pop(doc_id, 0)
+        return document
+
+    def _drop(self, doc_id: str):
+        """Remove a document from every tier (lock held)"""
+        self._unload(doc_id)
+        self._owners.pop(doc_id, None)
+        self._last_access.pop(doc_id, None)
+
+        spilled = self._spilled.pop(doc_id, None)
+        if spilled:
+            shutil.rmtree(spilled['path'], ignore_errors=True)
+
+    # ----- spill tier -----
+
+    def _spill(self, doc_id: str):
+        """Write a resident document to disk and release its memory (lock held)"""
+        document = self._unload(doc_id)
+        if document is None:
+            return
+
+        # A revived document is still backed by its spill files
+        if doc_id in self._spilled:
+            return
+
+        path = os.path.join(self.spill_dir, doc_id)
+        try:
+            os.makedirs(path, exist_ok=True)
+
+            # Matrices (embeddings, int8 scales) go to .npy files, everything else to JSON
+            arrays = {key: value for key, value in document.items() if isinstance(value, np.ndarray)}
+            for key, value in arrays.items():
+                np.save(os.path.join(path, f'{key}.npy'), value)
+
+            payload = {key: value for key, value in document.items() if key not in arrays}
+            with open(os.path.join(path, 'document.json.z'), 'wb') as f:
+                f.write(zlib.compress(json.dumps(payload).encode('utf-8')))
+
+            self._spilled[doc_id] = {'path': path}
+            self.stats['spills'] += 1
+            logger.info(f"💾 Spilled document {doc_id} to disk")
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to spill document {doc_id}, dropping it: {e}")
+            shutil.rmtree(path, ignore_errors=True)
+            self._drop(doc_id)
+
+    def _revive(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Load a spilled document back into the resident tier (lock held)"""
+        path = self._spilled[doc_id]['path']
+        try:
+            with open(os.path.join(path, 'document.json.z'), 'rb') as f:
+                document = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+
+            for filename in os.listdir(path):
+                if filename.endswith('.npy'):
+                    document[filename[:-4]] = np.load(os.path.join(path, filename), mmap_mode='r')
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to revive document {doc_id}: {e}")
+            self._drop(doc_id)
+            return None
+
+        # Files stay on disk while the matrix is memory-mapped from them;
+        # only the decoded text and chunks count against the budget
+        size = self.estimate_size(document)
+        self._resident[doc_id] = document
+        self._sizes[doc_id] = size
+        self._last_access[doc_id] = time.time()
+        self._resident_bytes += size
+        self.stats['revivals'] += 1
+
+        self._evict_to_budget(keep=doc_id)
+        logger.info(f"♻️ Revived document {doc_id} from disk")
+        return document
+
+
+def create_document_store() -> DocumentStore:
+    """Build the document store configured in AIConfig"""
+    return BoundedDocumentStore(
+        max_bytes=AIConfig.ANALYZER_STORE_MAX_MB * 1024 * 1024,
+        ttl_seconds=AIConfig.ANALYZER_STORE_TTL,
+        max_docs_per_owner=AIConfig.ANALYZER_MAX_DOCS_PER_USER,
+        spill_dir=AIConfig.ANALYZER_SPILL_DIRECTORY or None
+    )
@@ -0,0 +1,270 @@
+"""
+Embedding Cache
+Content-addressed cache for embedding vectors
+
+Two tiers:
+- In-process LRU (float32 vectors, bounded by entry count)
+- On-disk SQLite store (float32 blobs, bounded by total bytes)
+
+Both tiers hold the vectors exactly as the model returned them (float32),
+so a text embeds identically whether it was a miss, a memory hit or a
+disk hit. Keys are derived from (model name, normalized text hash), so
+switching EMBEDDING_MODEL_NAME can never return vectors from another
+model; processes using different models can share one cache file, and
+stale rows are reclaimed by size-based eviction.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from .config import AIConfig
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory + SQLite) cache for embedding vectors
+
+    Features:
+    - Keys: sha256 of model name + whitespace-normalized text
+    - LRU eviction in memory, least-recently-used eviction on disk by size
+    - Hit/miss counters per tier
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: Optional[str] = None,
+        max_memory_items: int = 10000,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        use_disk: bool = True
+    ):
+        """
+        Initialize embedding cache
+
+        Args:
+            model_name: Embedding model the cached vectors belong to
+            cache_dir: Directory for the SQLite file
+            max_memory_items: Maximum vectors held in the in-process LRU
+            max_disk_bytes: Maximum total vector bytes kept on disk
+            use_disk: Enable the on-disk tier
+        """
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+        if use_disk:
+            self._init_disk(cache_dir or AIConfig.EMBEDDING_CACHE_DIR)
+
+    def _init_disk(self, cache_dir: str):
+        """Open (or create) the SQLite tier"""
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            db_path = os.path.join(cache_dir, 'embeddings.sqlite3')
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)')
+            self._conn.commit()
+
+            logger.info(f"💾 Embedding cache on disk at {db_path}")
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding disk cache unavailable, using memory only: {e}")
+            self._conn = None
+
+    def make_key(self, text: str) -> str:
+        """Content-addressed key for a text under the current model"""
+        normalized = ' '.join(text.split())
+        digest = hashlib.sha256(f"{self.model_name}\x00{normalized}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up vectors for texts
+
+        Returns:
+            List aligned with texts; None where the vector is not cached
+        """
+        keys = [self.make_key(text) for text in texts]
+        found: List[Optional[List[float]]] = [None] * len(texts)
+        disk_lookup: Dict[str, List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector.tolist()
+                    self.stats['memory_hits'] += 1
+                else:
+                    disk_lookup.setdefault(key, []).append(i)
+
+            if disk_lookup and self._conn is not None:
+                self._read_disk(disk_lookup, found)
+
+            self.stats['misses'] += sum(1 for vector in found if vector is None)
+
+        return found
+
+    def _read_disk(self, disk_lookup: Dict[str, List[int]], found: List[Optional[List[float]]]):
+        """Fill found[] from SQLite and promote hits to memory (lock held)"""
+        try:
+            keys = list(disk_lookup.keys())
+            now = time.time()
+            # SQLite limits bound parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                # Rows written as float16 by older versions are treated as misses
+                # and replaced when the text is embedded again
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders}) AND LENGTH(vector) = dim * 4',
+                    batch
+                ).fetchall()
+
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    values = vector.tolist()
+                    for i in disk_lookup[key]:
+                        found[i] = values
+                        self.stats['disk_hits'] += 1
+                    self._put_memory(key, vector)
+
+                if rows:
+                    self._conn.executemany(
+                        'UPDATE embeddings SET last_access = ? WHERE key = ?',
+                        [(now, key) for key, _ in rows]
+                    )
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding disk cache read failed: {e}")
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Store vectors for texts in both tiers"""
+        if not texts:
+            return
+
+        # Never cache failed (empty) embeddings
+        pairs = [(self.make_key(text), vector) for text, vector in zip(texts, vectors) if len(vector)]
+        if not pairs:
+            return
+        keys = [key for key, _ in pairs]
+        vectors = [vector for _, vector in pairs]
+
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._put_memory(key, vector)
+
+            if self._conn is not None:
+                self._write_disk(keys, vectors)
+
+    def _put_memory(self, key: str, vector):
+        """Insert into the LRU as float32, evicting the oldest entries (lock held)"""
+        # float32 arrays take ~8x less memory than lists of Python floats
+        self._memory[key] = np.asarray(vector, dtype=np.float32)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _write_disk(self, keys: List[str], vectors: List[List[float]]):
+        """Persist float32 vectors and enforce the disk size budget (lock held)"""
+        try:
+            now = time.time()
+            rows = []
+            for key, vector in zip(keys, vectors):
+                array = np.asarray(vector, dtype=np.float32)
+                rows.append((key, self.model_name, int(array.shape[0]), array.tobytes(), now))
+
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, model, dim, vector, last_access) VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+            self._evict_disk()
+            self._conn.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding disk cache write failed: {e}")
+
+    def _evict_disk(self):
+        """Drop least-recently-used rows until under max_disk_bytes (lock held)"""
+        total_bytes = self._conn.execute(
+            'SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings'
+        ).fetchone()[0]
+
+        if total_bytes <= self.max_disk_bytes:
+            return
+
+        excess = total_bytes - self.max_disk_bytes
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute(
+            'SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access ASC'
+        ):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+
+        self._conn.executemany('DELETE FROM embeddings WHERE key = ?', victims)
+        self.stats['evictions'] += len(victims)
+        logger.info(f"🧹 Evicted {len(victims)} embeddings from disk cache ({freed} bytes)")
+
+    def clear(self):
+        """Remove all cached vectors"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM embeddings')
+                self._conn.commit()
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            lookups = hits + self.stats['misses']
+            stats = dict(self.stats)
+            stats.update({
+                'model': self.model_name,
+                'memory_items': len(self._memory),
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'disk_enabled': self._conn is not None
+            })
+
+            if self._conn is not None:
+                try:
+                    count, size = self._conn.execute(
+                        'SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings'
+                    ).fetchone()
+                    stats['disk_items'] = count
+                    stats['disk_bytes'] = size
+                except Exception as e:
+                    logger.warning(f"⚠️ Embedding disk cache stats failed: {e}")
+
+            return stats
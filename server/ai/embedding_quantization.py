@@ -0,0 +1,179 @@
+"""
+Embedding Quantization
+Compact storage and scoring for normalized embedding matrices
+
+Storage modes:
+- float32: full precision (4 bytes per dimension)
+- float16: half precision (2 bytes), upcast per query
+- int8: symmetric scalar quantization with one float32 scale per row (1 byte)
+
+Any mode can be combined with dimension reduction before quantization:
+- Matryoshka-style truncation to the first `dim` components
+- PCA projection to `dim` components (fitted offline, loaded from .npz)
+
+Vectors are re-normalized after reduction so scores remain cosine similarities.
+"""
+
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODES = ('float32', 'float16', 'int8')
+
+
+def fit_pca(matrix: np.ndarray, dim: int) -> Dict[str, np.ndarray]:
+    """
+    Fit a PCA projection on a sample of embeddings
+
+    Args:
+        matrix: (n, d) embeddings, n should comfortably exceed dim
+        dim: Output dimension
+
+    Returns:
+        {'mean': (d,), 'components': (d, dim)} float32 arrays
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    mean = matrix.mean(axis=0)
+    # Right singular vectors of the centered sample are the principal axes
+    _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+    return {
+        'mean': mean.astype(np.float32),
+        'components': np.ascontiguousarray(vt[:dim].T, dtype=np.float32)
+    }
+
+
+def save_pca(path: str, pca: Dict[str, np.ndarray]):
+    np.savez(path, mean=pca['mean'], components=pca['components'])
+
+
+def load_pca(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {'mean': data['mean'].astype(np.float32), 'components': data['components'].astype(np.float32)}
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingQuantizer:
+    """
+    Encodes embedding matrices for storage and scores queries against them
+
+    Encoded matrices are plain dicts of numpy arrays ('embeddings' and, for
+    int8, 'embedding_scales') so they can be stored alongside other
+    document fields and spilled to .npy files.
+    """
+
+    def __init__(self, mode: str = 'float32', dim: int = 0, pca: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Initialize quantizer
+
+        Args:
+            mode: 'float32', 'float16' or 'int8'
+            dim: Reduced dimension (0 keeps the full dimension)
+            pca: PCA projection from fit_pca/load_pca (None truncates instead)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown embedding storage mode: {mode} (expected one of {MODES})")
+        if pca is not None and dim and pca['components'].shape[1] < dim:
+            raise ValueError(f"PCA projection has {pca['components'].shape[1]} components, {dim} requested")
+
+        self.mode = mode
+        self.dim = dim
+        self.pca = pca
+
+    @classmethod
+    def from_config(cls) -> 'EmbeddingQuantizer':
+        """Quantizer for the analyzer store as configured in AIConfig"""
+        from .config import AIConfig
+
+        pca = None
+        if AIConfig.ANALYZER_EMBEDDING_PCA_PATH:
+            try:
+                pca = load_pca(AIConfig.ANALYZER_EMBEDDING_PCA_PATH)
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to load PCA projection, truncating instead: {e}")
+
+        return cls(AIConfig.ANALYZER_EMBEDDING_DTYPE, AIConfig.ANALYZER_EMBEDDING_DIM, pca)
+
+    @property
+    def description(self) -> str:
+        if not self.dim and self.pca is None:
+            return self.mode
+        reduction = 'pca' if self.pca is not None else 'truncate'
+        return f"{self.mode}/{reduction}-{self.dim or self.pca['components'].shape[1]}"
+
+    def reduce(self, matrix: np.ndarray) -> np.ndarray:
+        """Project or truncate (n, d) or (d,) float embeddings and re-normalize"""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if self.pca is not None:
+            components = self.pca['components'][:, :self.dim] if self.dim else self.pca['components']
+            matrix = (matrix - self.pca['mean']) @ components
+        elif self.dim and self.dim < matrix.shape[-1]:
+            matrix = matrix[..., :self.dim]
+        return _normalize_rows(matrix).astype(np.float32)
+
+    def encode(self, embeddings) -> Dict[str, np.ndarray]:
+        """
+        Encode embeddings for storage
+
+        Args:
+            embeddings: (n, d) embeddings (lists or array)
+
+        Returns:
+            {'embeddings': stored matrix} plus {'embedding_scales': (n,) float32} for int8
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] == 0:
+            return {'embeddings': np.zeros((0, 0), dtype=np.float32)}
+
+        matrix = self.reduce(matrix)
+
+        if self.mode == 'int8':
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+            return {
+                'embeddings': np.ascontiguousarray(quantized),
+                'embedding_scales': scales.astype(np.float32)
+            }
+
+        return {'embeddings': np.ascontiguousarray(matrix, dtype=self.mode)}
+
+    def prepare_query(self, query) -> np.ndarray:
+        """Reduce and normalize a query vector to match stored rows"""
+        return self.reduce(np.asarray(query, dtype=np.float32))
+
+    def scores(self, encoded: Dict[str, np.ndarray], query) -> np.ndarray:
+        """
+        Cosine similarity of a query against every stored row
+
+        Args:
+            encoded: Output of encode() (or a document holding those fields)
+            query: Full-dimension query embedding
+
+        Returns:
+            (n,) float32 scores
+        """
+        matrix = encoded['embeddings']
+        query_vec = self.prepare_query(query)
+        if matrix.shape[0] == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        # BLAS has no half-precision or int8 GEMV, so low-precision rows are upcast per query
+        scores = matrix.astype(np.float32, copy=False).dot(query_vec)
+
+        scales = encoded.get('embedding_scales')
+        if scales is not None:
+            scores = scores * scales
+        return scores
+
+    @staticmethod
+    def nbytes(encoded: Dict[str, np.ndarray]) -> int:
+        """Bytes used by an encoded matrix"""
+        return sum(value.nbytes for value in encoded.values() if isinstance(value, np.ndarray))
@@ -0,0 +1,316 @@
+"""
+Embedding Server
+One process owns the embedding model and serves every web worker
+
+Without it each gunicorn worker loads its own copy of BGE-M3. Run one
+server per node and point the workers at it with EMBEDDING_SERVER_URL:
+
+    python -m ai.embedding_server --socket /tmp/legal-embeddings.sock
+    EMBEDDING_SERVER_URL=unix:///tmp/legal-embeddings.sock
+
+    python -m ai.embedding_server --port 8765
+    EMBEDDING_SERVER_URL=http://127.0.0.1:8765
+
+Concurrent requests are micro-batched into one model.encode call.
+
+API:
+    POST /embed   {"texts": [...], "format": "json" | "f32"}
+                  -> {"model", "dim", "count", "embeddings"}   (json)
+                  -> {"model", "dim", "count", "data"}         (f32: base64 little-endian float32)
+    GET  /health  -> {"status", "model", "dim", "batching", "cache"}
+"""
+
+import os
+import sys
+import json
+import base64
+import socket
+import logging
+import argparse
+import threading
+import http.client
+import socketserver
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUEST_BYTES = 32 * 1024 * 1024
+
+
+class EmbeddingServerError(Exception):
+    """Raised when the embedding server is unreachable or returns an error"""
+
+
+# ===================================
+# SERVER
+# ===================================
+
+class EmbeddingServer:
+    """
+    Shared embedding model behind a micro-batching queue
+
+    Features:
+    - Single model copy per node (local SentenceTransformer)
+    - Dynamic micro-batching across concurrent callers
+    - Embedding cache shared by all workers
+    - HTTP on localhost or on a Unix socket
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        """
+        Initialize server and load the model
+
+        Args:
+            model_name: Hugging Face model (default: AIConfig.EMBEDDING_MODEL_NAME)
+            max_batch_size: Maximum texts per forward pass (default: AIConfig.EMBEDDING_BATCH_MAX_SIZE)
+            max_wait_ms: Batching window (default: AIConfig.EMBEDDING_BATCH_MAX_WAIT_MS)
+        """
+        from .config import AIConfig
+        from .embedding_service import EmbeddingService
+
+        self.model_name = model_name or AIConfig.EMBEDDING_MODEL_NAME
+        # server_url='' keeps this instance on the in-process model; cache hits
+        # are answered before the micro-batcher, misses share one encode call
+        self.service = EmbeddingService(
+            use_local_model=True,
+            model_name=self.model_name,
+            lazy=False,
+            server_url='',
+            micro_batching=True,
+            batch_max_size=max_batch_size,
+            batch_max_wait_ms=max_wait_ms
+        )
+        self.dimension = self.service.get_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.service.get_embeddings(texts)
+
+    def health(self) -> Dict:
+        return {
+            'status': 'ok',
+            'model': self.model_name,
+            'dim': self.dimension,
+            'batching': self.service.get_batching_stats(),
+            'cache': self.service.get_cache_stats()
+        }
+
+    def serve(self, socket_path: Optional[str] = None, host: str = '127.0.0.1', port: int = 8765):
+        """
+        Serve until interrupted
+
+        Args:
+            socket_path: Unix socket path (takes precedence over host/port)
+            host: Bind address for HTTP
+            port: Bind port for HTTP
+        """
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            httpd = _ThreadingUnixHTTPServer(socket_path, _EmbeddingRequestHandler)
+            os.chmod(socket_path, 0o660)
+            address = f"unix://{socket_path}"
+        else:
+            httpd = _ThreadingTCPHTTPServer((host, port), _EmbeddingRequestHandler)
+            address = f"http://{host}:{port}"
+
+        httpd.daemon_threads = True
+        httpd.embedding_server = self
+        logger.info(f"🚀 Embedding server ({self.model_name}, dim={self.dimension}) listening on {address}")
+
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("🛑 Embedding server stopped")
+        finally:
+            httpd.server_close()
+            if socket_path and os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+
+class _ThreadingTCPHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128  # every web worker may connect at once
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _EmbeddingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so workers reuse their connection
+    server_version = 'LegalEmbeddingServer/1.0'
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._send(404, {'error': 'Not found'})
+        self._send(200, self.server.embedding_server.health())
+
+    def do_POST(self):
+        if self.path != '/embed':
+            return self._send(404, {'error': 'Not found'})
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            return self._send(413, {'error': 'Request too large'})
+
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            return self._send(400, {'error': 'Invalid JSON'})
+
+        texts = payload.get('texts')
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return self._send(400, {'error': 'texts must be a list of strings'})
+
+        server = self.server.embedding_server
+        try:
+            embeddings = server.embed(texts)
+        except Exception as e:
+            logger.error(f"❌ Embedding request failed: {e}")
+            return self._send(500, {'error': str(e)})
+
+        body = {'model': server.model_name, 'dim': server.dimension, 'count': len(embeddings)}
+        if payload.get('format') == 'f32':
+            matrix = np.asarray(embeddings, dtype='<f4').reshape(len(embeddings), server.dimension)
+            body['data'] = base64.b64encode(matrix.tobytes()).decode('ascii')
+        else:
+            body['embeddings'] = embeddings
+        self._send(200, body)
+
+    def _send(self, status: int, body: Dict):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+# ===================================
+# CLIENT
+# ===================================
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class EmbeddingServerClient:
+    """
+    Client for EmbeddingServer
+
+    Keeps one keep-alive connection per thread and transfers vectors as
+    packed float32 instead of JSON numbers.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        """
+        Initialize client (connects on first request)
+
+        Args:
+            url: unix:///path/to.sock or http://host:port
+            timeout: Socket timeout in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+        self._local = threading.local()
+
+        parsed = urlparse(url)
+        if parsed.scheme == 'unix':
+            self.socket_path = parsed.path
+            self.host, self.port = None, None
+        elif parsed.scheme == 'http':
+            self.socket_path = None
+            self.host, self.port = parsed.hostname or '127.0.0.1', parsed.port or 80
+        else:
+            raise ValueError(f"Unsupported embedding server URL: {url}")
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.socket_path:
+                conn = _UnixHTTPConnection(self.socket_path, self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        """Send a request, reconnecting once if the kept-alive connection went stale"""
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                payload = json.loads(response.read() or b'{}')
+                break
+            except (OSError, http.client.HTTPException, json.JSONDecodeError) as e:
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise EmbeddingServerError(f"Embedding server unreachable at {self.url}: {e}") from e
+
+        if response.status != 200:
+            raise EmbeddingServerError(f"Embedding server error {response.status}: {payload.get('error')}")
+        return payload
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts on the server"""
+        if not texts:
+            return []
+
+        payload = self._request('POST', '/embed', {'texts': texts, 'format': 'f32'})
+        matrix = np.frombuffer(base64.b64decode(payload['data']), dtype='<f4')
+        return matrix.reshape(payload['count'], payload['dim']).tolist()
+
+    def health(self) -> Dict:
+        return self._request('GET', '/health')
+
+
+def main(argv: Optional[List[str]] = None):
+    from .config import AIConfig
+
+    parser = argparse.ArgumentParser(description='Serve embeddings to local web workers')
+    parser.add_argument('--socket', help='Unix socket path (instead of HTTP)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--model', default=AIConfig.EMBEDDING_MODEL_NAME)
+    parser.add_argument('--max-batch-size', type=int, default=AIConfig.EMBEDDING_BATCH_MAX_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=AIConfig.EMBEDDING_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = EmbeddingServer(args.model, args.max_batch_size, args.max_wait_ms)
+    server.serve(socket_path=args.socket, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
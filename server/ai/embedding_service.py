@@ -4,7 +4,8 @@ Supports both Azure OpenAI and Hugging Face embeddings
 """
 
 import logging
-from typing import List, Union
+import threading
+from typing import Callable, List, Dict, Optional, Union
 import numpy as np
 
 from .config import AIConfig
@@ -19,22 +20,105 @@ class EmbeddingService:
     - Azure OpenAI embeddings
     """
     
-    def __init__(self, use_local_model: bool = True, model_name: str = "BAAI/bge-m3"):
+    def __init__(
+        self,
+        use_local_model: bool = True,
+        model_name: str = "BAAI/bge-m3",
+        use_cache: Optional[bool] = None,
+        lazy: Optional[bool] = None,
+        server_url: Optional[str] = None,
+        micro_batching: Optional[bool] = None,
+        batch_max_size: Optional[int] = None,
+        batch_max_wait_ms: Optional[float] = None
+    ):
         """
         Initialize embedding service
         
         Args:
             use_local_model: Use local Hugging Face model (True) or Azure OpenAI (False)
             model_name: Name of the Hugging Face model (default: BAAI/bge-m3)
+            use_cache: Cache vectors by content hash (default: AIConfig.ENABLE_EMBEDDING_CACHE)
+            lazy: Defer loading the local model until first use (default: AIConfig.LAZY_LOAD_MODELS)
+            server_url: Shared embedding server to use instead of loading the model in this
+                process (default: AIConfig.EMBEDDING_SERVER_URL; '' disables)
+            micro_batching: Coalesce concurrent small requests into one encode call
+                (default: AIConfig.ENABLE_EMBEDDING_MICRO_BATCHING)
+            batch_max_size: Maximum texts per coalesced call (default: AIConfig.EMBEDDING_BATCH_MAX_SIZE)
+            batch_max_wait_ms: Batching window (default: AIConfig.EMBEDDING_BATCH_MAX_WAIT_MS)
         """
         self.use_local_model = use_local_model
         self.model_name = model_name
-        self.model = None
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.cache = None
+        self.batcher = None
+        self.server = None
+        self._server_dimension: Optional[int] = None
         
-        if use_local_model:
-            self._init_local_model()
+        server_url = AIConfig.EMBEDDING_SERVER_URL if server_url is None else server_url
+        if use_local_model and server_url:
+            self._init_server_client(server_url)
+        elif use_local_model:
+            if not (AIConfig.LAZY_LOAD_MODELS if lazy is None else lazy):
+                self._init_local_model()
         else:
             self._init_azure_embeddings()
+        
+        if use_cache if use_cache is not None else AIConfig.ENABLE_EMBEDDING_CACHE:
+            self._init_cache()
+        
+        if micro_batching if micro_batching is not None else AIConfig.ENABLE_EMBEDDING_MICRO_BATCHING:
+            from .micro_batcher import MicroBatcher
+            
+            self.batcher = MicroBatcher(
+                self._encode_now,
+                max_batch_size=batch_max_size or AIConfig.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=AIConfig.EMBEDDING_BATCH_MAX_WAIT_MS if batch_max_wait_ms is None else batch_max_wait_ms,
+                name='embedding-batcher'
+            )
+    
+    @property
+    def model(self):
+        """Local SentenceTransformer, loaded on first access"""
+        if self._model is None and self.use_local_model:
+            self.warm_up()
+        return self._model
+    
+    @model.setter
+    def model(self, value):
+        self._model = value
+    
+    @property
+    def is_ready(self) -> bool:
+        if self.server:
+            return self._server_dimension is not None
+        return not self.use_local_model or self._model is not None
+    
+    def warm_up(self) -> bool:
+        """
+        Load the local model now (idempotent)
+        
+        Falls back to Azure embeddings if the local model cannot be loaded.
+        
+        Returns:
+            True once a backend is ready
+        """
+        if self.is_ready:
+            return True
+        if self.server:
+            return self._check_server()
+        with self._model_lock:
+            if self.is_ready:
+                return True
+            try:
+                self._init_local_model()
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to load local embeddings, falling back to Azure: {e}")
+                self.use_local_model = False
+                self._init_azure_embeddings()
+                if self.cache:
+                    self._init_cache()
+        return True
     
     def _init_local_model(self):
         """Initialize local Hugging Face embedding model"""
@@ -55,6 +139,27 @@ class EmbeddingService:
             logger.error(f"❌ Failed to load local embedding model: {e}")
             raise
     
+    def _init_server_client(self, server_url: str):
+        """Use the shared embedding server instead of a per-process model"""
+        from .embedding_server import EmbeddingServerClient
+        
+        self.server = EmbeddingServerClient(server_url, timeout=AIConfig.EMBEDDING_SERVER_TIMEOUT)
+        self.use_local_model = False
+        logger.info(f"🔌 Using embedding server at {server_url}")
+    
+    def _check_server(self) -> bool:
+        """Ping the embedding server and make sure it serves the expected model"""
+        try:
+            health = self.server.health()
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding server not reachable: {e}")
+            return False
+        
+        if health.get('model') != self.model_name:
+            logger.warning(f"⚠️ Embedding server serves {health.get('model')}, expected {self.model_name}")
+        self._server_dimension = health.get('dim')
+        return True
+    
     def _init_azure_embeddings(self):
         """Initialize Azure OpenAI embeddings"""
         try:
@@ -65,6 +170,23 @@ class EmbeddingService:
             logger.error(f"❌ Failed to initialize Azure embeddings: {e}")
             raise
     
+    def _init_cache(self):
+        """Initialize the content-addressed embedding cache"""
+        try:
+            from .embedding_cache import EmbeddingCache
+            
+            # Key on the model actually producing vectors so a model switch invalidates entries
+            cache_model = self.model_name if self.use_local_model or self.server else AIConfig.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+            self.cache = EmbeddingCache(
+                model_name=cache_model,
+                max_memory_items=AIConfig.EMBEDDING_CACHE_MEMORY_ITEMS,
+                max_disk_bytes=AIConfig.EMBEDDING_CACHE_DISK_MB * 1024 * 1024
+            )
+            logger.info(f"✅ Embedding cache enabled for {cache_model}")
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache disabled: {e}")
+            self.cache = None
+    
     def get_embeddings(self, texts: Union[str, List[str]]) -> List[List[float]]:
         """
         Get embeddings for text(s)
@@ -79,11 +201,116 @@ class EmbeddingService:
         if isinstance(texts, str):
             texts = [texts]
         
+        if not self.cache:
+            return self._encode(texts)
+        
+        # Only encode texts that are not cached yet
+        embeddings = self.cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self._encode(missing_texts)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+            self.cache.put_many(missing_texts, computed)
+        
+        return embeddings
+    
+    def get_embeddings_batched(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        max_batch_chars: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> List[List[float]]:
+        """
+        Embed many texts in length-sorted batches
+        
+        Sorting by length keeps similarly sized texts together so each forward
+        pass pads as little as possible. A batch is closed when it reaches
+        batch_size texts or max_batch_chars characters, which bounds peak memory.
+        
+        Args:
+            texts: Texts to embed
+            batch_size: Maximum texts per batch (default: AIConfig.EMBEDDING_BATCH_SIZE)
+            max_batch_chars: Maximum characters per batch (default: AIConfig.EMBEDDING_MAX_BATCH_CHARS)
+            progress_callback: Called as progress_callback(done, total) after each batch
+        
+        Returns:
+            List of embedding vectors in the same order as texts
+        """
+        batch_size = batch_size or AIConfig.EMBEDDING_BATCH_SIZE
+        max_batch_chars = max_batch_chars or AIConfig.EMBEDDING_MAX_BATCH_CHARS
+        
+        total = len(texts)
+        embeddings: List[Optional[List[float]]] = [None] * total
+        order = sorted(range(total), key=lambda i: len(texts[i]))
+        
+        done = 0
+        batch: List[int] = []
+        batch_chars = 0
+        
+        for position, index in enumerate(order):
+            batch.append(index)
+            batch_chars += len(texts[index])
+            
+            is_last = position == total - 1
+            next_chars = 0 if is_last else len(texts[order[position + 1]])
+            if is_last or len(batch) >= batch_size or batch_chars + next_chars > max_batch_chars:
+                vectors = self.get_embeddings([texts[i] for i in batch])
+                for i, vector in zip(batch, vectors):
+                    embeddings[i] = vector
+                
+                done += len(batch)
+                if progress_callback:
+                    progress_callback(done, total)
+                
+                batch = []
+                batch_chars = 0
+        
+        return embeddings
+    
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """
+        Encode texts (no caching)
+        
+        Small requests (e.g. single search queries from concurrent API calls) go
+        through the micro-batcher so they share one forward pass; bulk requests
+        are already batched and are encoded directly.
+        """
+        if self.batcher and len(texts) < self.batcher.max_batch_size:
+            return self.batcher.submit(texts)
+        return self._encode_now(texts)
+    
+    def _encode_now(self, texts: List[str]) -> List[List[float]]:
+        """Encode texts with the configured backend"""
+        if self.server:
+            return self._get_server_embeddings(texts)
+        self.warm_up()
         if self.use_local_model:
             return self._get_local_embeddings(texts)
         else:
             return self._get_azure_embeddings(texts)
     
+    def get_cache_stats(self) -> Dict:
+        """Get embedding cache statistics"""
+        if not self.cache:
+            return {'enabled': False}
+        
+        stats = self.cache.get_stats()
+        stats['enabled'] = True
+        return stats
+    
+    def get_batching_stats(self) -> Dict:
+        """Get micro-batching statistics"""
+        if not self.batcher:
+            return {'enabled': False}
+        
+        stats = self.batcher.get_stats()
+        stats['enabled'] = True
+        return stats
+    
     def _get_local_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Get embeddings using local Hugging Face model"""
         try:
@@ -114,6 +341,14 @@ class EmbeddingService:
             logger.error(f"❌ Local embedding generation failed: {e}")
             raise
     
+    def _get_server_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings from the shared embedding server"""
+        try:
+            return self.server.embed(texts)
+        except Exception as e:
+            logger.error(f"❌ Embedding server request failed: {e}")
+            raise
+    
     def _get_azure_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Get embeddings using Azure OpenAI"""
         try:
@@ -124,6 +359,9 @@ class EmbeddingService:
     
     def get_embedding_dimension(self) -> int:
         """Get embedding vector dimension"""
+        self.warm_up()
+        if self.server and self._server_dimension:
+            return self._server_dimension
         if self.use_local_model:
             return self.model.get_sentence_embedding_dimension()
         else:
@@ -163,8 +401,12 @@ try:
         use_local_model=AIConfig.USE_LOCAL_EMBEDDINGS,
         model_name=AIConfig.EMBEDDING_MODEL_NAME
     )
-    model_type = "local (Hugging Face)" if AIConfig.USE_LOCAL_EMBEDDINGS else "Azure OpenAI"
-    logger.info(f"🚀 Embedding service initialized with {AIConfig.EMBEDDING_MODEL_NAME} ({model_type})")
+    if embedding_service.server:
+        model_type = f"embedding server at {AIConfig.EMBEDDING_SERVER_URL}"
+    else:
+        model_type = "local (Hugging Face)" if AIConfig.USE_LOCAL_EMBEDDINGS else "Azure OpenAI"
+    load_mode = "on first use" if not embedding_service.is_ready else "loaded"
+    logger.info(f"🚀 Embedding service initialized with {AIConfig.EMBEDDING_MODEL_NAME} ({model_type}, {load_mode})")
 except Exception as e:
     logger.warning(f"⚠️ Failed to initialize local embeddings, falling back to Azure: {e}")
     try:
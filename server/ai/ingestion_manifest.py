@@ -0,0 +1,125 @@
+"""
+Ingestion Manifest
+Tracks which files are in the knowledge base and which chunk IDs they own
+
+Lets knowledge-base syncs skip unchanged files, upsert changed ones
+and delete the chunks of removed files instead of re-ingesting
+the whole corpus.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Hash file contents in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(file_hash: str, chunk_index: int) -> str:
+    """Deterministic Chroma ID for a chunk of a file"""
+    return f"{file_hash[:32]}-{chunk_index}"
+
+
+class IngestionManifest:
+    """
+    JSON manifest of ingested files
+
+    Entry per absolute file path:
+    {mtime, size, sha256, chunk_ids}
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize manifest
+
+        Args:
+            path: JSON file the manifest is persisted to
+        """
+        self.path = path
+        self.files: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        # No manifest on disk yet: the collection may hold chunks from before
+        # incremental ingestion (random UUIDs) that no entry accounts for
+        self.is_new = not os.path.exists(path)
+        self.load()
+
+    def load(self):
+        """Load manifest from disk (missing or corrupt file starts empty)"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.files = json.load(f).get('files', {})
+            logger.info(f"📒 Ingestion manifest loaded ({len(self.files)} files)")
+        except Exception as e:
+            logger.error(f"❌ Failed to load ingestion manifest, starting empty: {e}")
+            self.files = {}
+
+    def save(self):
+        """Persist manifest atomically"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'files': self.files}, f, indent=1)
+                os.replace(tmp_path, self.path)
+                self.is_new = False
+            except Exception as e:
+                logger.error(f"❌ Failed to save ingestion manifest: {e}")
+
+    def get(self, file_path: str) -> Optional[Dict]:
+        return self.files.get(file_path)
+
+    def is_unchanged(self, file_path: str, stat: os.stat_result) -> bool:
+        """Cheap check: same mtime and size as the last ingest"""
+        entry = self.files.get(file_path)
+        return bool(entry) and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size
+
+    def record(self, file_path: str, stat: os.stat_result, sha256: str, chunk_ids: List[str]):
+        """Record a successfully ingested file"""
+        self.files[file_path] = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha256': sha256,
+            'chunk_ids': chunk_ids
+        }
+
+    def remove(self, file_path: str) -> List[str]:
+        """Forget a file and return the chunk IDs it owned"""
+        entry = self.files.pop(file_path, None)
+        return entry['chunk_ids'] if entry else []
+
+    def files_under(self, directory: str, file_extensions: List[str], recursive: bool = True) -> List[str]:
+        """Tracked files inside a directory with one of the given extensions"""
+        directory = os.path.abspath(directory)
+        prefix = os.path.join(directory, '')
+        extensions = tuple(ext.lower() for ext in file_extensions)
+        return [
+            path for path in self.files
+            if path.startswith(prefix)
+            and path.lower().endswith(extensions)
+            and (recursive or os.path.dirname(path) == directory)
+        ]
+
+    def owned_chunk_ids(self, exclude: Optional[str] = None) -> set:
+        """Chunk IDs referenced by any tracked file other than exclude"""
+        return {
+            chunk for path, entry in self.files.items() if path != exclude
+            for chunk in entry['chunk_ids']
+        }
+
+    def clear(self):
+        """Forget every file"""
+        self.files = {}
@@ -6,11 +6,14 @@ Following Harvey.ai accuracy standards
 
 import logging
 import re
-from typing import List, Dict, Optional, Tuple
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Any, Callable, List, Dict, Optional, Tuple
 from openai import AzureOpenAI
 
 from .config import AIConfig
 from .azure_openai_service import ai_service
+from .verification_cache import VerificationCache, split_clauses
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +28,10 @@ class LegalVerifier:
     3. Citation verification against Indian Code
     4. Self-consistency checking
     5. Risk scoring per clause
+    
+    Independent LLM stages are fanned out on a shared thread pool with a
+    per-stage timeout; stages that fail or time out are reported and the
+    score is computed from the stages that completed.
     """
     
     # Indian Acts database for citation verification
@@ -45,9 +52,22 @@ class LegalVerifier:
         "Indian Succession Act": {"year": 1925, "sections": range(1, 390)},
     }
     
+    # Independent answers sampled for the self-consistency check
+    CONSISTENCY_SAMPLES = 3
+    
     def __init__(self):
         """Initialize legal verifier"""
         self.client = ai_service.client
+        self.stage_timeout = AIConfig.VERIFIER_STAGE_TIMEOUT
+        self.executor = ThreadPoolExecutor(
+            max_workers=AIConfig.VERIFIER_MAX_WORKERS,
+            thread_name_prefix='verifier'
+        )
+        self.cache = VerificationCache(
+            max_documents=AIConfig.VERIFICATION_CACHE_MAX_DOCUMENTS,
+            max_clauses=AIConfig.VERIFICATION_CACHE_MAX_CLAUSES,
+            ttl_seconds=AIConfig.VERIFICATION_CACHE_TTL
+        ) if AIConfig.ENABLE_VERIFICATION_CACHE else None
         logger.info("⚖️ Legal Verifier initialized")
     
     def verify_document(
@@ -85,24 +105,57 @@ class LegalVerifier:
         }
         
         try:
-            # Step 1: Extract and verify citations
+            start = time.perf_counter()
+            
+            # Steps 2-4 are independent LLM calls: fan them out
+            stages = {
+                "clause_analysis": (
+                    (lambda: self._analyze_clauses_incremental(document_content, document_type))
+                    if self.cache else
+                    (lambda: self._analyze_clauses(document_content, document_type))
+                )
+            }
+            if verification_level in ["standard", "comprehensive"]:
+                stages["dual_model"] = lambda: self._dual_model_check(document_content, document_type)
+            if verification_level == "comprehensive":
+                for i in range(self.CONSISTENCY_SAMPLES):
+                    stages[f"consistency_{i + 1}"] = lambda: self._self_consistency_sample(document_content, document_type)
+            
+            futures = self.submit_stages(stages)
+            
+            # Step 1: Extract and verify citations (local, runs while the LLM stages are in flight)
             verification_report["citation_verification"] = self._verify_citations(document_content)
             
+            results, stage_status = self.collect_stages(futures, start)
+            verification_report["stages"] = stage_status
+            
             # Step 2: Clause-level analysis
-            verification_report["clause_analysis"] = self._analyze_clauses(
-                document_content, document_type
-            )
+            clause_result = results.get("clause_analysis", [])
+            if self.cache and isinstance(clause_result, tuple):
+                verification_report["clause_analysis"], verification_report["clause_cache"] = clause_result
+            else:
+                verification_report["clause_analysis"] = clause_result
             
             # Step 3: Dual-model verification
-            if verification_level in ["standard", "comprehensive"]:
-                dual_verification = self._dual_model_check(document_content, document_type)
-                verification_report.update(dual_verification)
+            if "dual_model" in results:
+                verification_report.update(results["dual_model"])
             
-            # Step 4: Self-consistency check
+            # Step 4: Self-consistency check (scored on whichever samples completed)
             if verification_level == "comprehensive":
-                consistency = self._self_consistency_check(document_content, document_type)
-                verification_report["consistency_score"] = consistency["score"]
-                verification_report["consistency_issues"] = consistency.get("issues", [])
+                samples = [results[name] for name in stages if name.startswith("consistency_") and name in results]
+                if len(samples) >= 2:
+                    consistency = self._score_consistency(samples)
+                    verification_report["consistency_score"] = consistency["score"]
+                    verification_report["consistency_issues"] = consistency.get("issues", [])
+                else:
+                    verification_report["consistency_issues"] = [
+                        "Consistency check incomplete - human review recommended"
+                    ]
+            
+            verification_report["incomplete_stages"] = [
+                name for name, status in stage_status.items() if status["status"] != "ok"
+            ]
+            verification_report["partial"] = bool(verification_report["incomplete_stages"])
             
             # Step 5: Temporal and jurisdictional awareness
             verification_report["temporal_check"] = self._check_temporal_validity(document_content)
@@ -110,8 +163,13 @@ class LegalVerifier:
             
             # Calculate overall scores
             verification_report["overall_score"] = self._calculate_overall_score(verification_report)
+            verification_report["verification_ms"] = round((time.perf_counter() - start) * 1000, 2)
             
-            logger.info(f"✅ Verification complete. Overall score: {verification_report['overall_score']}/100")
+            logger.info(
+                f"✅ Verification complete. Overall score: {verification_report['overall_score']}/100 | "
+                f"{verification_report['verification_ms']}ms"
+                + (f" | incomplete: {verification_report['incomplete_stages']}" if verification_report["partial"] else "")
+            )
             
         except Exception as e:
             logger.error(f"❌ Verification failed: {e}")
@@ -119,6 +177,54 @@ class LegalVerifier:
         
         return verification_report
     
+    def submit_stages(self, stages: Dict[str, Callable[[], Any]]) -> Dict[str, Future]:
+        """Start independent stages on the verifier pool"""
+        return {name: self.executor.submit(self._timed, fn) for name, fn in stages.items()}
+    
+    def collect_stages(
+        self,
+        futures: Dict[str, Future],
+        started: float,
+        timeout: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Dict]]:
+        """
+        Wait for submitted stages until the shared deadline
+        
+        Args:
+            futures: Stage name -> future from submit_stages()
+            started: perf_counter() reading when the stages were submitted
+            timeout: Seconds allowed per stage from submission (default: VERIFIER_STAGE_TIMEOUT)
+        
+        Returns:
+            (results of completed stages, {stage: {status, duration_ms[, error]}})
+        """
+        timeout = self.stage_timeout if timeout is None else timeout
+        results: Dict[str, Any] = {}
+        status: Dict[str, Dict] = {}
+        
+        for name, future in futures.items():
+            remaining = max(0.0, timeout - (time.perf_counter() - started))
+            try:
+                results[name], duration_ms = future.result(timeout=remaining)
+                status[name] = {"status": "ok", "duration_ms": duration_ms}
+            except FuturesTimeout:
+                # The call keeps running in its worker; its result is discarded
+                future.cancel()
+                status[name] = {"status": "timeout", "duration_ms": round(timeout * 1000, 2)}
+                logger.warning(f"⏱️ Verification stage '{name}' timed out after {timeout}s")
+            except Exception as e:
+                status[name] = {"status": "error", "error": str(e)}
+                logger.error(f"❌ Verification stage '{name}' failed: {e}")
+        
+        return results, status
+    
+    @staticmethod
+    def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+        """Run a stage and measure it"""
+        start = time.perf_counter()
+        result = fn()
+        return result, round((time.perf_counter() - start) * 1000, 2)
+    
     def _verify_citations(self, document: str) -> Dict:
         """
         Verify legal citations against Indian Code database
@@ -253,6 +359,114 @@ Format response as JSON array of clauses."""
             logger.error(f"Clause analysis failed: {e}")
             return []
     
+    def _analyze_clauses_incremental(self, document: str, document_type: str) -> Tuple[List[Dict], Dict]:
+        """
+        Clause-level analysis that reuses cached analyses of unchanged clauses
+        
+        The document is split into top-level clauses; only clauses without a
+        cached analysis are sent to the model (in one call).
+        
+        Returns:
+            (clause analyses in document order, {clauses, reused, analyzed})
+        """
+        clauses = split_clauses(document)
+        keys = [self.cache.clause_key(clause, document_type) for clause in clauses]
+        analyses = self.cache.get_clauses(keys)
+        missing = [i for i, analysis in enumerate(analyses) if analysis is None]
+        unmatched = []
+        
+        if missing:
+            fresh, unmatched = self._analyze_clause_batch([clauses[i] for i in missing], document_type)
+            for i, analysis in zip(missing, fresh):
+                if analysis is not None:
+                    analyses[i] = analysis
+                    self.cache.put_clause(keys[i], analysis)
+        
+        results = [
+            {**analysis, "clause_index": i + 1}
+            for i, analysis in enumerate(analyses) if analysis is not None
+        ]
+        results.extend(unmatched)
+        
+        stats = {
+            "clauses": len(clauses),
+            "reused": len(clauses) - len(missing),
+            "analyzed": len(missing)
+        }
+        logger.info(f"📑 Clause analysis: {stats['reused']} reused, {stats['analyzed']} analyzed")
+        return results, stats
+    
+    def _analyze_clause_batch(self, clauses: List[str], document_type: str) -> Tuple[List[Optional[Dict]], List[Dict]]:
+        """
+        Analyze specific clauses in one call
+        
+        Returns:
+            (analysis per input clause or None if the model's answer could not be
+             matched to it, unmatched analyses to report as-is)
+        """
+        numbered = "\n\n".join(f"[{i}]\n{clause}" for i, clause in enumerate(clauses, 1))
+        prompt = f"""Analyze each numbered clause of this {document_type}.
+
+For EACH clause, provide:
+1. clause_index (the number in square brackets)
+2. Clause text (summary)
+3. Legal validity (valid/questionable/invalid)
+4. Risk level (low/medium/high/critical)
+5. Governing law (which Indian Act/Section applies)
+6. Potential issues
+7. Recommendation
+
+Clauses:
+---
+{numbered}
+---
+
+Format response as a JSON array with exactly one object per clause, in the same order."""
+
+        try:
+            messages = [
+                {
+                    "role": "system",
+                    "content": "You are an expert Indian legal document analyst. Analyze clauses for compliance with Indian law."
+                },
+                {"role": "user", "content": prompt}
+            ]
+            
+            response = ai_service.chat_completion(messages, temperature=0.3)
+            
+            import json
+            try:
+                parsed = json.loads(response)
+            except:
+                return [None] * len(clauses), [{
+                    "clause_number": "Overall",
+                    "analysis": response,
+                    "risk_level": "unknown"
+                }]
+            
+            if not isinstance(parsed, list):
+                return [None] * len(clauses), [parsed]
+            
+            analyses: List[Optional[Dict]] = [None] * len(clauses)
+            unmatched = []
+            for position, item in enumerate(parsed):
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    index = int(item.get("clause_index", position + 1)) - 1
+                except (TypeError, ValueError):
+                    index = position
+                if 0 <= index < len(clauses) and analyses[index] is None:
+                    analyses[index] = item
+                else:
+                    unmatched.append(item)
+            
+            return analyses, unmatched
+            
+        except Exception as e:
+            logger.error(f"Clause analysis failed: {e}")
+            return [None] * len(clauses), []
+    
     def _dual_model_check(self, document: str, document_type: str) -> Dict:
         """
         Dual-model verification
@@ -322,20 +536,26 @@ Be thorough and critical. Flag any issues."""
         Returns:
             Consistency score and issues
         """
+        responses = [
+            self._self_consistency_sample(document, document_type)
+            for _ in range(self.CONSISTENCY_SAMPLES)
+        ]
+        return self._score_consistency(responses)
+    
+    def _self_consistency_sample(self, document: str, document_type: str) -> str:
+        """One independent answer for the self-consistency check"""
         query = f"Is this {document_type} legally enforceable under Indian law? Explain briefly."
-        
-        responses = []
-        for i in range(3):
-            messages = [
-                {"role": "system", "content": "You are an Indian legal expert."},
-                {"role": "user", "content": f"Document:\n{document}\n\nQuestion: {query}"}
-            ]
-            response = ai_service.chat_completion(messages, temperature=0.5)
-            responses.append(response)
-        
+        messages = [
+            {"role": "system", "content": "You are an Indian legal expert."},
+            {"role": "user", "content": f"Document:\n{document}\n\nQuestion: {query}"}
+        ]
+        return ai_service.chat_completion(messages, temperature=0.5)
+    
+    def _score_consistency(self, responses: List[str]) -> Dict:
+        """Score agreement between self-consistency answers"""
         # Check similarity (simple keyword overlap for now)
         # In production, use semantic similarity with embeddings
-        common_keywords = set(responses[0].lower().split()) & set(responses[1].lower().split()) & set(responses[2].lower().split())
+        common_keywords = set.intersection(*(set(response.lower().split()) for response in responses))
         
         consistency_score = min(100, len(common_keywords) * 5)
         
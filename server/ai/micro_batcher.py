@@ -0,0 +1,164 @@
+"""
+Micro-Batcher
+Coalesces concurrent small requests into one batched call
+
+Callers on different threads submit() a few items each; a single worker
+thread drains the queue, waits up to max_wait_ms for more callers, runs
+one batch_fn over the combined items and hands each caller its slice of
+the results. Used to share one model forward pass across requests.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching queue
+
+    Features:
+    - Batch closes at max_batch_size items or after max_wait_ms, whichever first
+    - Requests already queued are taken without waiting, so a busy batcher
+      batches for free
+    - The window is only held open once callers actually overlap (the previous
+      batch coalesced several requests), so a lone request at low load is not delayed
+    - Exceptions from batch_fn are raised in every caller of that batch
+    - Worker restarts after fork (gunicorn preload)
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List], List],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        name: str = 'micro-batcher'
+    ):
+        """
+        Initialize batcher (the worker thread starts on first submit)
+
+        Args:
+            batch_fn: Maps a list of items to a list of results of the same length
+            max_batch_size: Maximum items per batch_fn call
+            max_wait_ms: Longest time a batch is held open for more requests
+            name: Worker thread name
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.name = name
+
+        self._queue: "queue.Queue[Tuple[List, Future]]" = queue.Queue()
+        self._last_batch_requests = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'items': 0,
+            'batches': 0,
+            'max_batch_items': 0,
+            'total_queue_ms': 0.0
+        }
+
+    def _ensure_started(self):
+        """Start the worker once per process"""
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, items: List, timeout: Optional[float] = None) -> List:
+        """
+        Process items as part of the next batch
+
+        Args:
+            items: Items for batch_fn
+            timeout: Seconds to wait for the result
+
+        Returns:
+            Results for items, in order
+        """
+        if not items:
+            return []
+
+        self._ensure_started()
+        future: Future = Future()
+        future.enqueued_at = time.perf_counter()
+        self._queue.put((list(items), future))
+        return future.result(timeout)
+
+    def _collect(self) -> List[Tuple[List, Future]]:
+        """Block for one request, then gather more until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        count = len(batch[0][0])
+        max_wait = self.max_wait if self._last_batch_requests > 1 else 0.0
+        deadline = time.perf_counter() + max_wait
+
+        while count < self.max_batch_size:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            batch.append(request)
+            count += len(request[0])
+
+        self._last_batch_requests = len(batch)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for request_items, _ in batch for item in request_items]
+            started = time.perf_counter()
+
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.error(f"❌ {self.name} batch of {len(items)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                with self._stats_lock:
+                    self.stats['requests'] += len(batch)
+                    self.stats['items'] += len(items)
+                    self.stats['batches'] += 1
+                    self.stats['max_batch_items'] = max(self.stats['max_batch_items'], len(items))
+                    self.stats['total_queue_ms'] += sum(
+                        (started - future.enqueued_at) * 1000 for _, future in batch
+                    )
+
+            offset = 0
+            for request_items, future in batch:
+                future.set_result(results[offset:offset + len(request_items)])
+                offset += len(request_items)
+
+    def get_stats(self) -> Dict:
+        """Get batching statistics"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['avg_batch_items'] = round(stats['items'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['avg_requests_per_batch'] = round(stats['requests'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['avg_queue_ms'] = round(stats['total_queue_ms'] / stats['requests'], 2) if stats['requests'] else 0.0
+        del stats['total_queue_ms']
+        stats.update({'max_batch_size': self.max_batch_size, 'max_wait_ms': self.max_wait * 1000})
+        return stats
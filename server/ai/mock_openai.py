@@ -0,0 +1,414 @@
+"""
+Mock OpenAI Backend
+Local stand-in for the Azure OpenAI chat API (LLM_BACKEND=mock)
+
+Serves chat completions (plain and streaming) and embeddings with the
+same client surface and response types as the openai SDK, so every code
+path -- AzureOpenAIService, the async pooled client, the verifier fan-out
+and the routes that call ai_service.client directly -- runs unchanged
+without network access or credentials.
+
+Timing is simulated from configuration:
+- time to first token drawn from a latency distribution (fixed, uniform,
+  normal, lognormal or exponential with a given mean and standard deviation)
+- output generated at a fixed tokens-per-second rate
+- injected failures (HTTP-style status codes) and mid-stream aborts
+"""
+
+import time
+import math
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Union
+
+from openai.types import CompletionUsage, CreateEmbeddingResponse, Embedding
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice, ChoiceDelta
+from openai.types.create_embedding_response import Usage as EmbeddingUsage
+
+from .config import AIConfig
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+# Filler the mock "generates", one word per token
+FILLER = (
+    "This is a simulated response from the mock language model backend. Under the Indian Contract Act, "
+    "an agreement enforceable by law is a contract, and the parties should record the consideration, "
+    "the obligations of each party, the term, termination rights and the governing law. The clauses "
+    "above are illustrative only and should be reviewed by a qualified advocate before execution."
+).split()
+
+
+class MockLLMError(Exception):
+    """Injected API failure carrying the simulated HTTP status code"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+
+
+class MockLLMBackend:
+    """
+    Shared timing, failure and statistics model behind the mock clients
+
+    Features:
+    - Time to first token sampled from a configurable distribution
+    - Output paced at tokens_per_second (whole response for non-streaming calls)
+    - Failure injection with configurable status codes (429s fail fast)
+    - Mid-stream abort injection
+    - Seedable for reproducible runs
+    """
+
+    def __init__(
+        self,
+        distribution: str = 'lognormal',
+        latency_ms: float = 400.0,
+        latency_std_ms: float = 150.0,
+        tokens_per_second: float = 60.0,
+        output_tokens: int = 200,
+        failure_rate: float = 0.0,
+        failure_status: Optional[List[int]] = None,
+        stream_abort_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize backend
+
+        Args:
+            distribution: Time-to-first-token distribution ('fixed', 'uniform', 'normal',
+                'lognormal' or 'exponential')
+            latency_ms: Mean time to first token
+            latency_std_ms: Standard deviation of time to first token (ignored by fixed/exponential)
+            tokens_per_second: Generation rate (0 = instant)
+            output_tokens: Tokens per response (capped by the request's max_tokens)
+            failure_rate: Fraction of requests that fail
+            failure_status: Status codes injected failures are drawn from
+            stream_abort_rate: Fraction of streams cut off halfway
+            seed: Random seed (None = nondeterministic)
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution} (expected one of {DISTRIBUTIONS})")
+
+        self.distribution = distribution
+        self.latency_ms = max(0.0, latency_ms)
+        self.latency_std_ms = max(0.0, latency_std_ms)
+        self.tokens_per_second = max(0.0, tokens_per_second)
+        self.output_tokens = max(1, output_tokens)
+        self.failure_rate = min(1.0, max(0.0, failure_rate))
+        self.failure_status = failure_status or [500]
+        self.stream_abort_rate = min(1.0, max(0.0, stream_abort_rate))
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'streams': 0,
+            'embeddings': 0,
+            'failures': 0,
+            'stream_aborts': 0,
+            'completion_tokens': 0,
+            'total_first_token_ms': 0.0
+        }
+
+    @classmethod
+    def from_config(cls) -> 'MockLLMBackend':
+        """Backend as configured in AIConfig (MOCK_LLM_*)"""
+        return cls(
+            distribution=AIConfig.MOCK_LLM_LATENCY_DISTRIBUTION,
+            latency_ms=AIConfig.MOCK_LLM_LATENCY_MS,
+            latency_std_ms=AIConfig.MOCK_LLM_LATENCY_STD_MS,
+            tokens_per_second=AIConfig.MOCK_LLM_TOKENS_PER_SECOND,
+            output_tokens=AIConfig.MOCK_LLM_OUTPUT_TOKENS,
+            failure_rate=AIConfig.MOCK_LLM_FAILURE_RATE,
+            failure_status=[int(code) for code in AIConfig.MOCK_LLM_FAILURE_STATUS.split(',') if code.strip()],
+            stream_abort_rate=AIConfig.MOCK_LLM_STREAM_ABORT_RATE,
+            seed=AIConfig.MOCK_LLM_SEED
+        )
+
+    # ----- sampling -----
+
+    def sample_first_token_ms(self) -> float:
+        """Time to first token in ms"""
+        mean, std = self.latency_ms, self.latency_std_ms
+        with self._lock:
+            if self.distribution == 'fixed' or mean == 0:
+                value = mean
+            elif self.distribution == 'uniform':
+                half_width = std * math.sqrt(3)
+                value = self._rng.uniform(mean - half_width, mean + half_width)
+            elif self.distribution == 'normal':
+                value = self._rng.gauss(mean, std)
+            elif self.distribution == 'exponential':
+                value = self._rng.expovariate(1.0 / mean)
+            else:
+                # Lognormal with the requested mean and standard deviation
+                sigma2 = math.log(1 + (std / mean) ** 2)
+                value = self._rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return max(0.0, value)
+
+    def _roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def plan(self, messages: List[Dict], max_tokens: Optional[int], json_mode: bool, stream: bool) -> Dict:
+        """
+        Decide the outcome of one request
+
+        Returns:
+            {'first_token_s', 'tokens' (output pieces), 'failure' (MockLLMError or None),
+             'abort_at' (token index or None), 'prompt_tokens'}
+        """
+        limit = min(self.output_tokens, max_tokens or self.output_tokens)
+        failure = None
+        if self._roll(self.failure_rate):
+            with self._lock:
+                status = self._rng.choice(self.failure_status)
+            failure = MockLLMError(status, 'Rate limit exceeded (mock)' if status == 429 else 'Injected failure (mock)')
+
+        abort_at = None
+        if stream and failure is None and self._roll(self.stream_abort_rate):
+            abort_at = max(1, limit // 2)
+
+        # 429s are rejected before any generation starts
+        first_token_ms = 5.0 if failure is not None and failure.status_code == 429 else self.sample_first_token_ms()
+
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['streams'] += int(stream)
+            self.stats['failures'] += int(failure is not None)
+            self.stats['stream_aborts'] += int(abort_at is not None)
+            if failure is None:
+                self.stats['completion_tokens'] += abort_at or limit
+                self.stats['total_first_token_ms'] += first_token_ms
+
+        return {
+            'first_token_s': first_token_ms / 1000,
+            'tokens': self._tokens(limit, json_mode),
+            'failure': failure,
+            'abort_at': abort_at,
+            'prompt_tokens': sum(len(str(m.get('content', ''))) for m in messages) // 4
+        }
+
+    @staticmethod
+    def _tokens(count: int, json_mode: bool) -> List[str]:
+        """Response pieces, one per simulated token"""
+        words = [FILLER[i % len(FILLER)] for i in range(count)]
+        if json_mode:
+            # Valid JSON whatever the length; callers fall back to their defaults for missing keys
+            return ['{"mock": true, "notes": "'] + [word.replace('"', '') + ' ' for word in words[:-1]] + ['"}']
+        return [word + ' ' for word in words[:-1]] + words[-1:]
+
+    @property
+    def token_interval_s(self) -> float:
+        return 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def get_stats(self) -> Dict:
+        """Get mock backend statistics"""
+        with self._lock:
+            stats = dict(self.stats)
+        served = stats['requests'] - stats['failures']
+        stats['avg_first_token_ms'] = round(stats['total_first_token_ms'] / served, 2) if served else 0.0
+        del stats['total_first_token_ms']
+        stats.update({
+            'distribution': self.distribution,
+            'latency_ms': self.latency_ms,
+            'latency_std_ms': self.latency_std_ms,
+            'tokens_per_second': self.tokens_per_second,
+            'failure_rate': self.failure_rate,
+            'stream_abort_rate': self.stream_abort_rate
+        })
+        return stats
+
+
+# ----- response objects -----
+
+def _is_json_request(messages: List[Dict], response_format: Optional[Dict]) -> bool:
+    if response_format and response_format.get('type') == 'json_object':
+        return True
+    return any('json' in str(m.get('content', '')).lower() for m in messages if m.get('role') == 'system')
+
+
+def _completion(model: str, plan: Dict) -> ChatCompletion:
+    content = ''.join(plan['tokens'])
+    completion_tokens = len(plan['tokens'])
+    return ChatCompletion(
+        id=f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        object='chat.completion',
+        created=int(time.time()),
+        model=model,
+        choices=[Choice(
+            index=0,
+            finish_reason='stop',
+            message=ChatCompletionMessage(role='assistant', content=content)
+        )],
+        usage=CompletionUsage(
+            prompt_tokens=plan['prompt_tokens'],
+            completion_tokens=completion_tokens,
+            total_tokens=plan['prompt_tokens'] + completion_tokens
+        )
+    )
+
+
+def _chunk(completion_id: str, model: str, content: Optional[str], finish_reason: Optional[str] = None) -> ChatCompletionChunk:
+    return ChatCompletionChunk(
+        id=completion_id,
+        object='chat.completion.chunk',
+        created=int(time.time()),
+        model=model,
+        choices=[ChunkChoice(
+            index=0,
+            finish_reason=finish_reason,
+            delta=ChoiceDelta(role='assistant' if content == '' else None, content=content)
+        )]
+    )
+
+
+def _embedding_vector(text: str, dimension: int) -> List[float]:
+    """Deterministic unit vector for a text"""
+    rng = random.Random(hashlib.sha1(text.encode('utf-8')).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimension)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _embeddings(model: str, texts: Union[str, List[str]], dimension: int) -> CreateEmbeddingResponse:
+    texts = [texts] if isinstance(texts, str) else texts
+    tokens = sum(len(text) for text in texts) // 4
+    return CreateEmbeddingResponse(
+        object='list',
+        model=model,
+        data=[
+            Embedding(object='embedding', index=i, embedding=_embedding_vector(text, dimension))
+            for i, text in enumerate(texts)
+        ],
+        usage=EmbeddingUsage(prompt_tokens=tokens, total_tokens=tokens)
+    )
+
+
+# ----- sync client -----
+
+class _Completions:
+    def __init__(self, backend: MockLLMBackend):
+        self.backend = backend
+
+    def create(
+        self,
+        model: str,
+        messages: List[Dict],
+        stream: bool = False,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict] = None,
+        **kwargs
+    ) -> Union[ChatCompletion, Iterator[ChatCompletionChunk]]:
+        plan = self.backend.plan(messages, max_tokens, _is_json_request(messages, response_format), stream)
+        time.sleep(plan['first_token_s'])
+        if plan['failure']:
+            raise plan['failure']
+
+        if stream:
+            return self._stream(model, plan)
+
+        time.sleep(len(plan['tokens']) * self.backend.token_interval_s)
+        return _completion(model, plan)
+
+    def _stream(self, model: str, plan: Dict) -> Iterator[ChatCompletionChunk]:
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        interval = self.backend.token_interval_s
+        yield _chunk(completion_id, model, '')
+        for i, token in enumerate(plan['tokens']):
+            if plan['abort_at'] is not None and i == plan['abort_at']:
+                raise MockLLMError(500, 'Stream interrupted (mock)')
+            if i:
+                time.sleep(interval)
+            yield _chunk(completion_id, model, token)
+        yield _chunk(completion_id, model, None, 'stop')
+
+
+class _Chat:
+    def __init__(self, backend: MockLLMBackend):
+        self.completions = _Completions(backend)
+
+
+class _Embeddings:
+    def __init__(self, backend: MockLLMBackend):
+        self.backend = backend
+
+    def create(self, model: str, input: Union[str, List[str]], **kwargs) -> CreateEmbeddingResponse:
+        with self.backend._lock:
+            self.backend.stats['embeddings'] += 1
+        return _embeddings(model, input, AIConfig.MOCK_LLM_EMBEDDING_DIM)
+
+
+class MockOpenAI:
+    """Drop-in for AzureOpenAI: client.chat.completions.create / client.embeddings.create"""
+
+    def __init__(self, backend: Optional[MockLLMBackend] = None):
+        self.backend = backend or mock_llm_backend
+        self.chat = _Chat(self.backend)
+        self.embeddings = _Embeddings(self.backend)
+
+
+# ----- async client -----
+
+class _AsyncCompletions:
+    def __init__(self, backend: MockLLMBackend):
+        self.backend = backend
+
+    async def create(
+        self,
+        model: str,
+        messages: List[Dict],
+        stream: bool = False,
+        max_tokens: Optional[int] = None,
+        response_format: Optional[Dict] = None,
+        **kwargs
+    ) -> Union[ChatCompletion, AsyncIterator[ChatCompletionChunk]]:
+        plan = self.backend.plan(messages, max_tokens, _is_json_request(messages, response_format), stream)
+        await asyncio.sleep(plan['first_token_s'])
+        if plan['failure']:
+            raise plan['failure']
+
+        if stream:
+            return self._stream(model, plan)
+
+        await asyncio.sleep(len(plan['tokens']) * self.backend.token_interval_s)
+        return _completion(model, plan)
+
+    async def _stream(self, model: str, plan: Dict) -> AsyncIterator[ChatCompletionChunk]:
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        interval = self.backend.token_interval_s
+        yield _chunk(completion_id, model, '')
+        for i, token in enumerate(plan['tokens']):
+            if plan['abort_at'] is not None and i == plan['abort_at']:
+                raise MockLLMError(500, 'Stream interrupted (mock)')
+            if i:
+                await asyncio.sleep(interval)
+            yield _chunk(completion_id, model, token)
+        yield _chunk(completion_id, model, None, 'stop')
+
+
+class _AsyncChat:
+    def __init__(self, backend: MockLLMBackend):
+        self.completions = _AsyncCompletions(backend)
+
+
+class AsyncMockOpenAI:
+    """Drop-in for AsyncAzureOpenAI: await client.chat.completions.create(...)"""
+
+    def __init__(self, backend: Optional[MockLLMBackend] = None):
+        self.backend = backend or mock_llm_backend
+        self.chat = _AsyncChat(self.backend)
+
+
+# Singleton backend shared by the sync and async mock clients
+mock_llm_backend = MockLLMBackend.from_config()
@@ -3,14 +3,20 @@ RAG Pipeline
 Retrieval Augmented Generation for legal documents
 """
 
+import os
+import json
+import time
 import logging
 from typing import List, Dict, Optional, Union, Generator
 
 from .azure_openai_service import ai_service
 from .vectordb_manager import vector_db
+from .reranker import reranker
+from .embedding_service import embedding_service
 from .document_processor import doc_processor
 from .prompt_templates import PromptTemplates
 from .config import AIConfig
+from .ingestion_manifest import file_sha256, chunk_id
 
 logger = logging.getLogger(__name__)
 
@@ -58,51 +64,67 @@ class RAGPipeline:
             return ai_service.legal_chat(user_query, conversation_history, stream=stream)
         
         try:
-            # Step 1: Retrieve relevant documents
+            start = time.perf_counter()
+            
+            # Step 1: Retrieve relevant documents (embedded and searched once per request)
             logger.info(f"🔍 RAG Query: {user_query[:50]}...")
-            context = vector_db.get_context_for_query(
+            retrieval = vector_db.retrieve(
                 user_query,
-                n_results=n_results or AIConfig.TOP_K_RETRIEVAL
+                n_results=n_results
             )
+            timings = dict(retrieval.timings)
+            
+            stage_start = time.perf_counter()
+            packed = vector_db.pack_context(retrieval)
+            context = packed.text
+            timings['context_ms'] = self._elapsed_ms(stage_start)
             
             if not context:
                 logger.info("No relevant documents found, proceeding without RAG")
+                stage_start = time.perf_counter()
                 response = ai_service.legal_chat(user_query, conversation_history, stream=stream)
+                timings['generation_ms'] = self._elapsed_ms(stage_start)
+                timings['total_ms'] = self._elapsed_ms(start)
                 
                 if include_citations:
                     return {
                         'response': response,
                         'sources': [],
-                        'used_rag': False
+                        'used_rag': False,
+                        'timings': timings
                     }
                 return response
             
-            # Step 2: Build enhanced prompt with context
-            enhanced_prompt = self._build_rag_prompt(user_query, context)
-            
-            # Step 3: Build messages
-            messages = [
-                {"role": "system", "content": PromptTemplates.LEGAL_ASSISTANT_SYSTEM}
-            ]
-            
-            if conversation_history:
-                messages.extend(conversation_history[-AIConfig.MAX_CONVERSATION_HISTORY:])
-            
-            messages.append({"role": "user", "content": enhanced_prompt})
+            # Steps 2-3: Build enhanced prompt with context and messages
+            messages = self._build_messages(user_query, context, conversation_history)
             
             # Step 4: Generate response
-            response = ai_service.chat_completion(messages, stream=stream)
+            stage_start = time.perf_counter()
+            if stream:
+                response = ai_service.chat_completion(messages, stream=True)
+            else:
+                response = ai_service.cached_chat_completion(
+                    'rag',
+                    user_query,
+                    messages,
+                    context_parts=[context, json.dumps(messages[1:-1])],
+                    query_embedding=retrieval.query_embedding
+                )
+            timings['generation_ms'] = self._elapsed_ms(stage_start)
             
-            # Step 5: Format response with citations
+            # Step 5: Format response with citations from the same retrieval
             if include_citations and not stream:
-                search_results = vector_db.search(user_query, n_results)
-                sources = self._format_sources(search_results)
+                sources = self._format_sources(retrieval.to_dict())
+                timings['total_ms'] = self._elapsed_ms(start)
                 
+                logger.info(f"⏱️ RAG timings: {timings}")
                 return {
                     'response': response,
                     'sources': sources,
                     'used_rag': True,
-                    'num_sources': len(sources)
+                    'num_sources': len(sources),
+                    'context': packed.to_dict(),
+                    'timings': timings
                 }
             
             return response
@@ -112,6 +134,113 @@ class RAGPipeline:
             # Fallback to standard chat
             return ai_service.legal_chat(user_query, conversation_history, stream=stream)
     
+    def stream_with_rag(
+        self,
+        user_query: str,
+        conversation_history: Optional[List[Dict]] = None,
+        n_results: int = None
+    ) -> Generator[Dict, None, None]:
+        """
+        Query with RAG and stream the answer as events
+        
+        Yields, in order:
+        - {'event': 'sources', 'data': {sources, used_rag}} before generation starts
+        - {'event': 'token', 'data': str} for each streamed token
+        - {'event': 'done', 'data': {response, usage, timings}} once the stream ends
+        
+        Args:
+            user_query: User's question
+            conversation_history: Previous messages
+            n_results: Number of documents to retrieve
+        """
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        sources: List[Dict] = []
+        context = ""
+        context_report: Dict = {}
+        
+        if self.enabled:
+            try:
+                logger.info(f"🔍 RAG Stream Query: {user_query[:50]}...")
+                retrieval = vector_db.retrieve(
+                    user_query,
+                    n_results=n_results
+                )
+                timings.update(retrieval.timings)
+                
+                stage_start = time.perf_counter()
+                packed = vector_db.pack_context(retrieval)
+                context = packed.text
+                context_report = packed.to_dict()
+                if context:
+                    sources = self._format_sources(retrieval.to_dict())
+                timings['context_ms'] = self._elapsed_ms(stage_start)
+            except Exception as e:
+                logger.error(f"❌ RAG retrieval failed, streaming without context: {e}")
+                context = ""
+        
+        yield {'event': 'sources', 'data': {'sources': sources, 'used_rag': bool(context)}}
+        
+        messages = self._build_messages(user_query, context, conversation_history)
+        input_tokens = ai_service.count_tokens(" ".join(m['content'] for m in messages))
+        
+        stage_start = time.perf_counter()
+        stream = ai_service.chat_completion(messages, stream=True)
+        
+        # chat_completion returns a plain string when the service is unavailable
+        if isinstance(stream, str):
+            stream = iter([stream])
+        
+        tokens = []
+        for token in stream:
+            if not tokens:
+                timings['first_token_ms'] = self._elapsed_ms(start)
+            tokens.append(token)
+            yield {'event': 'token', 'data': token}
+        
+        response = "".join(tokens)
+        timings['generation_ms'] = self._elapsed_ms(stage_start)
+        timings['total_ms'] = self._elapsed_ms(start)
+        output_tokens = ai_service.count_tokens(response)
+        
+        logger.info(f"⏱️ RAG stream timings: {timings}")
+        yield {
+            'event': 'done',
+            'data': {
+                'response': response,
+                'usage': {
+                    'input_tokens': input_tokens,
+                    'output_tokens': output_tokens,
+                    'cost_usd': round(ai_service.estimate_cost(input_tokens, output_tokens), 6)
+                },
+                'context': context_report,
+                'timings': timings
+            }
+        }
+    
+    def _build_messages(
+        self,
+        user_query: str,
+        context: str,
+        conversation_history: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """Build chat messages, wrapping the query with retrieved context when there is any"""
+        messages = [
+            {"role": "system", "content": PromptTemplates.LEGAL_ASSISTANT_SYSTEM}
+        ]
+        
+        if conversation_history:
+            messages.extend(conversation_history[-AIConfig.MAX_CONVERSATION_HISTORY:])
+        
+        content = self._build_rag_prompt(user_query, context) if context else user_query
+        messages.append({"role": "user", "content": content})
+        return messages
+    
+    @staticmethod
+    def _elapsed_ms(start: float) -> float:
+        """Milliseconds elapsed since a perf_counter() reading"""
+        return round((time.perf_counter() - start) * 1000, 2)
+    
     def _build_rag_prompt(self, query: str, context: str) -> str:
         """Build prompt with retrieved context"""
         return f"""{context}
@@ -140,13 +269,24 @@ Based on the above legal information and your expertise in Indian law, please an
         documents = search_results.get('documents', [])
         metadatas = search_results.get('metadatas', [])
         distances = search_results.get('distances', [])
+        rerank_scores = search_results.get('rerank_scores')
+        fusion_scores = search_results.get('fusion_scores')
         
-        for doc, metadata, distance in zip(documents, metadatas, distances):
-            # Calculate similarity score (ChromaDB uses L2 distance, lower is better)
-            similarity = max(0, 1 - (distance / 2))  # Normalize to 0-1 range
+        for i, (doc, metadata, distance) in enumerate(zip(documents, metadatas, distances)):
+            if rerank_scores:
+                # Cross-encoder relevance (0-1) when the results were reranked
+                similarity = rerank_scores[i]
+                threshold = AIConfig.RERANK_MIN_RELEVANCE
+            elif fusion_scores:
+                # Hybrid (RRF) relevance, so keyword-only matches are not dropped on vector distance
+                similarity = fusion_scores[i]
+                threshold = AIConfig.HYBRID_MIN_RELEVANCE
+            else:
+                # Calculate similarity score (ChromaDB uses L2 distance, lower is better)
+                similarity = max(0, 1 - (distance / 2))  # Normalize to 0-1 range
+                threshold = 0.6  # Only include highly relevant sources (>60% similarity)
             
-            # Only include highly relevant sources (>60% similarity)
-            if similarity >= 0.6:
+            if similarity >= threshold:
                 sources.append({
                     'text': doc[:300] + "..." if len(doc) > 300 else doc,
                     'source': metadata.get('source', metadata.get('file_name', 'Legal Document')),
@@ -195,11 +335,14 @@ Based on the above legal information and your expertise in Indian law, please an
                 for chunk in chunks:
                     chunk['metadata'].update(metadata)
             
-            # Add to vector DB
+            # Add to vector DB (IDs derived from content, so re-adding a file replaces its chunks)
+            file_hash = file_sha256(file_path)
             documents = [chunk['text'] for chunk in chunks]
             metadatas = [chunk['metadata'] for chunk in chunks]
+            ids = [chunk_id(file_hash, i) for i in range(len(chunks))]
             
-            success = vector_db.add_documents(documents, metadatas)
+            success = vector_db.upsert_documents(documents, metadatas, ids)
+            vector_db.flush()
             
             if success:
                 logger.info(f"✅ Added {file_path} to knowledge base ({len(chunks)} chunks)")
@@ -225,52 +368,112 @@ Based on the above legal information and your expertise in Indian law, please an
         self,
         directory: str,
         recursive: bool = True,
-        file_extensions: Optional[List[str]] = None
+        file_extensions: Optional[List[str]] = None,
+        workers: Optional[int] = None
     ) -> Dict:
         """
-        Populate knowledge base from directory
+        Sync knowledge base with a directory
+        
+        Incremental: files whose mtime/size (or content hash) match the
+        ingestion manifest are skipped, changed files are upserted under
+        deterministic (file hash, chunk index) IDs, and chunks of files
+        that no longer exist are deleted.
         
         Args:
             directory: Path to directory
             recursive: Search subdirectories
             file_extensions: File types to process
+            workers: Parser processes (default: AIConfig.INGEST_WORKERS)
         
         Returns:
-            Status dict
+            Status dict with per-file parse/index timings and failures
         """
         try:
-            logger.info(f"📚 Populating knowledge base from {directory}")
+            logger.info(f"📚 Syncing knowledge base from {directory}")
             
-            # Process all documents
-            all_chunks = doc_processor.process_directory(
-                directory,
-                file_extensions=file_extensions,
-                recursive=recursive
-            )
-            
-            if not all_chunks:
-                return {
-                    'success': False,
-                    'error': 'No documents found or processed'
-                }
+            manifest = vector_db.manifest
+            file_extensions = file_extensions or doc_processor.SUPPORTED_EXTENSIONS
+            files = [
+                os.path.abspath(str(path))
+                for path in doc_processor.list_files(directory, file_extensions, recursive)
+            ]
             
-            # Add to vector DB in batches
-            batch_size = 100
+            counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'failed': 0}
             total_added = 0
+            errors = []
+            file_reports = []
+            pending = {}  # file_path -> (file_hash, stat, previous entry)
             
-            for i in range(0, len(all_chunks), batch_size):
-                batch = all_chunks[i:i + batch_size]
-                documents = [chunk['text'] for chunk in batch]
-                metadatas = [chunk['metadata'] for chunk in batch]
+            for file_path in files:
+                try:
+                    stat = os.stat(file_path)
+                    if manifest.is_unchanged(file_path, stat):
+                        counts['unchanged'] += 1
+                        continue
+                    
+                    file_hash = file_sha256(file_path)
+                    previous = manifest.get(file_path)
+                    
+                    # Touched but identical content: refresh mtime/size only
+                    if previous and previous['sha256'] == file_hash:
+                        manifest.record(file_path, stat, file_hash, previous['chunk_ids'])
+                        counts['unchanged'] += 1
+                        continue
+                    
+                    pending[file_path] = (file_hash, stat, previous)
+                
+                except Exception as e:
+                    logger.error(f"Failed to ingest {file_path}: {e}")
+                    counts['failed'] += 1
+                    errors.append({'file': file_path, 'error': str(e)})
+            
+            # Parse changed files in a process pool; index each one as soon as it is ready
+            for parsed in doc_processor.iter_processed_files(list(pending.keys()), workers=workers):
+                file_path = parsed['file']
+                file_hash, stat, previous = pending[file_path]
+                report = {key: value for key, value in parsed.items() if key != 'chunks'}
+                
+                try:
+                    if parsed['error']:
+                        raise RuntimeError(parsed['error'])
+                    
+                    start = time.perf_counter()
+                    total_added += self._ingest_file(file_path, file_hash, stat, parsed['chunks'])
+                    report['index_seconds'] = round(time.perf_counter() - start, 3)
+                    counts['updated' if previous else 'added'] += 1
                 
-                if vector_db.add_documents(documents, metadatas):
-                    total_added += len(batch)
+                except Exception as e:
+                    logger.error(f"Failed to ingest {file_path}: {e}")
+                    report['error'] = str(e)
+                    counts['failed'] += 1
+                    errors.append({'file': file_path, 'error': str(e)})
+                
+                file_reports.append(report)
+            
+            # Drop chunks of files that were removed from the directory
+            present = set(files)
+            for file_path in manifest.files_under(directory, file_extensions, recursive):
+                if file_path not in present:
+                    stale = set(manifest.remove(file_path)) - manifest.owned_chunk_ids()
+                    vector_db.delete_documents(sorted(stale))
+                    counts['removed'] += 1
+            
+            # First sync: replace chunks ingested before the manifest existed
+            if manifest.is_new:
+                counts['legacy_chunks_removed'] = self._remove_untracked_chunks(directory, recursive)
+            
+            manifest.save()
+            # Sparse index is saved once per sync rather than after every chunk batch
+            vector_db.flush()
             
-            logger.info(f"✅ Populated knowledge base: {total_added} chunks from {directory}")
+            logger.info(f"✅ Synced knowledge base from {directory}: {counts}, {total_added} chunks written")
             
             return {
-                'success': True,
+                'success': counts['failed'] < len(files) or not files,
                 'total_chunks': total_added,
+                'files': counts,
+                'errors': errors,
+                'file_reports': file_reports,
                 'directory': directory
             }
         
@@ -281,11 +484,78 @@ Based on the above legal information and your expertise in Indian law, please an
                 'error': str(e)
             }
     
+    def _ingest_file(self, file_path: str, file_hash: str, stat: os.stat_result, chunks: List[Dict]) -> int:
+        """
+        Upsert one file's chunks and delete chunks it no longer has
+        
+        Returns:
+            Number of chunks written
+        """
+        manifest = vector_db.manifest
+        ids = [chunk_id(file_hash, i) for i in range(len(chunks))]
+        
+        # Add to vector DB in batches
+        batch_size = 100
+        for i in range(0, len(chunks), batch_size):
+            batch = chunks[i:i + batch_size]
+            if not vector_db.upsert_documents(
+                [chunk['text'] for chunk in batch],
+                [chunk['metadata'] for chunk in batch],
+                ids[i:i + batch_size]
+            ):
+                raise RuntimeError('Failed to add chunks to vector DB')
+        
+        previous = manifest.get(file_path)
+        if previous:
+            stale = set(previous['chunk_ids']) - set(ids) - manifest.owned_chunk_ids(exclude=file_path)
+            vector_db.delete_documents(sorted(stale))
+        
+        manifest.record(file_path, stat, file_hash, ids)
+        return len(chunks)
+    
+    def _remove_untracked_chunks(self, directory: str, recursive: bool = True, page_size: int = 1000) -> int:
+        """
+        Delete chunks of files in a directory that the manifest does not own
+        
+        Collections populated before incremental ingestion hold chunks under
+        random UUIDs; without this the first sync would duplicate the corpus.
+        Only chunks whose file_path metadata lies inside the synced directory
+        are touched, so documents added through the API are kept.
+        
+        Returns:
+            Number of chunks deleted
+        """
+        collection = vector_db.collection
+        if not collection:
+            return 0
+        
+        directory = os.path.abspath(directory)
+        prefix = os.path.join(directory, '')
+        owned = vector_db.manifest.owned_chunk_ids()
+        untracked = []
+        
+        for offset in range(0, collection.count(), page_size):
+            page = collection.get(limit=page_size, offset=offset, include=['metadatas'])
+            for doc_id, metadata in zip(page['ids'], page['metadatas']):
+                file_path = (metadata or {}).get('file_path')
+                if doc_id in owned or not file_path:
+                    continue
+                file_path = os.path.abspath(file_path)
+                if file_path.startswith(prefix) and (recursive or os.path.dirname(file_path) == directory):
+                    untracked.append(doc_id)
+        
+        for start in range(0, len(untracked), page_size):
+            vector_db.delete_documents(untracked[start:start + page_size])
+        if untracked:
+            logger.info(f"🧹 Removed {len(untracked)} chunks ingested before the manifest existed")
+        return len(untracked)
+    
     def search_knowledge_base(
         self,
         query: str,
         n_results: int = 10,
-        filters: Optional[Dict] = None
+        filters: Optional[Dict] = None,
+        mode: Optional[str] = None
     ) -> List[Dict]:
         """
         Search knowledge base
@@ -294,11 +564,12 @@ Based on the above legal information and your expertise in Indian law, please an
             query: Search query
             n_results: Number of results
             filters: Metadata filters
+            mode: 'dense' or 'hybrid' (default: AIConfig.RETRIEVAL_MODE)
         
         Returns:
             List of search results
         """
-        results = vector_db.search(query, n_results, where=filters)
+        results = vector_db.search(query, n_results, where=filters, mode=mode)
         return self._format_sources(results)
     
     def get_stats(self) -> Dict:
@@ -306,6 +577,9 @@ Based on the above legal information and your expertise in Indian law, please an
         return {
             'rag_enabled': self.enabled,
             'vector_db_stats': vector_db.get_stats(),
+            'embedding_cache': embedding_service.get_cache_stats() if embedding_service else {'enabled': False},
+            'embedding_batching': embedding_service.get_batching_stats() if embedding_service else {'enabled': False},
+            'reranker': reranker.get_stats(),
             'chunk_size': AIConfig.CHUNK_SIZE,
             'chunk_overlap': AIConfig.CHUNK_OVERLAP,
             'top_k_retrieval': AIConfig.TOP_K_RETRIEVAL
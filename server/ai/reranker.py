@@ -0,0 +1,162 @@
+"""
+Cross-Encoder Reranker
+Reorders over-fetched retrieval candidates by query-passage relevance
+
+A small CPU cross-encoder reads the query and each candidate together,
+which is far more precise than vector distance alone, so fewer chunks
+need to be sent to the LLM. Scores are cached per (query, chunk) pair.
+"""
+
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .config import AIConfig
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Lazily loaded sentence-transformers CrossEncoder
+
+    Features:
+    - Model loaded on first use (or by warm_up)
+    - Batched scoring of only the uncached pairs
+    - LRU cache keyed by normalized query + chunk ID
+    - Disables itself (callers keep the original order) if the model cannot load
+    """
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        Initialize reranker (the model loads on first use)
+
+        Args:
+            model_name: Hugging Face cross-encoder (default: AIConfig.RERANKER_MODEL)
+            batch_size: Pairs per forward pass (default: AIConfig.RERANK_BATCH_SIZE)
+            cache_size: Cached pair scores (default: AIConfig.RERANK_CACHE_SIZE)
+            enabled: Use reranking at all (default: AIConfig.ENABLE_RERANKING)
+        """
+        self.model_name = model_name or AIConfig.RERANKER_MODEL
+        self.batch_size = batch_size or AIConfig.RERANK_BATCH_SIZE
+        self.cache_size = AIConfig.RERANK_CACHE_SIZE if cache_size is None else cache_size
+        self.enabled = AIConfig.ENABLE_RERANKING if enabled is None else enabled
+
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'pairs': 0,
+            'cache_hits': 0,
+            'batches': 0,
+            'total_ms': 0.0
+        }
+
+    @property
+    def is_ready(self) -> bool:
+        return not self.enabled or self._model is not None
+
+    def warm_up(self) -> bool:
+        """Load the cross-encoder now (idempotent)"""
+        if self.is_ready:
+            return True
+        with self._model_lock:
+            if self._model is None and self.enabled:
+                try:
+                    from sentence_transformers import CrossEncoder
+
+                    logger.info(f"📥 Loading reranker: {self.model_name}")
+                    self._model = CrossEncoder(self.model_name, max_length=AIConfig.RERANK_MAX_LENGTH, device='cpu')
+                    logger.info(f"✅ Loaded reranker {self.model_name}")
+                except Exception as e:
+                    logger.warning(f"⚠️ Reranker unavailable, keeping retrieval order: {e}")
+                    self.enabled = False
+        return True
+
+    @staticmethod
+    def _key(query: str, doc_id: str) -> str:
+        normalized = ' '.join(query.lower().split())
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest() + ':' + doc_id
+
+    def score(self, query: str, documents: List[str], ids: Optional[List[str]] = None) -> Optional[List[float]]:
+        """
+        Relevance of each document to the query
+
+        Args:
+            query: Search query
+            documents: Candidate passages
+            ids: Stable IDs for caching (default: content hashes)
+
+        Returns:
+            Scores in [0, 1] aligned with documents, or None if reranking is unavailable
+        """
+        if not self.enabled or not documents:
+            return None
+        self.warm_up()
+        if self._model is None:
+            return None
+
+        start = time.perf_counter()
+        ids = ids or [hashlib.sha1(doc.encode('utf-8')).hexdigest() for doc in documents]
+        keys = [self._key(query, doc_id) for doc_id in ids]
+
+        with self._cache_lock:
+            scores: List[Optional[float]] = [self._cache.get(key) for key in keys]
+            for key, value in zip(keys, scores):
+                if value is not None:
+                    self._cache.move_to_end(key)
+
+        missing = [i for i, value in enumerate(scores) if value is None]
+        if missing:
+            try:
+                predicted = self._model.predict(
+                    [(query, documents[i]) for i in missing],
+                    batch_size=self.batch_size,
+                    show_progress_bar=False
+                )
+            except Exception as e:
+                logger.error(f"❌ Reranking failed, keeping retrieval order: {e}")
+                return None
+
+            with self._cache_lock:
+                for i, value in zip(missing, predicted):
+                    scores[i] = float(value)
+                    self._cache[keys[i]] = float(value)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        self.stats['requests'] += 1
+        self.stats['pairs'] += len(documents)
+        self.stats['cache_hits'] += len(documents) - len(missing)
+        self.stats['batches'] += -(-len(missing) // self.batch_size)
+        self.stats['total_ms'] += (time.perf_counter() - start) * 1000
+        return scores
+
+    def get_stats(self) -> Dict:
+        """Get reranker statistics"""
+        stats = dict(self.stats)
+        stats['avg_ms'] = round(stats['total_ms'] / stats['requests'], 2) if stats['requests'] else 0.0
+        stats['total_ms'] = round(stats['total_ms'], 2)
+        stats.update({
+            'enabled': self.enabled,
+            'model': self.model_name,
+            'loaded': self._model is not None,
+            'cached_pairs': len(self._cache)
+        })
+        return stats
+
+
+# Singleton instance
+reranker = CrossEncoderReranker()
@@ -0,0 +1,288 @@
+"""
+Semantic Response Cache
+Reuses LLM answers for near-duplicate legal questions
+
+Entries are bucketed by (namespace, context hash) so an answer is only
+reused when the retrieved context and conversation history are identical;
+within a bucket the nearest cached query embedding must clear a cosine
+similarity threshold.
+
+Backends:
+- In-memory (default, LRU-bounded)
+- Redis (uses the existing REDIS_* settings)
+"""
+
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from .config import AIConfig
+
+logger = logging.getLogger(__name__)
+
+
+def context_hash(*parts: str) -> str:
+    """Stable hash of the context an answer depends on"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or '').encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def _normalize(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class SemanticResponseCache:
+    """
+    Embedding-keyed response cache
+
+    Features:
+    - Exact match on context hash, cosine match on query embedding
+    - TTL expiry and size-bounded LRU eviction
+    - Optional Redis backend shared across workers
+    - Hit/miss and tokens-saved counters
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: int = 86400,
+        max_entries: int = 5000,
+        use_redis: bool = False
+    ):
+        """
+        Initialize response cache
+
+        Args:
+            similarity_threshold: Minimum cosine similarity for a hit
+            ttl_seconds: Entry lifetime
+            max_entries: Maximum cached responses
+            use_redis: Store entries in Redis instead of process memory
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.redis_client = None
+        self._lock = threading.Lock()
+
+        # In-memory backend: bucket -> {entry_id: entry}; LRU over (bucket, entry_id)
+        self._buckets: Dict[str, Dict[str, Dict]] = {}
+        self._lru: "OrderedDict[tuple, None]" = OrderedDict()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'tokens_saved': 0
+        }
+
+        if use_redis:
+            self._init_redis()
+
+        logger.info(
+            f"🧠 Response cache initialized (threshold={similarity_threshold}, ttl={ttl_seconds}s, "
+            f"max={max_entries}, redis={self.redis_client is not None})"
+        )
+
+    def _init_redis(self):
+        """Initialize Redis connection, falling back to memory"""
+        try:
+            import redis
+            self.redis_client = redis.Redis(
+                host=AIConfig.REDIS_HOST,
+                port=AIConfig.REDIS_PORT,
+                db=AIConfig.REDIS_DB,
+                password=AIConfig.REDIS_PASSWORD,
+                decode_responses=True
+            )
+            self.redis_client.ping()
+            logger.info("✅ Response cache using Redis")
+        except Exception as e:
+            logger.warning(f"⚠️  Redis connection failed: {e}. Response cache falling back to memory.")
+            self.redis_client = None
+
+    @staticmethod
+    def _bucket(namespace: str, context_key: str) -> str:
+        return f"{namespace}:{context_key}"
+
+    def lookup(self, namespace: str, query_embedding: List[float], context_key: str) -> Optional[Dict]:
+        """
+        Find a cached response for a semantically equivalent query
+
+        Returns:
+            {'response', 'tokens', 'similarity'} or None
+        """
+        bucket = self._bucket(namespace, context_key)
+        query = _normalize(query_embedding)
+
+        try:
+            entries = self._load_bucket(bucket)
+        except Exception as e:
+            logger.warning(f"⚠️ Response cache lookup failed: {e}")
+            entries = {}
+
+        best_id, best_entry, best_score = None, None, -1.0
+        for entry_id, entry in entries.items():
+            score = float(np.dot(query, _normalize(entry['embedding'])))
+            if score > best_score:
+                best_id, best_entry, best_score = entry_id, entry, score
+
+        with self._lock:
+            if best_entry is None or best_score < self.similarity_threshold:
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['hits'] += 1
+            self.stats['tokens_saved'] += best_entry.get('tokens', 0)
+            if not self.redis_client and (bucket, best_id) in self._lru:
+                self._lru.move_to_end((bucket, best_id))
+
+        logger.info(f"🧠 Response cache hit ({namespace}, similarity={best_score:.3f})")
+        return {
+            'response': best_entry['response'],
+            'tokens': best_entry.get('tokens', 0),
+            'similarity': round(best_score, 4)
+        }
+
+    def store(
+        self,
+        namespace: str,
+        query_embedding: List[float],
+        context_key: str,
+        response: str,
+        tokens: int = 0
+    ):
+        """Cache a response"""
+        bucket = self._bucket(namespace, context_key)
+        entry = {
+            'embedding': _normalize(query_embedding).astype(np.float16).astype(float).tolist(),
+            'response': response,
+            'tokens': tokens,
+            'created': time.time()
+        }
+        entry_id = uuid.uuid4().hex[:12]
+
+        try:
+            if self.redis_client:
+                self._store_redis(bucket, entry_id, entry)
+            else:
+                self._store_memory(bucket, entry_id, entry)
+            with self._lock:
+                self.stats['stores'] += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Response cache store failed: {e}")
+
+    # ----- in-memory backend -----
+
+    def _load_bucket(self, bucket: str) -> Dict[str, Dict]:
+        if self.redis_client:
+            return self._load_bucket_redis(bucket)
+
+        with self._lock:
+            entries = self._buckets.get(bucket, {})
+            now = time.time()
+            for entry_id in [e for e, entry in entries.items() if now - entry['created'] > self.ttl_seconds]:
+                self._evict_memory(bucket, entry_id)
+            return dict(self._buckets.get(bucket, {}))
+
+    def _store_memory(self, bucket: str, entry_id: str, entry: Dict):
+        with self._lock:
+            self._buckets.setdefault(bucket, {})[entry_id] = entry
+            self._lru[(bucket, entry_id)] = None
+            while len(self._lru) > self.max_entries:
+                old_bucket, old_id = next(iter(self._lru))
+                self._evict_memory(old_bucket, old_id)
+
+    def _evict_memory(self, bucket: str, entry_id: str):
+        """Remove one entry (lock held)"""
+        self._lru.pop((bucket, entry_id), None)
+        entries = self._buckets.get(bucket)
+        if entries is not None:
+            entries.pop(entry_id, None)
+            if not entries:
+                del self._buckets[bucket]
+
+    # ----- Redis backend -----
+
+    REDIS_PREFIX = 'legal:respcache:'
+
+    def _load_bucket_redis(self, bucket: str) -> Dict[str, Dict]:
+        key = f"{self.REDIS_PREFIX}{bucket}"
+        raw = self.redis_client.hgetall(key)
+        entries = {entry_id: json.loads(value) for entry_id, value in raw.items()}
+
+        # The bucket's expiry is refreshed by every store, so old entries in a
+        # busy bucket outlive it; enforce the TTL per entry
+        now = time.time()
+        stale = [entry_id for entry_id, entry in entries.items() if now - entry['created'] > self.ttl_seconds]
+        if stale:
+            pipe = self.redis_client.pipeline()
+            pipe.hdel(key, *stale)
+            pipe.zrem(f"{self.REDIS_PREFIX}index", *[f"{bucket}|{entry_id}" for entry_id in stale])
+            pipe.execute()
+            for entry_id in stale:
+                del entries[entry_id]
+        return entries
+
+    def _remove_redis_members(self, members: List[str]):
+        """Delete index members and their bucket entries"""
+        if not members:
+            return
+        pipe = self.redis_client.pipeline()
+        for member in members:
+            old_bucket, old_id = member.rsplit('|', 1)
+            pipe.hdel(f"{self.REDIS_PREFIX}{old_bucket}", old_id)
+        pipe.zrem(f"{self.REDIS_PREFIX}index", *members)
+        pipe.execute()
+
+    def _store_redis(self, bucket: str, entry_id: str, entry: Dict):
+        key = f"{self.REDIS_PREFIX}{bucket}"
+        index_key = f"{self.REDIS_PREFIX}index"
+
+        pipe = self.redis_client.pipeline()
+        pipe.hset(key, entry_id, json.dumps(entry))
+        pipe.expire(key, self.ttl_seconds)
+        pipe.zadd(index_key, {f"{bucket}|{entry_id}": entry['created']})
+        pipe.execute()
+
+        # Index scores are creation times: drop members past the TTL (their
+        # bucket may already have expired) so they do not count toward the bound
+        self._remove_redis_members(
+            self.redis_client.zrangebyscore(index_key, '-inf', entry['created'] - self.ttl_seconds)
+        )
+
+        # Enforce the global size bound by dropping the oldest live entries
+        overflow = self.redis_client.zcard(index_key) - self.max_entries
+        if overflow > 0:
+            self._remove_redis_members(self.redis_client.zrange(index_key, 0, overflow - 1))
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._buckets.clear()
+            self._lru.clear()
+        if self.redis_client:
+            for key in self.redis_client.scan_iter(f"{self.REDIS_PREFIX}*"):
+                self.redis_client.delete(key)
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+            stats['backend'] = 'redis' if self.redis_client else 'memory'
+            if not self.redis_client:
+                stats['entries'] = len(self._lru)
+            return stats
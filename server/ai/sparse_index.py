@@ -0,0 +1,207 @@
+"""
+Sparse (BM25) Index
+Keyword index kept alongside the ChromaDB collection
+
+Dense BGE-M3 vectors often rank exact legal tokens poorly
+("Section 73", "Indian Contract Act"). This inverted index scores
+those tokens with BM25 so they can be fused with vector results.
+"""
+
+import os
+import re
+import json
+import math
+import logging
+import threading
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Function words that carry no retrieval signal; numbers are always kept
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was',
+    'were', 'which', 'with', 'what', 'how', 'under', 'shall'
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word/number tokens, keeping section numbers like '73' or '10a'"""
+    return [token for token in re.findall(r'[a-z0-9]+', text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Incrementally updatable BM25 inverted index
+
+    Features:
+    - Okapi BM25 scoring (k1, b tunable)
+    - Add/replace/remove documents by ID
+    - JSON persistence next to the Chroma directory; changes are tracked so
+      callers can flush() once after a bulk update instead of saving per batch
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize BM25 index
+
+        Args:
+            path: JSON file to persist the index to (None keeps it in memory only)
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Add documents, replacing any existing entries with the same IDs"""
+        with self._lock:
+            self._remove(ids)
+            for doc_id, text in zip(ids, texts):
+                tokens = tokenize(text)
+                self.doc_lengths[doc_id] = len(tokens)
+                self.total_length += len(tokens)
+                for term, tf in Counter(tokens).items():
+                    self.postings.setdefault(term, {})[doc_id] = tf
+            self._dirty = True
+
+    def remove(self, ids: List[str]):
+        """Remove documents by ID"""
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids: List[str]):
+        """Remove documents (lock held)"""
+        removed = {doc_id for doc_id in ids if doc_id in self.doc_lengths}
+        if not removed:
+            return
+
+        self._dirty = True
+        for doc_id in removed:
+            self.total_length -= self.doc_lengths.pop(doc_id)
+
+        for term in list(self.postings.keys()):
+            docs = self.postings[term]
+            for doc_id in removed & docs.keys():
+                del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+
+    def clear(self):
+        """Remove every document"""
+        with self._lock:
+            self.postings = {}
+            self.doc_lengths = {}
+            self.total_length = 0
+            self._dirty = True
+
+    def search(self, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        Score documents against a query
+
+        Returns:
+            List of (doc_id, bm25_score), best first
+        """
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if n_docs == 0:
+                return []
+
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = {}
+
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:n_results]
+
+    def save(self):
+        """Persist the index atomically"""
+        if not self.path:
+            return
+
+        with self._lock:
+            payload = {
+                'k1': self.k1,
+                'b': self.b,
+                'doc_lengths': self.doc_lengths,
+                'postings': self.postings
+            }
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except Exception as e:
+                logger.error(f"❌ Failed to save BM25 index: {e}")
+
+    def flush(self):
+        """Persist the index if it changed since the last save"""
+        with self._lock:
+            if self._dirty:
+                self.save()
+
+    def load(self):
+        """Load the index from disk"""
+        with self._lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+                self.k1 = payload.get('k1', self.k1)
+                self.b = payload.get('b', self.b)
+                self.doc_lengths = payload.get('doc_lengths', {})
+                self.postings = payload.get('postings', {})
+                self.total_length = sum(self.doc_lengths.values())
+                self._dirty = False
+                logger.info(f"📇 BM25 index loaded with {len(self.doc_lengths)} documents")
+            except Exception as e:
+                logger.error(f"❌ Failed to load BM25 index, starting empty: {e}")
+                self.clear()
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]],
+    weights: Optional[List[float]] = None,
+    k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    Fuse several ranked ID lists with weighted reciprocal rank fusion
+
+    Args:
+        rankings: Ranked ID lists, best first
+        weights: Weight per ranking (default: 1.0 each)
+        k: RRF damping constant
+
+    Returns:
+        List of (doc_id, fused_score), best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[str, float] = {}
+
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank)
+
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
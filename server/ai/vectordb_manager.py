@@ -5,18 +5,61 @@ Enables semantic search across legal documents
 """
 
 import os
+import time
+import atexit
 import logging
+from dataclasses import dataclass, field
 from typing import List, Dict, Optional, Union
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import threading
+import numpy as np
 
 from .config import AIConfig
 from .embedding_service import embedding_service
+from .sparse_index import BM25Index, reciprocal_rank_fusion
+from .ingestion_manifest import IngestionManifest
+from .context_packer import PackedContext, context_packer
+from .reranker import reranker
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class RetrievalResult:
+    """
+    Result of a single knowledge-base retrieval
+
+    Computed once per request and shared by context building,
+    citation formatting and logging so the query is only embedded
+    and searched once.
+    """
+    query: str
+    ids: List[str] = field(default_factory=list)
+    documents: List[str] = field(default_factory=list)
+    metadatas: List[Dict] = field(default_factory=list)
+    distances: List[float] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    query_embedding: List[float] = field(default_factory=list)
+    rerank_scores: List[float] = field(default_factory=list)
+    fusion_scores: List[float] = field(default_factory=list)  # hybrid: RRF score / best attainable, in (0, 1]
+
+    def to_dict(self) -> Dict:
+        """Convert to the flattened search-results dict returned by search()"""
+        results = {
+            'ids': self.ids,
+            'documents': self.documents,
+            'metadatas': self.metadatas,
+            'distances': self.distances
+        }
+        if self.rerank_scores:
+            results['rerank_scores'] = self.rerank_scores
+        if self.fusion_scores:
+            results['fusion_scores'] = self.fusion_scores
+        return results
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
 class VectorDBManager:
     """
     Manages ChromaDB for semantic search and RAG
@@ -25,20 +68,78 @@ class VectorDBManager:
     - Persistent vector storage
     - Hugging Face embeddings (legal-bge-m3)
     - Semantic similarity search
+    - Hybrid BM25 + vector search (reciprocal rank fusion)
     - Document metadata management
     - Collection management
     """
     
-    def __init__(self):
-        """Initialize ChromaDB client"""
+    def __init__(self, lazy: Optional[bool] = None):
+        """
+        Initialize ChromaDB manager
+        
+        Args:
+            lazy: Defer opening ChromaDB and the sparse index until first use
+                  (default: AIConfig.LAZY_LOAD_MODELS)
+        """
         self.persist_directory = AIConfig.CHROMA_PERSIST_DIRECTORY
+        self._client = None
+        self._collection = None
+        self._sparse_index = None
+        self._manifest = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        
+        # Sparse index changes are saved once per ingest; catch anything left over
+        atexit.register(self.flush)
+        
+        if not (AIConfig.LAZY_LOAD_MODELS if lazy is None else lazy):
+            self.warm_up()
+    
+    def warm_up(self) -> bool:
+        """Open ChromaDB, the collection and the sparse index (idempotent)"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize()
+                    self._initialized = True
+                    self._sync_sparse_index()
+        return self._collection is not None
+    
+    @property
+    def is_ready(self) -> bool:
+        return self._initialized and self._collection is not None
+    
+    @property
+    def client(self):
+        self.warm_up()
+        return self._client
+    
+    @property
+    def collection(self):
+        self.warm_up()
+        return self._collection
+    
+    @property
+    def sparse_index(self) -> BM25Index:
+        self.warm_up()
+        return self._sparse_index
+    
+    @property
+    def manifest(self) -> IngestionManifest:
+        self.warm_up()
+        return self._manifest
+    
+    def _initialize(self):
+        """Initialize ChromaDB client (init lock held)"""
+        import chromadb
+        from chromadb.config import Settings
         
         # Ensure directory exists
         os.makedirs(self.persist_directory, exist_ok=True)
         
         # Initialize ChromaDB client
         try:
-            self.client = chromadb.PersistentClient(
+            self._client = chromadb.PersistentClient(
                 path=self.persist_directory,
                 settings=Settings(
                     anonymized_telemetry=False,
@@ -48,15 +149,20 @@ class VectorDBManager:
             logger.info(f"✅ ChromaDB initialized at {self.persist_directory}")
         except Exception as e:
             logger.error(f"❌ ChromaDB initialization failed: {e}")
-            self.client = None
+            self._client = None
         
         # Initialize collection
-        self.collection = None
         self._init_collection()
+        
+        # Sparse keyword index persisted next to the Chroma data
+        self._sparse_index = BM25Index(os.path.join(self.persist_directory, 'bm25_index.json'))
+        
+        # Files ingested into the collection and the chunk IDs they own
+        self._manifest = IngestionManifest(os.path.join(self.persist_directory, 'ingestion_manifest.json'))
     
     def _init_collection(self):
         """Initialize or get existing collection"""
-        if not self.client:
+        if not self._client:
             return
         
         try:
@@ -85,18 +191,18 @@ class VectorDBManager:
                         return [[0.0] * 1024 for _ in texts_list]
             
             # Get or create collection
-            self.collection = self.client.get_or_create_collection(
+            self._collection = self._client.get_or_create_collection(
                 name=AIConfig.COLLECTION_NAME,
                 embedding_function=LegalBGEEmbeddings(),
                 metadata={"description": "Legal documents for RAG", "embedding_model": "BAAI/bge-m3"}
             )
             
-            doc_count = self.collection.count()
+            doc_count = self._collection.count()
             logger.info(f"📚 Collection '{AIConfig.COLLECTION_NAME}' loaded with {doc_count} documents")
         
         except Exception as e:
             logger.error(f"❌ Collection initialization failed: {e}")
-            self.collection = None
+            self._collection = None
     
     def add_documents(
         self,
@@ -136,6 +242,9 @@ class VectorDBManager:
                 ids=ids
             )
             
+            # Keep the keyword index in step with the collection (persisted by flush())
+            self.sparse_index.add(ids, documents)
+            
             logger.info(f"✅ Added {len(documents)} documents to collection")
             return True
         
@@ -143,58 +252,311 @@ class VectorDBManager:
             logger.error(f"❌ Failed to add documents: {e}")
             return False
     
-    def search(
+    def upsert_documents(
+        self,
+        documents: List[str],
+        metadatas: List[Dict],
+        ids: List[str]
+    ) -> bool:
+        """
+        Insert or replace documents by ID
+        
+        Args:
+            documents: List of document texts
+            metadatas: Metadata for each document
+            ids: Deterministic IDs (existing entries are overwritten)
+        
+        Returns:
+            Success status
+        """
+        if not self.collection:
+            logger.error("Collection not initialized")
+            return False
+        
+        try:
+            self.collection.upsert(
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
+            )
+            self.sparse_index.add(ids, documents)
+            
+            logger.info(f"✅ Upserted {len(documents)} documents")
+            return True
+        
+        except Exception as e:
+            logger.error(f"❌ Failed to upsert documents: {e}")
+            return False
+    
+    def delete_documents(self, ids: List[str]) -> bool:
+        """
+        Delete documents by ID
+        
+        Args:
+            ids: IDs to delete
+        
+        Returns:
+            Success status
+        """
+        if not self.collection:
+            logger.error("Collection not initialized")
+            return False
+        
+        if not ids:
+            return True
+        
+        try:
+            self.collection.delete(ids=ids)
+            self.sparse_index.remove(ids)
+            
+            logger.info(f"🗑️  Deleted {len(ids)} documents")
+            return True
+        
+        except Exception as e:
+            logger.error(f"❌ Failed to delete documents: {e}")
+            return False
+    
+    def retrieve(
         self,
         query: str,
         n_results: int = None,
         where: Optional[Dict] = None,
-        include_distances: bool = True
-    ) -> Dict:
+        mode: Optional[str] = None,
+        dense_weight: Optional[float] = None,
+        sparse_weight: Optional[float] = None,
+        rerank: Optional[bool] = None
+    ) -> RetrievalResult:
         """
-        Search for similar documents
-        
+        Embed the query once and search the collection
+
         Args:
             query: Search query
             n_results: Number of results to return
+                (default: AIConfig.RERANK_TOP_K when reranking, else AIConfig.TOP_K_RETRIEVAL)
             where: Metadata filter
-            include_distances: Include similarity scores
-        
+            mode: 'dense' or 'hybrid' (default: AIConfig.RETRIEVAL_MODE)
+            dense_weight: RRF weight of the vector ranking in hybrid mode
+            sparse_weight: RRF weight of the BM25 ranking in hybrid mode
+            rerank: Over-fetch and rerank with the cross-encoder (default: AIConfig.ENABLE_RERANKING)
+
         Returns:
-            Search results with documents, metadatas, and distances
+            RetrievalResult with per-stage timings (embed_ms, search_ms, sparse_ms, rerank_ms)
         """
+        result = RetrievalResult(query=query)
+
         if not self.collection:
             logger.error("Collection not initialized")
-            return {"documents": [], "metadatas": [], "distances": []}
-        
+            return result
+
         try:
-            n_results = n_results or AIConfig.TOP_K_RETRIEVAL
-            
+            rerank = reranker.enabled if rerank is None else rerank and reranker.enabled
+            n_results = n_results or (AIConfig.RERANK_TOP_K if rerank else AIConfig.TOP_K_RETRIEVAL)
+            # Reranking over-fetches candidates and cuts back to n_results afterwards
+            candidates = max(n_results, AIConfig.RERANK_CANDIDATES) if rerank else n_results
+            hybrid = (mode or AIConfig.RETRIEVAL_MODE) == 'hybrid' and self._has_sparse_index()
+            fetch_n = candidates * AIConfig.HYBRID_CANDIDATE_MULTIPLIER if hybrid else candidates
+
+            start = time.perf_counter()
+            query_embeddings = embedding_service.get_embeddings([query])
+            result.query_embedding = query_embeddings[0]
+            result.timings['embed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+            start = time.perf_counter()
             results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
+                query_embeddings=query_embeddings,
+                n_results=fetch_n,
                 where=where,
                 include=['documents', 'metadatas', 'distances']
             )
-            
+            result.timings['search_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
             # Flatten results (ChromaDB returns nested lists)
-            flattened = {
-                'documents': results['documents'][0] if results['documents'] else [],
-                'metadatas': results['metadatas'][0] if results['metadatas'] else [],
-                'distances': results['distances'][0] if results['distances'] else []
-            }
-            
-            logger.info(f"🔍 Search: '{query[:50]}...' | Found {len(flattened['documents'])} results")
-            return flattened
-        
+            result.ids = results['ids'][0] if results['ids'] else []
+            result.documents = results['documents'][0] if results['documents'] else []
+            result.metadatas = results['metadatas'][0] if results['metadatas'] else []
+            result.distances = results['distances'][0] if results['distances'] else []
+
+            if hybrid:
+                start = time.perf_counter()
+                self._fuse_sparse(
+                    result,
+                    query_embeddings[0],
+                    candidates,
+                    fetch_n,
+                    where,
+                    AIConfig.HYBRID_DENSE_WEIGHT if dense_weight is None else dense_weight,
+                    AIConfig.HYBRID_SPARSE_WEIGHT if sparse_weight is None else sparse_weight
+                )
+                result.timings['sparse_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+            if rerank:
+                start = time.perf_counter()
+                self._rerank(result, n_results)
+                result.timings['rerank_ms'] = round((time.perf_counter() - start) * 1000, 2)
+
+            logger.info(
+                f"🔍 Search ({'hybrid' if hybrid else 'dense'}): '{query[:50]}...' | Found {len(result)} results | "
+                f"timings {result.timings}"
+            )
+            return result
+
         except Exception as e:
             logger.error(f"❌ Search failed: {e}")
-            return {"documents": [], "metadatas": [], "distances": []}
+            return result
+
+    def _has_sparse_index(self) -> bool:
+        return len(self.sparse_index) > 0
+
+    def _sync_sparse_index(self):
+        """
+        Rebuild the BM25 index at warm-up if it is missing or out of step
+        with the collection (e.g. the process exited before a flush), so
+        the first hybrid query never pays for the build
+        """
+        if self._collection is None:
+            return
+        try:
+            count = self._collection.count()
+            if count and len(self._sparse_index) != count:
+                self.rebuild_sparse_index()
+        except Exception as e:
+            logger.error(f"❌ BM25 index sync failed: {e}")
+
+    def flush(self):
+        """Persist pending sparse index changes (call once after a bulk ingest)"""
+        if self._sparse_index is not None:
+            self._sparse_index.flush()
+
+    def rebuild_sparse_index(self, page_size: int = 1000) -> int:
+        """
+        Rebuild the BM25 index from every document in the collection
+
+        Returns:
+            Number of documents indexed
+        """
+        if not self.collection:
+            return 0
+
+        logger.info("📇 Building BM25 index from collection...")
+        self.sparse_index.clear()
+        total = self.collection.count()
+
+        for offset in range(0, total, page_size):
+            page = self.collection.get(limit=page_size, offset=offset, include=['documents'])
+            self.sparse_index.add(page['ids'], page['documents'])
+
+        self.sparse_index.save()
+        logger.info(f"✅ BM25 index built with {len(self.sparse_index)} documents")
+        return len(self.sparse_index)
+
+    def _fuse_sparse(
+        self,
+        result: RetrievalResult,
+        query_embedding: List[float],
+        n_results: int,
+        fetch_n: int,
+        where: Optional[Dict],
+        dense_weight: float,
+        sparse_weight: float
+    ):
+        """
+        Fuse BM25 hits into a dense RetrievalResult in place
+
+        Keyword-only hits can be far from the query in vector space, so
+        fused results carry fusion_scores (RRF score relative to a document
+        ranked first by both rankers) for filtering instead of distances.
+        """
+        sparse_ids = [doc_id for doc_id, _ in self.sparse_index.search(result.query, fetch_n)]
+
+        fused = reciprocal_rank_fusion(
+            [result.ids, sparse_ids],
+            weights=[dense_weight, sparse_weight],
+            k=AIConfig.HYBRID_RRF_K
+        )
+        fused_scores = dict(fused)
+        best_attainable = (dense_weight + sparse_weight) / (AIConfig.HYBRID_RRF_K + 1)
+
+        rows = {
+            doc_id: (doc, metadata, distance)
+            for doc_id, doc, metadata, distance in zip(
+                result.ids, result.documents, result.metadatas, result.distances
+            )
+        }
+
+        # Keyword-only hits: fetch text, metadata and vectors (also applies the metadata filter)
+        missing = [doc_id for doc_id, _ in fused[:fetch_n] if doc_id not in rows]
+        if missing:
+            fetched = self.collection.get(
+                ids=missing,
+                where=where,
+                include=['documents', 'metadatas', 'embeddings']
+            )
+            query_vec = np.asarray(query_embedding, dtype=np.float32)
+            for doc_id, doc, metadata, embedding in zip(
+                fetched['ids'], fetched['documents'], fetched['metadatas'], fetched['embeddings']
+            ):
+                # Same squared-L2 distance Chroma reports for dense hits
+                diff = np.asarray(embedding, dtype=np.float32) - query_vec
+                rows[doc_id] = (doc, metadata, float(np.dot(diff, diff)))
+
+        top_ids = [doc_id for doc_id, _ in fused if doc_id in rows][:n_results]
+
+        result.ids = top_ids
+        result.documents = [rows[doc_id][0] for doc_id in top_ids]
+        result.metadatas = [rows[doc_id][1] for doc_id in top_ids]
+        result.distances = [rows[doc_id][2] for doc_id in top_ids]
+        result.fusion_scores = [
+            round(fused_scores[doc_id] / best_attainable, 4) if best_attainable else 0.0
+            for doc_id in top_ids
+        ]
+
+    def _rerank(self, result: RetrievalResult, n_results: int):
+        """Reorder candidates by cross-encoder score and keep the best n_results (in place)"""
+        scores = reranker.score(result.query, result.documents, result.ids)
+        if scores is None:
+            # Reranker unavailable: keep retrieval order
+            del result.ids[n_results:], result.documents[n_results:]
+            del result.metadatas[n_results:], result.distances[n_results:]
+            del result.fusion_scores[n_results:]
+            return
+
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:n_results]
+        result.ids = [result.ids[i] for i in order]
+        result.documents = [result.documents[i] for i in order]
+        result.metadatas = [result.metadatas[i] for i in order]
+        result.distances = [result.distances[i] for i in order]
+        if result.fusion_scores:
+            result.fusion_scores = [result.fusion_scores[i] for i in order]
+        result.rerank_scores = [scores[i] for i in order]
+
+    def search(
+        self,
+        query: str,
+        n_results: int = None,
+        where: Optional[Dict] = None,
+        include_distances: bool = True,
+        mode: Optional[str] = None
+    ) -> Dict:
+        """
+        Search for similar documents
+        
+        Args:
+            query: Search query
+            n_results: Number of results to return
+            where: Metadata filter
+            include_distances: Include similarity scores
+            mode: 'dense' or 'hybrid' (default: AIConfig.RETRIEVAL_MODE)
+        
+        Returns:
+            Search results with documents, metadatas, and distances
+        """
+        return self.retrieve(query, n_results, where=where, mode=mode).to_dict()
     
     def get_context_for_query(
         self,
         query: str,
         n_results: int = None,
-        max_tokens: int = 2000
+        max_tokens: Optional[int] = None
     ) -> str:
         """
         Get relevant context for a query (for RAG)
@@ -202,44 +564,81 @@ class VectorDBManager:
         Args:
             query: User query
             n_results: Number of documents to retrieve
-            max_tokens: Maximum tokens in context
+            max_tokens: Maximum tokens in context (default: AIConfig.RAG_CONTEXT_MAX_TOKENS)
         
         Returns:
             Formatted context string
         """
-        results = self.search(query, n_results)
-        
-        if not results['documents']:
-            return ""
-        
-        context = "**Relevant Legal Information:**\n\n"
+        return self.build_context(self.retrieve(query, n_results), max_tokens=max_tokens)
+
+    def build_context(self, retrieval: RetrievalResult, max_tokens: Optional[int] = None) -> str:
+        """
+        Format an existing retrieval result as RAG context
+
+        Args:
+            retrieval: Result from retrieve()
+            max_tokens: Maximum tokens in context (default: AIConfig.RAG_CONTEXT_MAX_TOKENS)
+
+        Returns:
+            Formatted context string
+        """
+        return self.pack_context(retrieval, max_tokens).text
+
+    def pack_context(self, retrieval: RetrievalResult, max_tokens: Optional[int] = None) -> PackedContext:
+        """
+        Pack a retrieval result into an exact token budget
+
+        Whole chunks are chosen by relevance per token; leftover budget goes to
+        the next best chunk trimmed at a sentence boundary.
+
+        Args:
+            retrieval: Result from retrieve()
+            max_tokens: Maximum tokens in context (default: AIConfig.RAG_CONTEXT_MAX_TOKENS)
+
+        Returns:
+            PackedContext with text ("" if nothing relevant) and tokens used vs budget
+        """
+        max_tokens = max_tokens or AIConfig.RAG_CONTEXT_MAX_TOKENS
+        items = []
         
         for i, (doc, metadata, distance) in enumerate(zip(
-            results['documents'],
-            results['metadatas'],
-            results['distances']
+            retrieval.documents,
+            retrieval.metadatas,
+            retrieval.distances
         ), 1):
-            # Calculate similarity score (1 - distance for cosine similarity)
-            similarity = 1 - distance
-            
-            # Only include high-quality results
-            if similarity < 0.7:
-                continue
+            if retrieval.rerank_scores:
+                # Cross-encoder relevance replaces the distance heuristic
+                similarity = retrieval.rerank_scores[i - 1]
+                if similarity < AIConfig.RERANK_MIN_RELEVANCE:
+                    continue
+            elif retrieval.fusion_scores:
+                # Hybrid results: keyword-only hits have poor vector distances by design
+                similarity = retrieval.fusion_scores[i - 1]
+                if similarity < AIConfig.HYBRID_MIN_RELEVANCE:
+                    continue
+            else:
+                # Calculate similarity score (1 - distance for cosine similarity)
+                similarity = 1 - distance
+                
+                # Only include high-quality results
+                if similarity < 0.7:
+                    continue
             
             source = metadata.get('source', 'Unknown')
             doc_type = metadata.get('type', 'Document')
-            
-            context += f"**{i}. {doc_type}** (Source: {source}, Relevance: {similarity:.1%})\n"
-            context += f"{doc}\n\n"
-            
-            # Check token limit (rough estimate)
-            if len(context) > max_tokens * 4:  # ~4 chars per token
-                break
+            items.append({
+                'prefix': f"**{i}. {doc_type}** (Source: {source}, Relevance: {similarity:.1%})\n",
+                'body': doc.strip(),
+                'score': similarity
+            })
         
-        if context == "**Relevant Legal Information:**\n\n":
-            return ""
-        
-        return context
+        packed = context_packer.pack(items, max_tokens, header="**Relevant Legal Information:**\n\n")
+        if packed.text:
+            logger.info(
+                f"📐 Context: {packed.tokens_used}/{packed.token_budget} tokens, "
+                f"{packed.items_used}/{packed.items_total} chunks ({packed.items_trimmed} trimmed)"
+            )
+        return packed
     
     def delete_collection(self) -> bool:
         """Delete the entire collection"""
@@ -248,6 +647,10 @@ class VectorDBManager:
         
         try:
             self.client.delete_collection(AIConfig.COLLECTION_NAME)
+            self.sparse_index.clear()
+            self.sparse_index.save()
+            self.manifest.clear()
+            self.manifest.save()
             logger.info(f"🗑️  Collection '{AIConfig.COLLECTION_NAME}' deleted")
             self._init_collection()
             return True
@@ -278,6 +681,8 @@ class VectorDBManager:
                 'collection_name': AIConfig.COLLECTION_NAME,
                 'document_types': list(doc_types),
                 'sources': list(sources),
+                'sparse_index_documents': len(self.sparse_index),
+                'retrieval_mode': AIConfig.RETRIEVAL_MODE,
                 'persist_directory': self.persist_directory
             }
         except Exception as e:
@@ -0,0 +1,169 @@
+"""
+Verification Cache
+Reuses document verification results across editor re-submits
+
+Two levels:
+- Whole reports keyed by (normalized content hash, document_type, verification_level)
+- Clause analyses keyed by (normalized clause hash, document_type), so an edited
+  document only has its changed clauses re-analyzed
+"""
+
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Top-level clause headings: "1.", "12)", "Clause 4", "Article 2", "Section 3"
+CLAUSE_HEADING = re.compile(r'^(?:(?:clause|article|section)\s+\d+\b|\d+[.)]\s)', re.IGNORECASE)
+
+
+def normalize_document(text: str) -> str:
+    """Collapse insignificant whitespace so formatting-only edits hash the same"""
+    lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in text.replace('\r\n', '\n').split('\n')]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def content_hash(*parts: str) -> str:
+    """sha256 over parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def split_clauses(text: str) -> List[str]:
+    """
+    Split a document into top-level clauses
+
+    Uses numbered/titled clause headings; documents without them are
+    split into paragraphs instead.
+    """
+    normalized = normalize_document(text)
+
+    clauses: List[str] = []
+    current: List[str] = []
+    for line in normalized.split('\n'):
+        if CLAUSE_HEADING.match(line) and current:
+            clauses.append('\n'.join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        clauses.append('\n'.join(current).strip())
+
+    if len(clauses) <= 1:
+        clauses = normalized.split('\n\n')
+
+    return [clause for clause in clauses if clause]
+
+
+class _LRU:
+    """Size-bounded LRU with TTL (not thread-safe; callers hold the cache lock)"""
+
+    def __init__(self, max_items: int, ttl_seconds: int):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        created, value = item
+        if self.ttl_seconds and time.time() - created > self.ttl_seconds:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any):
+        self._items[key] = (time.time(), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class VerificationCache:
+    """
+    In-memory cache for verification reports and clause analyses
+
+    Features:
+    - Whitespace-insensitive content hashing
+    - LRU + TTL bounds on both levels
+    - Hit/miss counters per level
+    """
+
+    def __init__(self, max_documents: int = 500, max_clauses: int = 20000, ttl_seconds: int = 86400):
+        """
+        Initialize verification cache
+
+        Args:
+            max_documents: Maximum cached whole reports
+            max_clauses: Maximum cached clause analyses
+            ttl_seconds: Entry lifetime (0 disables expiry)
+        """
+        self._reports = _LRU(max_documents, ttl_seconds)
+        self._clauses = _LRU(max_clauses, ttl_seconds)
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'report_hits': 0,
+            'report_misses': 0,
+            'clause_hits': 0,
+            'clause_misses': 0
+        }
+
+    @staticmethod
+    def report_key(document: str, document_type: str, verification_level: str) -> str:
+        return content_hash(normalize_document(document), document_type, verification_level)
+
+    @staticmethod
+    def clause_key(clause: str, document_type: str) -> str:
+        return content_hash(clause, document_type)
+
+    def get_report(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            report = self._reports.get(key)
+            self.stats['report_hits' if report is not None else 'report_misses'] += 1
+            return report
+
+    def put_report(self, key: str, report: Dict):
+        with self._lock:
+            self._reports.put(key, report)
+
+    def get_clauses(self, keys: List[str]) -> List[Optional[Dict]]:
+        """Cached analyses aligned with keys (None where missing)"""
+        with self._lock:
+            found = [self._clauses.get(key) for key in keys]
+            hits = sum(1 for analysis in found if analysis is not None)
+            self.stats['clause_hits'] += hits
+            self.stats['clause_misses'] += len(keys) - hits
+            return found
+
+    def put_clause(self, key: str, analysis: Dict):
+        with self._lock:
+            self._clauses.put(key, analysis)
+
+    def clear(self):
+        with self._lock:
+            self._reports.clear()
+            self._clauses.clear()
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['cached_reports'] = len(self._reports)
+            stats['cached_clauses'] = len(self._clauses)
+            return stats
@@ -0,0 +1,118 @@
+"""
+Service Warm-up
+Explicit initialization of the lazily loaded AI services
+
+With AIConfig.LAZY_LOAD_MODELS the tokenizer, embedding model,
+ChromaDB and (if enabled) the reranker are loaded on first use.
+warm_up() loads them up front (e.g. from a gunicorn post_fork hook or
+a background thread at startup) and readiness() reports what is
+loaded for /api/health/ready.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ('tokenizer', 'embeddings', 'vector_db', 'reranker')
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_state: Dict = {
+    'status': 'cold',  # cold, warming, ready, failed
+    'started_at': None,
+    'finished_at': None,
+    'components': {}
+}
+
+
+def _service(name: str):
+    """Singleton behind a component name (imported lazily)"""
+    if name == 'tokenizer':
+        from .azure_openai_service import ai_service
+        return ai_service
+    if name == 'embeddings':
+        from .embedding_service import embedding_service
+        return embedding_service
+    if name == 'vector_db':
+        from .vectordb_manager import vector_db
+        return vector_db
+    if name == 'reranker':
+        from .reranker import reranker
+        return reranker
+    raise ValueError(f"Unknown component: {name}")
+
+
+def warm_up(components: Optional[List[str]] = None) -> Dict:
+    """
+    Load services now instead of on first request
+
+    Args:
+        components: Subset of COMPONENTS (default: all)
+
+    Returns:
+        Warm-up state with per-component timings
+    """
+    _state.update({'status': 'warming', 'started_at': time.time(), 'finished_at': None})
+    logger.info("🔥 Warming up AI services...")
+
+    failed = False
+    for name in components or COMPONENTS:
+        start = time.perf_counter()
+        try:
+            service = _service(name)
+            if service is None:
+                raise RuntimeError("service unavailable")
+            ready = bool(service.warm_up())
+            error = None
+        except Exception as e:
+            ready, error = False, str(e)
+
+        entry = {'ready': ready, 'seconds': round(time.perf_counter() - start, 2)}
+        if error:
+            entry['error'] = error
+        _state['components'][name] = entry
+
+        if ready:
+            logger.info(f"✅ {name} ready in {entry['seconds']}s")
+        else:
+            failed = True
+            logger.error(f"❌ {name} failed to warm up: {error or 'not ready'}")
+
+    _state.update({'status': 'failed' if failed else 'ready', 'finished_at': time.time()})
+    return dict(_state)
+
+
+def start_background_warm_up() -> threading.Thread:
+    """Warm up in a daemon thread so the app serves requests meanwhile (started once)"""
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up, name='ai-warmup', daemon=True)
+            _thread.start()
+        return _thread
+
+
+def readiness() -> Dict:
+    """
+    Which services are loaded
+
+    Returns:
+        {ready, status, components: {name: bool}}
+    """
+    components = {}
+    for name in COMPONENTS:
+        try:
+            service = _service(name)
+            components[name] = service is not None and bool(service.is_ready)
+        except Exception:
+            components[name] = False
+
+    return {
+        'ready': all(components.values()),
+        'status': _state['status'],
+        'components': components,
+        'warmup': _state['components']
+    }
@@ -3,7 +3,6 @@ import requests
 from flask_cors import CORS
 from docx import Document
 import mammoth
-import psycopg2
 from dotenv import load_dotenv
 import os   
 import sys
@@ -36,8 +35,11 @@ from ai.conversation_manager import conversation_manager
 from ai.config import AIConfig
 from ai.rag_pipeline import rag_pipeline
 from ai.vectordb_manager import vector_db
+from ai.context_packer import context_packer
 from ai.document_processor import doc_processor
 from ai.template_manager_v2 import get_template_manager
+from ai.warmup import readiness, start_background_warm_up
+from db_pool import DatabaseUnavailable, RequestConnection, create_db_pool
 
 app = Flask(__name__)
 
@@ -85,11 +87,6 @@ def token_required(fn):
             except Exception:
                 user_id = user_identity
 
-            # Check if database is available
-            if db is None:
-                logger.error("Database not available for authentication")
-                return jsonify({'error': 'Service temporarily unavailable'}), 503
-
             # Fetch user details from the database
             cur = db.cursor()
             cur.execute(
@@ -112,6 +109,8 @@ def token_required(fn):
             # Call the original function, injecting current_user as the first argument
             return fn(current_user, *args, **kwargs)
 
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             logger.warning(f"Unauthorized access or invalid token: {e}")
             return jsonify({'error': 'Authorization required'}), 401
@@ -143,45 +142,41 @@ def revoked_token_callback(jwt_header, jwt_payload):
 logger.info("="*60)
 logger.info("🚀 Legal Documentation Assistant - AI Backend Starting")
 logger.info("="*60)
-if AIConfig.validate():
+if AIConfig.LLM_BACKEND == 'mock':
+    logger.warning("🧪 LLM_BACKEND=mock - chat responses are simulated (for offline load/latency testing)")
+elif AIConfig.validate():
     logger.info("✅ Azure OpenAI Configuration Valid")
     logger.info(f"📊 Configuration: {AIConfig.get_summary()}")
 else:
     logger.error("❌ Azure OpenAI not configured - Please set up .env file")
 logger.info("="*60)
 
-# Database connection with error handling
-try:
-    db = psycopg2.connect(
-        database=os.getenv('DATABASE_NAME'), 
-        user=os.getenv('DATABASE_USER'),
-        password=os.getenv('PASSWORD'), 
-        host=os.getenv('DATABASE_HOST'), 
-        port=os.getenv('DATABASE_PORT'), 
-        sslmode='require',  # SSL mode for Render.com
-        connect_timeout=10,  # Connection timeout in seconds
-        keepalives=1, 
-        keepalives_idle=30,
-        keepalives_interval=10, 
-        keepalives_count=5
-    )
+# Heavy AI services load lazily; optionally warm them up without blocking startup
+if AIConfig.WARMUP_ON_STARTUP:
+    start_background_warm_up()
+
+# Database connection pool: connections are checked out per request and
+# returned on teardown; stale connections are health-checked and replaced
+db_pool = create_db_pool()
+db = RequestConnection(db_pool)
+db.init_app(app)
+
+if db_pool.ping():
     logger.info("✅ Database connected successfully")
-except psycopg2.OperationalError as e:
-    logger.error(f"❌ Database connection failed: {e}")
+else:
     logger.warning("⚠️ Server will start without database (some features may not work)")
-    db = None
-except Exception as e:
-    logger.error(f"❌ Unexpected database error: {e}")
-    db = None
+
+
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(error):
+    logger.error(f"❌ {error}")
+    return jsonify({'error': 'Database not available'}), 503
 
 # API Routes
 
 
 @app.route('/api/services', methods=["GET"])
 def services():
-    if db is None:
-        return jsonify({'error': 'Database not available'}), 503
-    
     cur = db.cursor()
     cur.execute('SELECT * FROM services')
     row_headers = [x[0] for x in cur.description]
@@ -199,9 +194,6 @@ def services():
 @app.route('/api/forms', methods=["GET"])
 def get_forms():
     # Send json object {"service_id": "..."}
-    if db is None:
-        return jsonify({'error': 'Database not available'}), 503
-    
     Service = request.args.get('service_id')
     print(type(Service))
     print(Service)
@@ -223,9 +215,6 @@ def get_forms():
 @app.route('/api/form-details', methods=["GET"])
 def get_form_details():
     # Send json object {"form_id":"..."}
-    if db is None:
-        return jsonify({'error': 'Database not available'}), 503
-    
     form_id = request.args.get('form_id')
     print(form_id)
     cur = db.cursor()
@@ -253,9 +242,6 @@ def get_form_details():
 # Return the contents of final doc
 @app.route('/api/final-content', methods=["POST"])
 def final_content():
-    if db is None:
-        return jsonify({'error': 'Database not available'}), 503
-    
     form_details = request.json                         # Under Progress
     form_id = form_details["form_id"]
     # print(type(form_details))
@@ -528,6 +514,18 @@ def clear_conversation():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/health/ready', methods=['GET'])
+def health_ready():
+    """
+    Readiness probe: 200 once the embedding model, vector DB, tokenizer and reranker are loaded,
+    503 while they are still warming up (routes that do not need them already serve).
+    Without WARMUP_ON_STARTUP they load on first use, so the worker is always ready.
+    """
+    state = readiness()
+    ready = state['ready'] or not AIConfig.WARMUP_ON_STARTUP
+    return jsonify(state), 200 if ready else 503
+
+
 @app.route('/api/admin/stats', methods=['GET'])
 def get_stats():
     """
@@ -538,7 +536,8 @@ def get_stats():
             'ai_usage': ai_service.get_usage_stats(),
             'active_sessions': len(conversation_manager.get_all_sessions()),
             'config': AIConfig.get_summary(),
-            'rag_stats': rag_pipeline.get_stats()
+            'rag_stats': rag_pipeline.get_stats(),
+            'db_pool': db_pool.get_stats()
         })
     
     except Exception as e:
@@ -604,6 +603,8 @@ def chat_with_rag():
                     'sources': result.get('sources', []),
                     'used_rag': result.get('used_rag', True)
                 },
+                'timings': result.get('timings', {}),
+                'context': result.get('context', {}),
                 'session_id': session_id,
                 'model': 'gpt-4o-mini + legal-knowledge-base',
                 'message': 'Response generated using AI + Legal Knowledge Base'
@@ -632,6 +633,68 @@ def chat_with_rag():
         }), 500
 
 
+@app.route('/api/chat/rag/stream', methods=['POST'])
+def chat_with_rag_stream():
+    """
+    Streaming variant of /api/chat/rag over Server-Sent Events
+    
+    Events:
+    - sources: retrieved citations, sent before generation starts
+    - token: one streamed chunk of the answer
+    - done: usage and per-stage timings (including time-to-first-token)
+    - error: sent if generation fails mid-stream
+    
+    The full answer is added to the conversation history once the stream ends.
+    """
+    data = request.json or {}
+    user_message = data.get('user_chat', '')
+    session_id = data.get('session_id', str(uuid.uuid4()))
+    n_results = data.get('n_results', 5)
+    
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+    
+    logger.info(f"🌊 Streaming AI Chat | Session: {session_id} | Query: {user_message[:50]}...")
+    
+    history = conversation_manager.get_history(session_id, max_messages=10)
+    conversation_manager.add_message(session_id, 'user', user_message)
+    
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    
+    def generate():
+        yield sse('session', {'session_id': session_id})
+        try:
+            for item in rag_pipeline.stream_with_rag(
+                user_query=user_message,
+                conversation_history=history,
+                n_results=n_results
+            ):
+                if item['event'] == 'done':
+                    conversation_manager.add_message(session_id, 'assistant', item['data']['response'])
+                    payload = {
+                        'usage': item['data']['usage'],
+                        'timings': item['data']['timings'],
+                        'context': item['data'].get('context', {}),
+                        'session_id': session_id
+                    }
+                    yield sse('done', payload)
+                else:
+                    yield sse(item['event'], item['data'])
+        except Exception as e:
+            logger.error(f"❌ RAG stream error: {str(e)}")
+            yield sse('error', {'error': 'Failed to process your request. Please try again.'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # disable proxy buffering so tokens flush immediately
+        }
+    )
+
+
 @app.route('/api/chat/document-query', methods=['POST'])
 def document_context_query():
     """
@@ -654,6 +717,16 @@ def document_context_query():
         
         logger.info(f"📄 Document query | Type: {query_type} | Query: {user_query[:100]}...")
         
+        # Fit the document to a fixed token budget: whole if it fits, otherwise the
+        # passages most relevant to the query (summaries favour the opening)
+        packed = context_packer.pack_document(
+            document_content,
+            user_query,
+            AIConfig.DOCUMENT_QUERY_MAX_TOKENS,
+            prefer_start=query_type == 'summary'
+        )
+        document_excerpt = packed.text
+        
         # Create context-aware prompt based on query type
         if query_type == 'summary':
             system_prompt = f"""You are a legal assistant analyzing a {document_type}. 
@@ -668,7 +741,7 @@ Be professional but conversational."""
             user_prompt = f"""Document Type: {document_type}
 
 Document Content:
-{document_content[:3000]}
+{document_excerpt}
 
 User Request: {user_query}
 
@@ -682,7 +755,7 @@ Be clear about what to change and why."""
             user_prompt = f"""Document Type: {document_type}
 
 Current Document:
-{document_content[:3000]}
+{document_excerpt}
 
 User's Change Request: {user_query}
 
@@ -695,24 +768,24 @@ Answer the user's question about the document clearly and helpfully."""
             user_prompt = f"""Document Type: {document_type}
 
 Document Content:
-{document_content[:3000]}
+{document_excerpt}
 
 User Question: {user_query}
 
 Your Answer:"""
 
         # Call GPT with document context
-        response = ai_service.client.chat.completions.create(
-            model=AIConfig.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            messages=[
+        response = ai_service.chat_completion(
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=1000,
+            raise_errors=True
         )
         
-        assistant_response = response.choices[0].message.content.strip()
+        assistant_response = response.strip()
         
         logger.info(f"✅ Document query completed")
         
@@ -720,6 +793,7 @@ Your Answer:"""
             'success': True,
             'response': assistant_response,
             'query_type': query_type,
+            'context': packed.to_dict(),
             'session_id': session_id
         })
     
@@ -741,6 +815,7 @@ def search_knowledge():
         query = data.get('query', '')
         n_results = data.get('n_results', 10)
         filters = data.get('filters', None)
+        mode = data.get('mode', None)  # 'dense' or 'hybrid'
         
         if not query:
             return jsonify({'error': 'Query required'}), 400
@@ -750,7 +825,8 @@ def search_knowledge():
         results = rag_pipeline.search_knowledge_base(
             query=query,
             n_results=n_results,
-            filters=filters
+            filters=filters,
+            mode=mode
         )
         
         return jsonify({
@@ -834,9 +910,12 @@ def populate_knowledge():
         
         logger.info(f"📚 Populating knowledge base from {directory}")
         
+        # Parse in-process: worker processes started from the server would
+        # re-import (or fork) the whole app with its threads and connections
         result = rag_pipeline.populate_knowledge_base(
             directory=directory,
-            recursive=recursive
+            recursive=recursive,
+            workers=1
         )
         
         return jsonify(result)
@@ -1051,19 +1130,20 @@ Return ONLY a valid JSON object with this exact structure:
 
         # Call GPT-4o-mini for extraction (cheap, fast, ~500 tokens)
         try:
-            response = ai_service.client.chat.completions.create(
-                model=AIConfig.AZURE_OPENAI_CHAT_DEPLOYMENT,  # Use configured deployment
-                messages=[
-                    {"role": "system", "content": "You are a precise legal data extraction assistant. Return only valid JSON."},
-                    {"role": "user", "content": extraction_prompt}
-                ],
+            extraction_messages = [
+                {"role": "system", "content": "You are a precise legal data extraction assistant. Return only valid JSON."},
+                {"role": "user", "content": extraction_prompt}
+            ]
+            response = ai_service.chat_completion(
+                extraction_messages,
                 temperature=0.1,  # Low temperature for consistency
                 max_tokens=500,   # Minimal token usage
-                response_format={"type": "json_object"}  # Ensure JSON output
+                response_format={"type": "json_object"},  # Ensure JSON output
+                raise_errors=True
             )
             
             # Parse GPT response
-            extraction_result = json.loads(response.choices[0].message.content)
+            extraction_result = json.loads(response)
             extracted_fields = extraction_result.get('extracted_fields', {})
             confidence = extraction_result.get('confidence', 0.5)
             
@@ -1096,7 +1176,9 @@ Return ONLY a valid JSON object with this exact structure:
                 'confidence': confidence,
                 'needs_more_info': len(missing_fields) > 0,
                 'template_name': template_name,
-                'tokens_used': response.usage.total_tokens if hasattr(response, 'usage') else None
+                'tokens_used': ai_service.count_tokens(
+                    " ".join(m['content'] for m in extraction_messages) + response
+                )
             })
             
         except json.JSONDecodeError as je:
@@ -1598,6 +1680,11 @@ def validate_document_enhanced():
             # Recommendations
             'recommendations': validation_result.get('recommendations', []),
             
+            # Stage completion and cache statistics
+            'partial': validation_result.get('partial', False),
+            'incomplete_stages': validation_result.get('incomplete_stages', []),
+            'cache': validation_result.get('cache', {}),
+            
             # Action items
             'action_items': {
                 'must_fix': critical_issues,
@@ -1630,13 +1717,15 @@ def fix_single_issue():
             "description": "...",
             "suggestion": "...",
             "location": "..."
-        }
+        },
+        "mode": "patch"  // optional: "patch" (targeted edits, default) or "full" (rewrite whole document)
     }
     """
     try:
         data = request.json
         document_html = data.get('document_html', '')
         issue = data.get('issue', {})
+        mode = data.get('mode', 'patch')
         
         if not document_html or not issue:
             return jsonify({'error': 'Document and issue required'}), 400
@@ -1644,7 +1733,26 @@ def fix_single_issue():
         if not AIConfig.validate():
             return jsonify({'error': 'AI service not configured'}), 503
         
-        logger.info(f"🔧 Fixing single issue: {issue.get('issue_type', 'Unknown')}")
+        logger.info(f"🔧 Fixing single issue: {issue.get('issue_type', 'Unknown')} ({mode})")
+        
+        if mode == 'patch':
+            from ai.document_patcher import document_patcher
+            
+            result = document_patcher.fix_issues(document_html, [issue])
+            if result['success']:
+                logger.info(f"✅ Issue fixed with {result['applied']} patches")
+                return jsonify({
+                    'success': True,
+                    'fixed_document': result['fixed_document'],
+                    'issue_fixed': issue.get('issue_type', issue.get('issue', 'Unknown')),
+                    'mode': 'patch',
+                    'patches_applied': result['applied'],
+                    'patches_failed': result['failed'],
+                    'blocks_sent': result['blocks_sent'],
+                    'blocks_total': result['blocks_total']
+                })
+            
+            logger.warning("⚠️ Patch mode produced no changes, falling back to full-document fix")
         
         # Create fix prompt
         fix_prompt = f"""You are a legal document editor. Fix the following issue in the document.
@@ -1669,17 +1777,17 @@ def fix_single_issue():
 Return the fixed HTML document:"""
 
         # Call GPT to fix the issue
-        response = ai_service.client.chat.completions.create(
-            model=AIConfig.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            messages=[
+        response = ai_service.chat_completion(
+            [
                 {"role": "system", "content": "You are a legal document editor. Return only the corrected HTML document without any additional text."},
                 {"role": "user", "content": fix_prompt}
             ],
             temperature=0.3,
-            max_tokens=4000
+            max_tokens=4000,
+            raise_errors=True
         )
         
-        fixed_document = response.choices[0].message.content.strip()
+        fixed_document = response.strip()
         
         # Clean up markdown code blocks if present
         if fixed_document.startswith('```html'):
@@ -1690,7 +1798,8 @@ Return the fixed HTML document:"""
         return jsonify({
             'success': True,
             'fixed_document': fixed_document,
-            'issue_fixed': issue.get('issue_type', issue.get('issue', 'Unknown'))
+            'issue_fixed': issue.get('issue_type', issue.get('issue', 'Unknown')),
+            'mode': 'full'
         })
     
     except Exception as e:
@@ -1706,13 +1815,15 @@ def fix_all_issues():
     Request:
     {
         "document_html": "<html>...</html>",
-        "issues": [ {...}, {...}, ... ]
+        "issues": [ {...}, {...}, ... ],
+        "mode": "patch"  // optional: "patch" (targeted edits, default) or "full" (rewrite whole document)
     }
     """
     try:
         data = request.json
         document_html = data.get('document_html', '')
         issues = data.get('issues', [])
+        mode = data.get('mode', 'patch')
         
         if not document_html or not issues:
             return jsonify({'error': 'Document and issues required'}), 400
@@ -1720,7 +1831,26 @@ def fix_all_issues():
         if not AIConfig.validate():
             return jsonify({'error': 'AI service not configured'}), 503
         
-        logger.info(f"🔧 Fixing all {len(issues)} issues")
+        logger.info(f"🔧 Fixing all {len(issues)} issues ({mode})")
+        
+        if mode == 'patch':
+            from ai.document_patcher import document_patcher
+            
+            result = document_patcher.fix_issues(document_html, issues)
+            if result['success']:
+                logger.info(f"✅ {len(issues)} issues fixed with {result['applied']} patches")
+                return jsonify({
+                    'success': True,
+                    'fixed_document': result['fixed_document'],
+                    'issues_fixed': len(issues),
+                    'mode': 'patch',
+                    'patches_applied': result['applied'],
+                    'patches_failed': result['failed'],
+                    'blocks_sent': result['blocks_sent'],
+                    'blocks_total': result['blocks_total']
+                })
+            
+            logger.warning("⚠️ Patch mode produced no changes, falling back to full-document fix")
         
         # Create comprehensive fix prompt
         issues_summary = "\n".join([
@@ -1755,17 +1885,17 @@ def fix_all_issues():
 Return the fully corrected HTML document:"""
 
         # Call GPT to fix all issues
-        response = ai_service.client.chat.completions.create(
-            model=AIConfig.AZURE_OPENAI_CHAT_DEPLOYMENT,
-            messages=[
+        response = ai_service.chat_completion(
+            [
                 {"role": "system", "content": "You are a legal document editor. Return only the fully corrected HTML document without any additional text."},
                 {"role": "user", "content": fix_prompt}
             ],
             temperature=0.3,
-            max_tokens=6000
+            max_tokens=6000,
+            raise_errors=True
         )
         
-        fixed_document = response.choices[0].message.content.strip()
+        fixed_document = response.strip()
         
         # Clean up markdown code blocks if present
         if fixed_document.startswith('```html'):
@@ -1776,7 +1906,8 @@ Return the fully corrected HTML document:"""
         return jsonify({
             'success': True,
             'fixed_document': fixed_document,
-            'issues_fixed': len(issues)
+            'issues_fixed': len(issues),
+            'mode': 'full'
         })
     
     except Exception as e:
@@ -1820,8 +1951,17 @@ def upload_document_for_analysis():
         
         logger.info(f"📄 Processing uploaded document: {file.filename}")
         
+        # Per-user quota: authenticated uploads count against the user, others against the client address
+        from flask_jwt_extended import verify_jwt_in_request
+        try:
+            verify_jwt_in_request(optional=True)
+            owner = get_jwt_identity()
+        except Exception:
+            owner = None
+        owner = str(owner) if owner else request.remote_addr
+        
         # Process document
-        doc_id = document_analyzer.process_document(tmp_path, file.filename)
+        doc_id = document_analyzer.process_document(tmp_path, file.filename, owner=owner)
         doc_info = document_analyzer.get_document_info(doc_id)
         
         # Clean up temp file
@@ -2205,10 +2345,6 @@ def validate_password(password):
 def signup():
     """User registration endpoint"""
     try:
-        # Check database availability
-        if db is None:
-            return jsonify({'error': 'Service temporarily unavailable. Please try again later.'}), 503
-        
         data = request.json
         email = data.get('email', '').strip().lower()
         password = data.get('password', '')
@@ -2263,20 +2399,17 @@ def signup():
             }
         }), 201
         
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"❌ Signup error: {str(e)}")
-        if db is not None:
-            db.rollback()
+        db.rollback()
         return jsonify({'error': 'Registration failed. Please try again.'}), 500
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     """User login endpoint"""
     try:
-        # Check database availability
-        if db is None:
-            return jsonify({'error': 'Service temporarily unavailable. Please try again later.'}), 503
-        
         data = request.json
         email = data.get('email', '').strip().lower()
         password = data.get('password', '')
@@ -2333,6 +2466,8 @@ def login():
             }
         }), 200
         
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"❌ Login error: {str(e)}")
         return jsonify({'error': 'Login failed. Please try again.'}), 500
@@ -2342,10 +2477,6 @@ def login():
 def verify_token():
     """Verify JWT token and return user info"""
     try:
-        # Check database availability
-        if db is None:
-            return jsonify({'error': 'Service temporarily unavailable. Please try again later.'}), 503
-        
         user_id = get_jwt_identity()
         logger.info(f"🔐 Token verification for user_id: {user_id} (type: {type(user_id)})")
         
@@ -2379,6 +2510,8 @@ def verify_token():
             }
         }), 200
         
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"❌ Verification error: {str(e)}")
         return jsonify({'error': 'Token verification failed'}), 401
@@ -2388,9 +2521,6 @@ def verify_token():
 def get_profile():
     """Get user profile"""
     try:
-        if db is None:
-            return jsonify({'error': 'Service temporarily unavailable. Please try again later.'}), 503
-        
         user_id = get_jwt_identity()
         
         cur = db.cursor()
@@ -2414,6 +2544,8 @@ def get_profile():
             'last_login': user[5].isoformat() if user[5] else None
         }), 200
         
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"❌ Profile error: {str(e)}")
         return jsonify({'error': 'Failed to fetch profile'}), 500
@@ -2423,9 +2555,6 @@ def get_profile():
 def get_user_documents():
     """Get user's document history"""
     try:
-        if db is None:
-            return jsonify({'error': 'Service temporarily unavailable. Please try again later.'}), 503
-        
         user_id = get_jwt_identity()
         logger.info(f"📄 Fetching documents for user_id: {user_id}")
         
@@ -2457,6 +2586,8 @@ def get_user_documents():
             'count': len(doc_list)
         }), 200
         
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         logger.error(f"❌ Documents error: {str(e)}")
         return jsonify({'error': 'Failed to fetch documents'}), 500
@@ -0,0 +1,285 @@
+"""
+PostgreSQL Connection Pool
+Thread-safe pool with per-request checkout for the Flask app
+
+- Bounded pool (DB_POOL_MIN / DB_POOL_MAX); requests wait up to
+  DB_POOL_TIMEOUT seconds for a free connection
+- Connections idle longer than DB_HEALTHCHECK_INTERVAL are pinged
+  before reuse and replaced if broken, so a network blip only costs
+  a reconnect instead of breaking the app
+- Pool-wait timing per request (X-DB-Pool-Wait-Ms) and in get_stats()
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import psycopg2
+from psycopg2 import extensions, pool as pg_pool
+from flask import g
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when no healthy connection can be checked out"""
+
+
+class DatabasePool:
+    """
+    Thread-safe PostgreSQL connection pool
+
+    Features:
+    - Lazy pool creation, retried on the next checkout after a failure
+    - Blocking checkout with timeout (psycopg2's pool raises when exhausted)
+    - Health check and transparent reconnect of stale connections
+    - Wait-time and reconnect statistics
+    """
+
+    def __init__(
+        self,
+        minconn: int = 1,
+        maxconn: int = 10,
+        timeout: float = 5.0,
+        healthcheck_interval: float = 30.0,
+        **connect_kwargs
+    ):
+        """
+        Initialize pool (no connection is opened until first use)
+
+        Args:
+            minconn: Connections kept open
+            maxconn: Maximum concurrent connections
+            timeout: Seconds a checkout may wait for a free connection
+            healthcheck_interval: Idle seconds after which a connection is pinged before reuse
+            **connect_kwargs: Passed to psycopg2.connect
+        """
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._pool: Optional[pg_pool.ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used: Dict[int, float] = {}
+        self._stats_lock = threading.Lock()
+
+        self.stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'failures': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0
+        }
+
+    def _get_pool(self) -> pg_pool.ThreadedConnectionPool:
+        """Create the underlying pool once (retried after failures)"""
+        with self._pool_lock:
+            if self._pool is None:
+                try:
+                    self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self.connect_kwargs)
+                    logger.info(f"✅ Database pool ready (min={self.minconn}, max={self.maxconn})")
+                except psycopg2.Error as e:
+                    with self._stats_lock:
+                        self.stats['failures'] += 1
+                    raise DatabaseUnavailable(f"Database connection failed: {e}") from e
+            return self._pool
+
+    def getconn(self) -> Tuple[extensions.connection, float]:
+        """
+        Check out a healthy connection
+
+        Returns:
+            (connection, milliseconds spent waiting for it)
+
+        Raises:
+            DatabaseUnavailable: Pool exhausted past the timeout or database unreachable
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._stats_lock:
+                self.stats['timeouts'] += 1
+            raise DatabaseUnavailable(f"No database connection free within {self.timeout}s")
+
+        try:
+            pool = self._get_pool()
+            conn = None
+            for _ in range(2):
+                try:
+                    conn = pool.getconn()
+                except psycopg2.Error as e:
+                    raise DatabaseUnavailable(f"Database connection failed: {e}") from e
+                if self._is_healthy(conn):
+                    break
+                pool.putconn(conn, close=True)
+                self._last_used.pop(id(conn), None)
+                conn = None
+                with self._stats_lock:
+                    self.stats['reconnects'] += 1
+            if conn is None:
+                raise DatabaseUnavailable("Database connection is unhealthy")
+        except Exception:
+            self._slots.release()
+            with self._stats_lock:
+                self.stats['failures'] += 1
+            raise
+
+        wait_ms = round((time.perf_counter() - start) * 1000, 2)
+        with self._stats_lock:
+            self.stats['checkouts'] += 1
+            self.stats['in_use'] += 1
+            self.stats['total_wait_ms'] += wait_ms
+            self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], wait_ms)
+        return conn, wait_ms
+
+    def putconn(self, conn: extensions.connection, discard: bool = False):
+        """Return a connection, rolling back any open transaction; broken connections are closed"""
+        try:
+            if not conn.closed and not discard and conn.status != extensions.STATUS_READY:
+                conn.rollback()
+        except psycopg2.Error:
+            discard = True
+
+        try:
+            discard = discard or bool(conn.closed)
+            if discard:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            self._get_pool().putconn(conn, close=discard)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to return database connection: {e}")
+        finally:
+            with self._stats_lock:
+                self.stats['in_use'] -= 1
+            self._slots.release()
+
+    def _is_healthy(self, conn: extensions.connection) -> bool:
+        """Ping connections that have been idle for a while"""
+        if conn.closed:
+            return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"⚠️ Stale database connection replaced: {e}")
+            return False
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for a block of work outside a request"""
+        conn, _ = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def ping(self) -> bool:
+        """Whether the database is reachable"""
+        try:
+            with self.connection():
+                return True
+        except DatabaseUnavailable as e:
+            logger.error(f"❌ {e}")
+            return False
+
+    def get_stats(self) -> Dict:
+        """Get pool statistics"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['total_wait_ms'] = round(stats['total_wait_ms'], 2)
+        stats['avg_wait_ms'] = round(stats['total_wait_ms'] / stats['checkouts'], 2) if stats['checkouts'] else 0.0
+        stats.update({'min': self.minconn, 'max': self.maxconn, 'connected': self._pool is not None})
+        return stats
+
+    def closeall(self):
+        """Close every pooled connection"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+
+
+class RequestConnection:
+    """
+    Connection-like facade bound to the current Flask request
+
+    The first cursor() in a request checks a connection out of the pool;
+    it is returned (and any open transaction rolled back) on teardown.
+    """
+
+    def __init__(self, db_pool: DatabasePool):
+        self.pool = db_pool
+
+    def init_app(self, app):
+        """Register request teardown and the pool-wait response header"""
+        app.teardown_appcontext(self.release)
+
+        @app.after_request
+        def add_pool_wait_header(response):
+            wait_ms = g.get('db_pool_wait_ms')
+            if wait_ms is not None:
+                response.headers['X-DB-Pool-Wait-Ms'] = str(wait_ms)
+            return response
+
+    def _connection(self) -> extensions.connection:
+        if 'db_conn' not in g:
+            g.db_conn, g.db_pool_wait_ms = self.pool.getconn()
+        return g.db_conn
+
+    def cursor(self, *args, **kwargs):
+        return self._connection().cursor(*args, **kwargs)
+
+    def commit(self):
+        self._connection().commit()
+
+    def rollback(self):
+        conn = g.get('db_conn')
+        if conn is not None and not conn.closed:
+            conn.rollback()
+
+    def release(self, error: Optional[BaseException] = None):
+        """Return the request's connection to the pool"""
+        conn = g.pop('db_conn', None)
+        if conn is not None:
+            self.pool.putconn(conn)
+
+
+def create_db_pool() -> DatabasePool:
+    """Build the pool from the DATABASE_* / DB_POOL_* environment"""
+    return DatabasePool(
+        minconn=int(os.getenv('DB_POOL_MIN', '1')),
+        maxconn=int(os.getenv('DB_POOL_MAX', '10')),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        healthcheck_interval=float(os.getenv('DB_HEALTHCHECK_INTERVAL', '30')),
+        database=os.getenv('DATABASE_NAME'),
+        user=os.getenv('DATABASE_USER'),
+        password=os.getenv('PASSWORD'),
+        host=os.getenv('DATABASE_HOST'),
+        port=os.getenv('DATABASE_PORT'),
+        sslmode='require',  # SSL mode for Render.com
+        connect_timeout=10,  # Connection timeout in seconds
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=5
+    )
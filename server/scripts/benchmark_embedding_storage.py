@@ -0,0 +1,232 @@
+"""
+Embedding Storage Benchmark
+Recall vs memory of quantized / reduced-dimension embedding storage
+
+Compares every storage option of ai.embedding_quantization against the
+full-precision float32 path on the legal corpus in the vector database
+(or on uploaded-style documents given with --files). Recall@k is the
+overlap of each option's top-k with the float32 top-k for the same query.
+
+Usage:
+    python scripts/benchmark_embedding_storage.py
+    python scripts/benchmark_embedding_storage.py --queries queries.txt --k 5 10
+    python scripts/benchmark_embedding_storage.py --files contract.pdf lease.docx
+    python scripts/benchmark_embedding_storage.py --save-pca pca_256.npz --pca-dim 256
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Add parent directory to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from ai.embedding_quantization import EmbeddingQuantizer, fit_pca, save_pca
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Python list of floats: 8-byte pointer + 24-byte float object per value
+PYTHON_LIST_BYTES_PER_VALUE = 32
+
+
+def load_vectordb_corpus(limit: int) -> np.ndarray:
+    """Stored chunk embeddings from the ChromaDB collection"""
+    from ai.vectordb_manager import vector_db
+
+    embeddings = []
+    offset = 0
+    while len(embeddings) < limit:
+        page = vector_db.collection.get(limit=min(1000, limit - len(embeddings)), offset=offset, include=['embeddings'])
+        if not page['ids']:
+            break
+        embeddings.extend(page['embeddings'])
+        offset += len(page['ids'])
+
+    logger.info(f"📚 Loaded {len(embeddings)} embeddings from the vector database")
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def load_file_corpus(paths: List[str]) -> np.ndarray:
+    """Chunk and embed documents the way the analyzer does for uploads"""
+    from ai.document_analyzer import DocumentAnalyzer
+    from ai.embedding_service import embedding_service
+
+    analyzer = DocumentAnalyzer()
+    texts = []
+    for path in paths:
+        if path.lower().endswith('.pdf'):
+            text = analyzer.extract_text_from_pdf(path)
+        elif path.lower().endswith(('.docx', '.doc')):
+            text = analyzer.extract_text_from_docx(path)
+        else:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        texts.extend(chunk['text'] for chunk in analyzer.chunk_text(text))
+
+    logger.info(f"🔄 Embedding {len(texts)} chunks from {len(paths)} files...")
+    return np.asarray(embedding_service.get_embeddings_batched(texts), dtype=np.float32)
+
+
+def build_queries(corpus: np.ndarray, queries_path: str, sample: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Query vectors and the corpus row each one must not match
+
+    Text queries are embedded; otherwise corpus rows are sampled as queries
+    and excluded from their own results.
+    """
+    if queries_path:
+        from ai.embedding_service import embedding_service
+
+        with open(queries_path, encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+        vectors = np.asarray(embedding_service.get_embeddings(queries), dtype=np.float32)
+        return vectors, np.full(len(queries), -1)
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(corpus.shape[0], size=min(sample, corpus.shape[0]), replace=False)
+    return corpus[rows], rows
+
+
+def top_k(scores: np.ndarray, k: int, exclude: int) -> np.ndarray:
+    if exclude >= 0:
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+    k = min(k, scores.shape[0])
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def default_options(full_dim: int, dims: List[int], pca: Dict[int, Dict]) -> List[Tuple[str, EmbeddingQuantizer]]:
+    options = [(mode, EmbeddingQuantizer(mode)) for mode in ('float32', 'float16', 'int8')]
+    for dim in dims:
+        if dim >= full_dim:
+            continue
+        for mode in ('float32', 'int8'):
+            options.append((f"{mode}/truncate-{dim}", EmbeddingQuantizer(mode, dim)))
+            if dim in pca:
+                options.append((f"{mode}/pca-{dim}", EmbeddingQuantizer(mode, dim, pca[dim])))
+    return options
+
+
+def run_benchmark(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    excluded: np.ndarray,
+    ks: List[int],
+    options: List[Tuple[str, EmbeddingQuantizer]]
+) -> Dict:
+    """Recall@k, memory and timing per storage option"""
+    baseline = EmbeddingQuantizer('float32')
+    baseline_encoded = baseline.encode(corpus)
+    max_k = max(ks)
+    truth = [top_k(baseline.scores(baseline_encoded, q), max_k, int(x)) for q, x in zip(queries, excluded)]
+
+    n, full_dim = corpus.shape
+    baseline_bytes = EmbeddingQuantizer.nbytes(baseline_encoded)
+    results = []
+
+    for name, quantizer in options:
+        start = time.perf_counter()
+        encoded = quantizer.encode(corpus)
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        recalls = {k: [] for k in ks}
+        start = time.perf_counter()
+        for query, exclude, expected in zip(queries, excluded, truth):
+            found = top_k(quantizer.scores(encoded, query), max_k, int(exclude))
+            for k in ks:
+                recalls[k].append(len(set(found[:k]) & set(expected[:k])) / min(k, len(expected)))
+        query_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+
+        size = EmbeddingQuantizer.nbytes(encoded)
+        results.append({
+            'option': name,
+            'dim': int(encoded['embeddings'].shape[1]),
+            'bytes_per_vector': round(size / n, 1),
+            'total_mb': round(size / 1024 / 1024, 3),
+            'compression': round(baseline_bytes / size, 2),
+            **{f'recall@{k}': round(float(np.mean(recalls[k])), 4) for k in ks},
+            'encode_ms': round(encode_ms, 1),
+            'query_ms': round(query_ms, 3)
+        })
+
+    return {
+        'corpus_vectors': n,
+        'full_dimension': full_dim,
+        'queries': len(queries),
+        'python_list_mb': round(n * full_dim * PYTHON_LIST_BYTES_PER_VALUE / 1024 / 1024, 3),
+        'results': results
+    }
+
+
+def format_report(report: Dict, ks: List[int]) -> str:
+    """Markdown table"""
+    lines = [
+        f"Corpus: {report['corpus_vectors']} vectors x {report['full_dimension']} dims, "
+        f"{report['queries']} queries (lists of Python floats would take {report['python_list_mb']} MB)",
+        "",
+        "| option | dim | bytes/vec | MB | x smaller | " + " | ".join(f"recall@{k}" for k in ks) + " | query ms |",
+        "|---|---|---|---|---|" + "---|" * len(ks) + "---|"
+    ]
+    for row in report['results']:
+        lines.append(
+            f"| {row['option']} | {row['dim']} | {row['bytes_per_vector']} | {row['total_mb']} | "
+            f"{row['compression']} | " + " | ".join(f"{row[f'recall@{k}']:.4f}" for k in ks) +
+            f" | {row['query_ms']} |"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark quantized embedding storage')
+    parser.add_argument('--files', nargs='+', help='Documents to chunk and embed instead of the vector database')
+    parser.add_argument('--limit', type=int, default=20000, help='Maximum corpus vectors from the vector database')
+    parser.add_argument('--queries', type=str, help='Text file with one query per line (default: sampled chunks)')
+    parser.add_argument('--sample-queries', type=int, default=200, help='Sampled chunk queries when --queries is not given')
+    parser.add_argument('--k', type=int, nargs='+', default=[5, 10])
+    parser.add_argument('--dims', type=int, nargs='+', default=[512, 256, 128], help='Reduced dimensions to test')
+    parser.add_argument('--save-pca', type=str, help='Write the PCA projection for --pca-dim to this .npz')
+    parser.add_argument('--pca-dim', type=int, default=256)
+    parser.add_argument('--output', type=str, help='Write the JSON report here')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = load_file_corpus(args.files) if args.files else load_vectordb_corpus(args.limit)
+    if corpus.ndim != 2 or corpus.shape[0] < 2:
+        logger.error("❌ Need at least two embeddings to benchmark")
+        sys.exit(1)
+
+    queries, excluded = build_queries(corpus, args.queries, args.sample_queries, args.seed)
+
+    # PCA is fitted on the benchmark corpus itself (in-sample), up to the number of vectors
+    pca = {}
+    for dim in sorted(set(args.dims + ([args.pca_dim] if args.save_pca else []))):
+        if dim < corpus.shape[1] and dim <= corpus.shape[0]:
+            pca[dim] = fit_pca(corpus, dim)
+
+    if args.save_pca:
+        if args.pca_dim not in pca:
+            logger.error(f"❌ Cannot fit {args.pca_dim} PCA components on {corpus.shape[0]} vectors")
+            sys.exit(1)
+        save_pca(args.save_pca, pca[args.pca_dim])
+        logger.info(f"💾 Saved PCA projection to {args.save_pca} (set ANALYZER_EMBEDDING_PCA_PATH to use it)")
+
+    options = default_options(corpus.shape[1], args.dims, pca)
+    report = run_benchmark(corpus, queries, excluded, args.k, options)
+
+    print(format_report(report, args.k))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"📝 Report written to {args.output}")
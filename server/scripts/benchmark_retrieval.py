@@ -0,0 +1,379 @@
+"""
+Retrieval Benchmark
+Quality and speed of the RAG retrieval path on the legal knowledge base
+
+Ingests a corpus (default: data/legal_knowledge) into a scratch ChromaDB
+collection with the chunking / embedding settings under test, then runs a
+labeled query set against it and reports:
+- recall@k: share of queries with a relevant chunk in the top k
+- MRR: mean reciprocal rank of the first relevant chunk
+- p50/p95 retrieval latency (plus per-stage embed/search/sparse/rerank means)
+- ingest throughput (chunks/s) and on-disk index size
+
+A chunk is relevant when it comes from the query's labeled source file and
+contains one of its answer patterns, so labels survive any CHUNK_SIZE.
+Only retrieval runs; the chat model is never called and its credentials are
+blanked, so the benchmark works offline once the embedding model is cached
+(add --offline to stop Hugging Face from checking for updates).
+
+Usage:
+    python scripts/benchmark_retrieval.py
+    python scripts/benchmark_retrieval.py --chunk-size 500 --chunk-overlap 100 --output small_chunks.json
+    python scripts/benchmark_retrieval.py --mode dense --rerank --baseline small_chunks.json
+    python scripts/benchmark_retrieval.py --embedding-model sentence-transformers/all-MiniLM-L6-v2 --markdown report.md
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Add parent directory to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERIES = os.path.join(parent_dir, 'data', 'benchmarks', 'retrieval_queries.json')
+DEFAULT_CORPUS = os.path.join(parent_dir, 'data', 'legal_knowledge')
+COLLECTION_NAME = 'retrieval_benchmark'
+
+# Summary metrics compared against a baseline (True = higher is better)
+COMPARED_METRICS = {
+    'mrr': True,
+    'latency_p50_ms': False,
+    'latency_p95_ms': False,
+    'chunks_per_second': True,
+    'index_mb': False
+}
+
+
+def configure_environment(args: argparse.Namespace, index_dir: str):
+    """
+    Apply the settings under test before any ai module reads AIConfig
+
+    Environment variables take precedence over .env, so the scratch index and
+    overrides never touch the application's own collection or settings.
+    """
+    overrides = {
+        'CHROMA_PERSIST_DIRECTORY': index_dir,
+        'COLLECTION_NAME': COLLECTION_NAME,
+        'CHUNK_SIZE': args.chunk_size,
+        'CHUNK_OVERLAP': args.chunk_overlap,
+        'TOP_K_RETRIEVAL': args.top_k,
+        'EMBEDDING_MODEL_NAME': args.embedding_model,
+        'RETRIEVAL_MODE': args.mode,
+        'ENABLE_RERANKING': 'true' if args.rerank else None,
+        # Cached vectors would make repeated runs look faster than a cold ingest
+        'ENABLE_EMBEDDING_CACHE': 'true' if args.embedding_cache else 'false',
+        # Retrieval only: no chat model client
+        'AZURE_OPENAI_API_KEY': '',
+        'AZURE_OPENAI_ENDPOINT': ''
+    }
+    if args.offline:
+        overrides.update({'HF_HUB_OFFLINE': '1', 'TRANSFORMERS_OFFLINE': '1'})
+
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+
+
+def load_queries(path: str) -> List[Dict]:
+    """Labeled queries: [{'id', 'query', 'source', 'patterns', 'tags'?}]"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    queries = data['queries'] if isinstance(data, dict) else data
+
+    for item in queries:
+        missing = {'id', 'query', 'source', 'patterns'} - set(item)
+        if missing:
+            raise ValueError(f"Query {item.get('id', item)} is missing {sorted(missing)}")
+    return queries
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def is_relevant(item: Dict, document: str, metadata: Dict) -> bool:
+    """Chunk comes from the labeled source and contains an answer pattern"""
+    if (metadata or {}).get('source') != item['source']:
+        return False
+    text = _normalize(document)
+    return any(_normalize(pattern) in text for pattern in item['patterns'])
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def display_path(path: str) -> str:
+    """Path relative to the server directory when inside it (comparable across machines)"""
+    path = os.path.abspath(path)
+    return os.path.relpath(path, parent_dir) if path.startswith(parent_dir + os.sep) else path
+
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 2) if values else 0.0
+
+
+def run_ingest(corpus: str, index_dir: str, workers: Optional[int]) -> Dict:
+    """Warm up the embedding model, then time a full sync of the corpus"""
+    from ai.embedding_service import embedding_service
+    from ai.rag_pipeline import rag_pipeline
+    from ai.vectordb_manager import vector_db
+
+    start = time.perf_counter()
+    embedding_service.warm_up()
+    model_load_s = time.perf_counter() - start
+
+    logger.info(f"📚 Ingesting {corpus} into {index_dir}")
+    start = time.perf_counter()
+    result = rag_pipeline.populate_knowledge_base(corpus, workers=workers)
+    seconds = time.perf_counter() - start
+
+    if not result.get('success'):
+        raise RuntimeError(f"Ingestion failed: {result.get('error') or result.get('errors')}")
+
+    chunks = result['total_chunks']
+    reports = result.get('file_reports', [])
+    size = directory_size(index_dir)
+    return {
+        'files': result['files'],
+        'chunks_written': chunks,
+        'collection_chunks': vector_db.collection.count(),
+        'model_load_s': round(model_load_s, 2),
+        'ingest_s': round(seconds, 2),
+        'parse_s': round(sum(r.get('parse_seconds', 0) for r in reports), 2),
+        'index_s': round(sum(r.get('index_seconds', 0) for r in reports), 2),
+        'chunks_per_second': round(chunks / seconds, 2) if chunks and seconds else 0.0,
+        'index_bytes': size,
+        'index_mb': round(size / 1024 / 1024, 2)
+    }
+
+
+def run_queries(queries: List[Dict], ks: List[int], repeat: int, mode: str, rerank: bool) -> Dict:
+    """Recall@k, MRR and latency over the labeled queries"""
+    from ai.vectordb_manager import vector_db
+
+    max_k = max(ks)
+    # Untimed warm-up: first query loads the sparse index / reranker
+    vector_db.retrieve(queries[0]['query'], n_results=max_k, mode=mode, rerank=rerank)
+
+    latencies = []
+    stages: Dict[str, List[float]] = {}
+    per_query = []
+
+    for item in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = vector_db.retrieve(item['query'], n_results=max_k, mode=mode, rerank=rerank)
+            latencies.append((time.perf_counter() - start) * 1000)
+            for stage, ms in result.timings.items():
+                stages.setdefault(stage, []).append(ms)
+
+        rank = next(
+            (i + 1 for i, (doc, meta) in enumerate(zip(result.documents, result.metadatas)) if is_relevant(item, doc, meta)),
+            None
+        )
+        per_query.append({
+            'id': item['id'],
+            'tags': item.get('tags', []),
+            'rank': rank,
+            'top_source': result.metadatas[0].get('source') if result.metadatas else None,
+            'results': len(result)
+        })
+
+    def recall(rows: List[Dict]) -> Dict[str, float]:
+        return {
+            f'recall@{k}': round(sum(1 for r in rows if r['rank'] and r['rank'] <= k) / len(rows), 4)
+            for k in ks
+        }
+
+    def mrr(rows: List[Dict]) -> float:
+        return round(sum(1.0 / r['rank'] for r in rows if r['rank']) / len(rows), 4)
+
+    by_tag = {}
+    for tag in sorted({tag for row in per_query for tag in row['tags']}):
+        rows = [row for row in per_query if tag in row['tags']]
+        by_tag[tag] = {'queries': len(rows), **recall(rows), 'mrr': mrr(rows)}
+
+    return {
+        **recall(per_query),
+        'mrr': mrr(per_query),
+        'latency_p50_ms': percentile(latencies, 50),
+        'latency_p95_ms': percentile(latencies, 95),
+        'latency_mean_ms': round(float(np.mean(latencies)), 2),
+        'latency_max_ms': round(float(np.max(latencies)), 2),
+        'stage_mean_ms': {stage: round(float(np.mean(values)), 2) for stage, values in stages.items()},
+        'by_tag': by_tag,
+        'misses': [row['id'] for row in per_query if not row['rank']],
+        'per_query': per_query
+    }
+
+
+def run_benchmark(args: argparse.Namespace, index_dir: str) -> Dict:
+    from ai.config import AIConfig
+
+    queries = load_queries(args.queries)
+    ingest = run_ingest(args.corpus, index_dir, args.workers)
+    retrieval = run_queries(queries, args.k, args.repeat, AIConfig.RETRIEVAL_MODE, AIConfig.ENABLE_RERANKING)
+
+    return {
+        'label': args.label or datetime.now().strftime('%Y%m%d-%H%M%S'),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'corpus': display_path(args.corpus),
+            'queries_file': display_path(args.queries),
+            'queries': len(queries),
+            'repeat': args.repeat,
+            'k': args.k,
+            'chunk_size': AIConfig.CHUNK_SIZE,
+            'chunk_overlap': AIConfig.CHUNK_OVERLAP,
+            'top_k_retrieval': AIConfig.TOP_K_RETRIEVAL,
+            'embedding_model': AIConfig.EMBEDDING_MODEL_NAME,
+            'embedding_server': AIConfig.EMBEDDING_SERVER_URL or None,
+            'retrieval_mode': AIConfig.RETRIEVAL_MODE,
+            'reranking': AIConfig.ENABLE_RERANKING,
+            'reranker_model': AIConfig.RERANKER_MODEL if AIConfig.ENABLE_RERANKING else None,
+            'embedding_cache': AIConfig.ENABLE_EMBEDDING_CACHE
+        },
+        'ingest': ingest,
+        'retrieval': retrieval
+    }
+
+
+def summary_metrics(report: Dict) -> Dict[str, float]:
+    """Flat metrics used for the baseline comparison"""
+    retrieval = report['retrieval']
+    metrics = {key: value for key, value in retrieval.items() if key.startswith('recall@')}
+    metrics.update({key: retrieval[key] for key in ('mrr', 'latency_p50_ms', 'latency_p95_ms')})
+    metrics.update({key: report['ingest'][key] for key in ('chunks_per_second', 'index_mb')})
+    return metrics
+
+
+def format_report(report: Dict, baseline: Optional[Dict] = None) -> str:
+    """Markdown summary, with deltas against a baseline report if given"""
+    config = report['config']
+    ingest = report['ingest']
+    retrieval = report['retrieval']
+    ks = config['k']
+
+    lines = [
+        f"## Retrieval benchmark: {report['label']}",
+        "",
+        f"{config['queries']} queries x {config['repeat']} on `{config['corpus']}` | "
+        f"model `{config['embedding_model']}` | chunk {config['chunk_size']}/{config['chunk_overlap']} | "
+        f"top_k {config['top_k_retrieval']} | mode {config['retrieval_mode']} | "
+        f"rerank {'on' if config['reranking'] else 'off'}",
+        "",
+        "| " + " | ".join(f"recall@{k}" for k in ks) + " | MRR | p50 ms | p95 ms | chunks/s | index MB |",
+        "|" + "---|" * (len(ks) + 5),
+        "| " + " | ".join(f"{retrieval[f'recall@{k}']:.4f}" for k in ks) +
+        f" | {retrieval['mrr']:.4f} | {retrieval['latency_p50_ms']} | {retrieval['latency_p95_ms']} | "
+        f"{ingest['chunks_per_second']} | {ingest['index_mb']} |",
+        "",
+        f"Ingest: {ingest['chunks_written']} chunks in {ingest['ingest_s']} s "
+        f"(parse {ingest['parse_s']} s, index {ingest['index_s']} s, model load {ingest['model_load_s']} s)",
+        "Stage means (ms): " + ", ".join(f"{stage} {ms}" for stage, ms in retrieval['stage_mean_ms'].items())
+    ]
+
+    if retrieval['by_tag']:
+        lines += ["", "| tag | queries | " + " | ".join(f"recall@{k}" for k in ks) + " | MRR |",
+                  "|---|---|" + "---|" * (len(ks) + 1)]
+        for tag, row in retrieval['by_tag'].items():
+            lines.append(
+                f"| {tag} | {row['queries']} | " + " | ".join(f"{row[f'recall@{k}']:.4f}" for k in ks) +
+                f" | {row['mrr']:.4f} |"
+            )
+
+    if retrieval['misses']:
+        lines += ["", f"Missed (no relevant chunk in top {max(ks)}): " + ", ".join(retrieval['misses'])]
+
+    if baseline:
+        current, previous = summary_metrics(report), summary_metrics(baseline)
+        lines += ["", f"### Compared with {baseline['label']}", "",
+                  "| metric | baseline | current | change |", "|---|---|---|---|"]
+        for metric, value in current.items():
+            if metric not in previous:
+                continue
+            delta = value - previous[metric]
+            higher_is_better = COMPARED_METRICS.get(metric, True)
+            flag = '' if abs(delta) < 1e-9 else ('✅' if (delta > 0) == higher_is_better else '⚠️')
+            lines.append(f"| {metric} | {previous[metric]} | {value} | {f'{delta:+.4g} {flag}'.strip()} |")
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark retrieval quality and speed on the legal knowledge base')
+    parser.add_argument('--queries', type=str, default=DEFAULT_QUERIES, help='Labeled query set (JSON)')
+    parser.add_argument('--corpus', type=str, default=DEFAULT_CORPUS, help='Directory of documents to ingest')
+    parser.add_argument('--k', type=int, nargs='+', default=[1, 3, 5, 10], help='Cutoffs for recall@k')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query')
+    parser.add_argument('--chunk-size', type=int, help='Override CHUNK_SIZE')
+    parser.add_argument('--chunk-overlap', type=int, help='Override CHUNK_OVERLAP')
+    parser.add_argument('--top-k', type=int, help='Override TOP_K_RETRIEVAL (recorded; recall uses --k)')
+    parser.add_argument('--embedding-model', type=str, help='Override EMBEDDING_MODEL_NAME')
+    parser.add_argument('--mode', choices=['dense', 'hybrid'], help='Override RETRIEVAL_MODE')
+    parser.add_argument('--rerank', action='store_true', help='Enable cross-encoder reranking')
+    parser.add_argument('--embedding-cache', action='store_true', help='Keep the embedding cache on (faster reruns, skews ingest timing)')
+    parser.add_argument('--workers', type=int, help='Parser processes for ingestion (default: INGEST_WORKERS)')
+    parser.add_argument('--index-dir', type=str, help='Scratch index directory (default: a temporary directory)')
+    parser.add_argument('--keep-index', action='store_true', help='Do not delete the scratch index afterwards')
+    parser.add_argument('--offline', action='store_true', help='Never contact Hugging Face (models must be cached)')
+    parser.add_argument('--label', type=str, help='Name of this run in the report (default: timestamp)')
+    parser.add_argument('--output', type=str, help='Write the JSON report here')
+    parser.add_argument('--markdown', type=str, help='Write the markdown summary here')
+    parser.add_argument('--baseline', type=str, help='Earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    if args.index_dir and os.path.exists(args.index_dir) and os.listdir(args.index_dir):
+        logger.error(f"❌ {args.index_dir} is not empty; the benchmark needs a fresh index to time ingestion")
+        sys.exit(1)
+
+    index_dir = args.index_dir or tempfile.mkdtemp(prefix='retrieval_benchmark_')
+    configure_environment(args, index_dir)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    try:
+        report = run_benchmark(args, index_dir)
+    finally:
+        if not args.keep_index:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    markdown = format_report(report, baseline)
+    print(markdown)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"📝 Report written to {args.output}")
+
+    if args.markdown:
+        with open(args.markdown, 'w') as f:
+            f.write(markdown + "\n")
+        logger.info(f"📝 Summary written to {args.markdown}")
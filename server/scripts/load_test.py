@@ -0,0 +1,501 @@
+"""
+API Load Test
+Throughput and latency of the Flask API's hot endpoints
+
+Starts the app on a free local port with stubbed backends (LLM_BACKEND=mock
+for chat, the mock client's deterministic vectors for embeddings, scratch
+ChromaDB / embedding cache directories), seeds the knowledge base with the
+bundled templates, then drives each endpoint at every requested concurrency
+and reports RPS, p50/p95/p99 latency and error rate.
+
+Reports can be saved as a baseline; a later run given --baseline fails
+(exit code 1) when throughput drops, latency grows or errors rise beyond
+the configured tolerances.
+
+Scenarios:
+    chat_rag            POST /api/chat/rag
+    knowledge_search    POST /api/knowledge/search
+    analyze_question    POST /api/document/analyze/question
+    analyze_upload      POST /api/document/analyze/upload
+    assemble            POST /api/document/generate-from-template
+    export              POST /api/document/export
+
+Usage:
+    python scripts/load_test.py
+    python scripts/load_test.py --concurrency 1 8 32 --duration 20
+    python scripts/load_test.py --scenarios chat_rag knowledge_search --llm-latency-ms 800
+    python scripts/load_test.py --save-baseline load_baseline.json
+    python scripts/load_test.py --baseline load_baseline.json
+    python scripts/load_test.py --url http://127.0.0.1:5000   # an already running server, as configured
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import socket
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import requests
+
+# Add parent directory to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(parent_dir, 'data', 'templates')
+UPLOAD_FILE = os.path.join(TEMPLATES_DIR, 'Lease-Deed-(for-a-term-of-years)-Rent-Agreement.docx')
+ASSEMBLE_TEMPLATE = 'Lease Agreement'
+
+QUESTIONS = [
+    "What are the essential elements of a valid lease agreement?",
+    "How much notice must a tenant give before vacating?",
+    "What remedies does a landlord have for non-payment of rent?",
+    "Is a non-disclosure agreement enforceable after termination?",
+    "What should a legal notice for recovery of money contain?",
+    "Who is responsible for repairs during the lease term?",
+    "Can the security deposit be forfeited?",
+    "What is the stamp duty on a rent agreement?"
+]
+
+EXPORT_HTML = (
+    "<h1>Notice</h1>"
+    + "".join(
+        f"<p>{i}. The lessee shall pay the monthly rent on or before the fifth day of each month "
+        f"and shall keep the premises in good and tenantable condition.</p>"
+        for i in range(1, 41)
+    )
+)
+
+
+@dataclass
+class Scenario:
+    """One endpoint under load"""
+    name: str
+    method: str
+    path: str
+    build: Callable[[Dict, int], Dict]  # (context, request index) -> requests kwargs
+    setup: Optional[Callable[[str, Dict], None]] = None  # (base url, context), run before the scenario
+
+
+def _upload_kwargs(context: Dict, i: int) -> Dict:
+    return {'files': {'file': (os.path.basename(UPLOAD_FILE), context['upload_bytes'])}}
+
+
+def _setup_question(base_url: str, context: Dict):
+    """Upload the document the questions are asked about (uploads may evict it between scenarios)"""
+    response = requests.post(f"{base_url}/api/document/analyze/upload", timeout=120, **_upload_kwargs(context, 0))
+    response.raise_for_status()
+    context['document_id'] = response.json()['document_id']
+
+
+def _template_fields(template_name: str) -> Dict:
+    """Example values of every field of a bundled template"""
+    with open(os.path.join(TEMPLATES_DIR, 'template_config.json'), encoding='utf-8') as f:
+        fields = json.load(f)[template_name]['fields']
+    return {name: spec.get('example', name) for name, spec in fields.items()}
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        Scenario('chat_rag', 'POST', '/api/chat/rag', lambda ctx, i: {
+            'json': {'user_chat': QUESTIONS[i % len(QUESTIONS)], 'session_id': f"load-{i}"}
+        }),
+        Scenario('knowledge_search', 'POST', '/api/knowledge/search', lambda ctx, i: {
+            'json': {'query': QUESTIONS[i % len(QUESTIONS)], 'n_results': 5}
+        }),
+        Scenario('analyze_question', 'POST', '/api/document/analyze/question', lambda ctx, i: {
+            'json': {'document_id': ctx['document_id'], 'question': QUESTIONS[i % len(QUESTIONS)]}
+        }, setup=_setup_question),
+        Scenario('analyze_upload', 'POST', '/api/document/analyze/upload', _upload_kwargs),
+        Scenario('assemble', 'POST', '/api/document/generate-from-template', lambda ctx, i: {
+            'json': {'template_name': ASSEMBLE_TEMPLATE, 'field_values': ctx['template_fields'], 'format': 'html'}
+        }),
+        Scenario('export', 'POST', '/api/document/export', lambda ctx, i: {
+            'json': {'content': EXPORT_HTML, 'format': ('docx', 'pdf')[i % 2], 'title': f"Load Test {i}"}
+        })
+    ]
+}
+
+
+# ----- server -----
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def stub_environment(args: argparse.Namespace, scratch_dir: str) -> Dict[str, str]:
+    """Environment for the app with mock LLM / embedding backends and scratch storage"""
+    env = dict(os.environ)
+    env.update({
+        'LLM_BACKEND': 'mock',
+        # Embeddings go through the mock client instead of a local model or server
+        'USE_LOCAL_EMBEDDINGS': 'false',
+        'EMBEDDING_SERVER_URL': '',
+        'CHROMA_PERSIST_DIRECTORY': os.path.join(scratch_dir, 'chroma_db'),
+        'EMBEDDING_CACHE_DIR': os.path.join(scratch_dir, 'embedding_cache'),
+        'ANALYZER_SPILL_DIRECTORY': '',
+        'MOCK_LLM_SEED': env.get('MOCK_LLM_SEED', '42'),
+        # Measure the app, not the LLM rate limiter (set these explicitly to load-test the limits)
+        'MAX_REQUESTS_PER_MINUTE': env.get('MAX_REQUESTS_PER_MINUTE', '1000000'),
+        'MAX_TOKENS_PER_DAY': env.get('MAX_TOKENS_PER_DAY', '1000000000')
+    })
+    overrides = {
+        'MOCK_LLM_LATENCY_MS': args.llm_latency_ms,
+        'MOCK_LLM_TOKENS_PER_SECOND': args.llm_tokens_per_second,
+        'MOCK_LLM_FAILURE_RATE': args.llm_failure_rate
+    }
+    env.update({key: str(value) for key, value in overrides.items() if value is not None})
+    return env
+
+
+def start_server(port: int, env: Dict[str, str], log_path: str) -> subprocess.Popen:
+    """Run the app under the threaded Flask server"""
+    command = [
+        sys.executable, '-m', 'flask', '--app', 'app', 'run',
+        '--host', '127.0.0.1', '--port', str(port),
+        '--no-reload', '--no-debugger', '--with-threads'
+    ]
+    log = open(log_path, 'w')
+    logger.info(f"🚀 Starting app on port {port} (log: {log_path})")
+    return subprocess.Popen(command, cwd=parent_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    """Block until /api/health/ready answers 200"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode} during startup")
+        try:
+            if requests.get(f"{base_url}/api/health/ready", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"App not ready after {timeout}s")
+
+
+def seed_knowledge_base(base_url: str, paths: List[str]) -> int:
+    """Add documents to the (scratch) knowledge base through the API"""
+    chunks = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            response = requests.post(
+                f"{base_url}/api/knowledge/add",
+                files={'file': (os.path.basename(path), f.read())},
+                data={'document_type': 'template'},
+                timeout=300
+            )
+        if response.ok and response.json().get('success'):
+            chunks += response.json().get('num_chunks', 0)
+        else:
+            logger.warning(f"⚠️ Seeding {os.path.basename(path)} failed: {response.status_code}")
+    logger.info(f"📚 Seeded knowledge base with {len(paths)} files ({chunks} chunks)")
+    return chunks
+
+
+# ----- load -----
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 2) if values else 0.0
+
+
+def run_scenario(
+    base_url: str,
+    scenario: Scenario,
+    context: Dict,
+    concurrency: int,
+    duration: float,
+    max_requests: int,
+    warmup: int,
+    timeout: float
+) -> Dict:
+    """
+    Drive one endpoint with a fixed number of concurrent clients
+
+    Each client sends requests back to back on its own keep-alive session
+    until the duration elapses (or max_requests have been sent in total).
+
+    Returns:
+        Request count, RPS, latency percentiles and error rate
+    """
+    local = threading.local()
+    lock = threading.Lock()
+    counter = iter(range(10 ** 9))
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    def send(i: int) -> str:
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        try:
+            response = local.session.request(
+                scenario.method, base_url + scenario.path, timeout=timeout, **scenario.build(context, i)
+            )
+            response.content  # include the full body in the timing
+            return str(response.status_code)
+        except requests.RequestException as e:
+            return type(e).__name__
+
+    for i in range(warmup):
+        send(i)
+
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with lock:
+                i = next(counter)
+            if max_requests and i >= max_requests:
+                return
+            start = time.perf_counter()
+            status = send(i)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    total = len(latencies)
+    errors = sum(count for status, count in statuses.items() if not (status.isdigit() and int(status) < 400))
+    return {
+        'scenario': scenario.name,
+        'endpoint': f"{scenario.method} {scenario.path}",
+        'concurrency': concurrency,
+        'requests': total,
+        'duration_s': round(wall, 2),
+        'rps': round(total / wall, 2) if wall else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': round(float(np.mean(latencies)), 2) if latencies else 0.0,
+        'max_ms': round(float(np.max(latencies)), 2) if latencies else 0.0,
+        'errors': errors,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'statuses': statuses
+    }
+
+
+def run_load_test(base_url: str, args: argparse.Namespace) -> List[Dict]:
+    with open(UPLOAD_FILE, 'rb') as f:
+        context = {'upload_bytes': f.read(), 'template_fields': _template_fields(ASSEMBLE_TEMPLATE)}
+
+    results = []
+    for name in args.scenarios:
+        scenario = SCENARIOS[name]
+        if scenario.setup:
+            scenario.setup(base_url, context)
+        for concurrency in args.concurrency:
+            logger.info(f"🔥 {name} @ {concurrency} concurrent for {args.duration}s")
+            row = run_scenario(
+                base_url, scenario, context, concurrency,
+                args.duration, args.max_requests, args.warmup, args.timeout
+            )
+            logger.info(
+                f"   {row['requests']} requests | {row['rps']} rps | p50 {row['p50_ms']} ms | "
+                f"p99 {row['p99_ms']} ms | errors {row['error_rate']:.2%}"
+            )
+            results.append(row)
+    return results
+
+
+# ----- reporting -----
+
+def compare(report: Dict, baseline: Dict, args: argparse.Namespace) -> List[Dict]:
+    """
+    Per scenario/concurrency changes against a baseline
+
+    Returns:
+        Rows with baseline/current metrics and the regressions found
+    """
+    previous = {(row['scenario'], row['concurrency']): row for row in baseline['results']}
+    rows = []
+    for row in report['results']:
+        base = previous.get((row['scenario'], row['concurrency']))
+        if not base:
+            continue
+        regressions = []
+        if base['rps'] and row['rps'] < base['rps'] * (1 - args.max_rps_drop):
+            regressions.append('rps')
+        for metric in ('p95_ms', 'p99_ms'):
+            if base[metric] and row[metric] > base[metric] * (1 + args.max_latency_increase):
+                regressions.append(metric)
+        if row['error_rate'] > base['error_rate'] + args.max_error_rate_increase:
+            regressions.append('error_rate')
+        rows.append({'scenario': row['scenario'], 'concurrency': row['concurrency'],
+                     'baseline': base, 'current': row, 'regressions': regressions})
+    return rows
+
+
+def format_report(report: Dict, comparison: Optional[List[Dict]] = None) -> str:
+    """Markdown tables"""
+    config = report['config']
+    lines = [
+        f"## Load test: {report['label']}",
+        "",
+        f"{config['server']} | {config['duration_s']}s per level | backends: {config['backends']}",
+        "",
+        "| scenario | concurrency | requests | RPS | p50 ms | p95 ms | p99 ms | errors |",
+        "|---|---|---|---|---|---|---|---|"
+    ]
+    for row in report['results']:
+        lines.append(
+            f"| {row['scenario']} | {row['concurrency']} | {row['requests']} | {row['rps']} | "
+            f"{row['p50_ms']} | {row['p95_ms']} | {row['p99_ms']} | {row['error_rate']:.2%} |"
+        )
+
+    if comparison is not None:
+        lines += ["", f"### Compared with {report.get('baseline_label', 'baseline')}", "",
+                  "| scenario | concurrency | RPS | p95 ms | p99 ms | errors | status |",
+                  "|---|---|---|---|---|---|---|"]
+        for row in comparison:
+            base, current = row['baseline'], row['current']
+
+            def change(metric: str) -> str:
+                if not base[metric]:
+                    return f"{current[metric]}"
+                return f"{current[metric]} ({(current[metric] / base[metric] - 1):+.0%})"
+
+            lines.append(
+                f"| {row['scenario']} | {row['concurrency']} | {change('rps')} | {change('p95_ms')} | "
+                f"{change('p99_ms')} | {base['error_rate']:.2%} → {current['error_rate']:.2%} | "
+                f"{'⚠️ ' + ', '.join(row['regressions']) if row['regressions'] else '✅'} |"
+            )
+    return "\n".join(lines)
+
+
+def cleanup_generated(before: set):
+    """Remove documents the assemble scenario wrote to generated_documents/"""
+    for path in set(glob.glob(os.path.join(parent_dir, 'generated_documents', 'generated_*.docx'))) - before:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test the Flask API hot endpoints')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help='Concurrent clients per level')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per scenario and concurrency level')
+    parser.add_argument('--max-requests', type=int, default=0, help='Stop a level after this many requests (0 = no limit)')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed requests before each level')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--url', type=str, help='Test an already running server instead of starting one with stubs')
+    parser.add_argument('--seed-files', nargs='*', help='Knowledge base seed documents (default: bundled .docx templates)')
+    parser.add_argument('--startup-timeout', type=float, default=180)
+    parser.add_argument('--llm-latency-ms', type=float, help='Mock time to first token (MOCK_LLM_LATENCY_MS)')
+    parser.add_argument('--llm-tokens-per-second', type=float, help='Mock generation rate (MOCK_LLM_TOKENS_PER_SECOND)')
+    parser.add_argument('--llm-failure-rate', type=float, help='Mock injected failure rate (MOCK_LLM_FAILURE_RATE)')
+    parser.add_argument('--label', type=str, help='Name of this run in the report (default: timestamp)')
+    parser.add_argument('--output', type=str, help='Write the JSON report here')
+    parser.add_argument('--save-baseline', type=str, help='Write the JSON report here as the new baseline')
+    parser.add_argument('--baseline', type=str, help='Baseline report to compare against (exit 1 on regression)')
+    parser.add_argument('--max-rps-drop', type=float, default=0.15, help='Tolerated fractional RPS drop')
+    parser.add_argument('--max-latency-increase', type=float, default=0.25, help='Tolerated fractional p95/p99 increase')
+    parser.add_argument('--max-error-rate-increase', type=float, default=0.01, help='Tolerated absolute error rate increase')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    process = None
+    scratch_dir = None
+    generated_before = set(glob.glob(os.path.join(parent_dir, 'generated_documents', 'generated_*.docx')))
+    env = dict(os.environ)
+
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+            wait_ready(base_url, args.startup_timeout)
+        else:
+            scratch_dir = tempfile.mkdtemp(prefix='load_test_')
+            env = stub_environment(args, scratch_dir)
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = start_server(port, env, os.path.join(scratch_dir, 'app.log'))
+            wait_ready(base_url, args.startup_timeout, process)
+
+            seed = args.seed_files if args.seed_files is not None else sorted(glob.glob(os.path.join(TEMPLATES_DIR, '*.docx')))
+            seed_knowledge_base(base_url, seed)
+
+        results = run_load_test(base_url, args)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if scratch_dir:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            cleanup_generated(generated_before)
+
+    report = {
+        'label': args.label or datetime.now().strftime('%Y%m%d-%H%M%S'),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'server': args.url or 'flask threaded (started by load_test.py)',
+            'backends': 'as configured' if args.url else 'mock LLM + mock embeddings',
+            'mock_llm': None if args.url else {
+                key: env.get(key) for key in (
+                    'MOCK_LLM_LATENCY_DISTRIBUTION', 'MOCK_LLM_LATENCY_MS', 'MOCK_LLM_LATENCY_STD_MS',
+                    'MOCK_LLM_TOKENS_PER_SECOND', 'MOCK_LLM_OUTPUT_TOKENS', 'MOCK_LLM_FAILURE_RATE', 'MOCK_LLM_SEED'
+                )
+            },
+            'scenarios': args.scenarios,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'max_requests': args.max_requests,
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+    comparison = None
+    if baseline:
+        report['baseline_label'] = baseline['label']
+        comparison = compare(report, baseline, args)
+        if not comparison:
+            logger.warning("⚠️ No scenario/concurrency pairs in common with the baseline")
+        report['regressions'] = [
+            {'scenario': row['scenario'], 'concurrency': row['concurrency'], 'metrics': row['regressions']}
+            for row in comparison if row['regressions']
+        ]
+
+    print(format_report(report, comparison))
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"📝 Report written to {path}")
+
+    if baseline and report['regressions']:
+        logger.error(f"❌ {len(report['regressions'])} regression(s) against baseline {baseline['label']}")
+        sys.exit(1)